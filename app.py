@@ -1,18 +1,96 @@
-from project import create_app
+import click
+from project import create_app, init_database
 from project.extensions import db # Import db
 
 app = create_app()
 
 # --- Add this command function ---
 @app.cli.command("init-db")
-def init_db():
-    
+@click.option('--no-admin', is_flag=True, help="Do not create the default admin user.")
+def init_db(no_admin):
+    """Creates the database tables and indexes plus the default admin user."""
     print("Creating database tables...")
-    with app.app_context(): # Ensure we're in the app context
-        
-        db.create_all()
+    init_database(app, create_admin=not no_admin)
     print("Database tables created.")
+
+@app.cli.command("rebuild-stats")
+def rebuild_stats():
+    """Recomputes the prediction rollup tables from PredictionLog (backfill after upgrading)."""
+    from project.prediction_log import rebuild_rollups
+
+    with app.app_context():
+        daily, users = rebuild_rollups()
+        db.session.commit()
+    print(f"Rebuilt {daily} daily rows and {users} user rows.")
+
+@app.cli.command("backtest")
+def backtest():
+    """Runs (or refreshes) the walk-forward backtests for every stock and model."""
+    import time
+    from project.ml_logic import STOCK_TICKERS, MODELS, fetch_many_historical_data, get_backtest
+
+    with app.app_context():
+        frames = fetch_many_historical_data(list(STOCK_TICKERS))
+        for stock_name, df in frames.items():
+            for model_name in MODELS:
+                start = time.perf_counter()
+                metrics = get_backtest(stock_name, model_name, df)
+                mape = metrics.get('mape', [None])[0] if metrics else None
+                print(f"{stock_name:<12} {model_name:<18} {time.perf_counter() - start:6.2f}s  1-bar MAPE={mape}")
+
+@app.cli.command("pretrain")
+@click.option('--date', 'run_date', default=None, help="Run date (YYYY-MM-DD) to run or resume; defaults to today.")
+@click.option('--workers', type=int, default=None, help="Worker processes (defaults to PRETRAIN_WORKERS).")
+@click.option('--shard', default=None, help="Only this shard of the universe, as INDEX/COUNT (e.g. 0/4).")
+def pretrain(run_date, workers, shard):
+    """Trains every stock/model pair and stores its forecasts (resumes an interrupted run)."""
+    from datetime import datetime
+    from project.pretrain import run_pretrain
+    from project.universe import parse_shard
+
+    try:
+        shard = parse_shard(shard)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint='--shard')
+    with app.app_context():
+        run_date = datetime.strptime(run_date, '%Y-%m-%d').date() if run_date else None
+        jobs = run_pretrain(app, run_date=run_date, workers=workers, shard=shard)
+        failed = [job for job in jobs if job.status != 'done']
+        if failed:
+            raise SystemExit(f"{len(failed)} pre-training job(s) failed.")
+
+@app.cli.command("create-token")
+@click.option('--email', required=True, help="Email of the user the token acts as.")
+@click.option('--name', required=True, help="Label to recognise the token by (e.g. the client's name).")
+def create_token(email, name):
+    """Creates an /api/v1 token and prints it (it cannot be shown again)."""
+    from project.api_auth import create_token as new_token, token_resolver
+    from project.models import User
+
+    with app.app_context():
+        user = User.query.filter_by(email=email).first()
+        if user is None:
+            raise click.BadParameter(f"No user with email {email}.", param_hint='--email')
+        token, row = new_token(user, name, token_resolver.secret)
+        db.session.commit()
+        print(f"Token {row.id} for {user.username}: {token}")
+
+@app.cli.command("revoke-token")
+@click.argument('token_id', type=int)
+def revoke_token(token_id):
+    """Revokes an /api/v1 token (other processes stop accepting it within API_TOKEN_CACHE_TTL)."""
+    from datetime import datetime
+    from project.models import ApiToken
+
+    with app.app_context():
+        row = db.session.get(ApiToken, token_id)
+        if row is None:
+            raise click.BadParameter(f"No token with id {token_id}.", param_hint='TOKEN_ID')
+        row.revoked_at = row.revoked_at or datetime.utcnow()
+        db.session.commit()
+        print(f"Token {row.id} ({row.name}) revoked.")
 # ---------------------------------
 
 if __name__ == '__main__':
+    init_database(app) # development server convenience; deployments run flask init-db
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1 @@
+"""Offline performance benchmarks for the prediction pipeline (see benchmarks/run.py)."""
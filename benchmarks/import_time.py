@@ -0,0 +1,73 @@
+"""
+Startup budget check.
+
+Measures, in fresh interpreters, how long importing the app package and
+calling create_app() takes, and verifies that no heavy ML or data-feed library
+is imported along the way (they must load lazily on first use).
+
+    python -m benchmarks.import_time                  # default budget
+    python -m benchmarks.import_time --budget 0.8 --runs 5
+
+Exits with status 1 when the median startup exceeds the budget or a lazy
+module was imported eagerly.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+# Must not be imported by create_app()
+LAZY_MODULES = ('sklearn', 'xgboost', 'yfinance', 'scipy')
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+from project import create_app
+from config import Config
+
+class ProbeConfig(Config):
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///' + sys.argv[1]
+
+create_app(ProbeConfig)
+elapsed = time.perf_counter() - start
+print(json.dumps({'seconds': elapsed,
+                  'loaded': sorted(m for m in %r if m in sys.modules)}))
+""" % (LAZY_MODULES,)
+
+
+def probe(workdir):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    output = subprocess.run([sys.executable, '-c', PROBE, os.path.join(workdir, 'probe.db')],
+                            cwd=root, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--budget', type=float, default=1.5, help="median startup budget in seconds")
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix='stock-import-') as workdir:
+        probe(workdir)  # warm the bytecode and OS file caches
+        results = [probe(workdir) for _ in range(args.runs)]
+
+    median = statistics.median(r['seconds'] for r in results)
+    loaded = sorted({m for r in results for m in r['loaded']})
+    print(f"create_app() startup: median {median * 1000:.0f}ms over {args.runs} runs (budget {args.budget * 1000:.0f}ms)")
+
+    failed = False
+    if loaded:
+        print(f"Eagerly imported: {', '.join(loaded)}")
+        failed = True
+    if median > args.budget:
+        print("Startup is over budget.")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,243 @@
+"""
+Prediction pipeline benchmarks.
+
+Runs entirely offline: the price store is pointed at SyntheticSource and every
+store, cache and the database live in a temporary directory.
+
+    python -m benchmarks.run                                  # run all, write benchmarks/results.json
+    python -m benchmarks.run --only fit --repeat 3            # names containing 'fit'
+    python -m benchmarks.run --output new.json --compare baseline.json --threshold 0.2
+
+With --compare the run exits with status 1 when any benchmark's median is more
+than --threshold (fractional) slower than in the baseline file.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+from datetime import date, timedelta
+
+HISTORY_LENGTHS = (250, 500, 1000)
+FETCH_LENGTHS = (500, 2500)
+BENCH_STOCK = 'TCS'
+
+
+def measure(fn, repeat, warmup=1):
+    """Runs fn warmup + repeat times and summarizes the timed runs (seconds)."""
+    for _ in range(warmup):
+        fn()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return {
+        'median': statistics.median(times),
+        'min': min(times),
+        'mean': statistics.fmean(times),
+        'stdev': statistics.stdev(times) if len(times) > 1 else 0.0,
+        'repeat': repeat,
+    }
+
+
+# --- Environment ---
+
+def make_app(workdir, source):
+    """Flask app with every store under workdir and the synthetic feed as data source."""
+    from config import Config
+    from project import create_app, init_database
+    from project.data_store import price_store
+
+    class BenchConfig(Config):
+        TESTING = True
+        WTF_CSRF_ENABLED = False
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(workdir, 'app.db')
+        SQLALCHEMY_ENGINE_OPTIONS = {'pool_pre_ping': True}
+        PRICE_STORE_DIR = os.path.join(workdir, 'price_store')
+        MODEL_CACHE_DIR = os.path.join(workdir, 'model_cache')
+        JOB_STATE_DIR = os.path.join(workdir, 'jobs')
+        SINGLE_FLIGHT_LOCK_DIR = os.path.join(workdir, 'locks')
+        BACKTEST_DIR = os.path.join(workdir, 'backtests')
+        FEATURE_STORE_DIR = os.path.join(workdir, 'features')
+        LOG_SPOOL_DIR = os.path.join(workdir, 'log_spool')
+        PREDICT_EXECUTOR = 'thread'
+        PRETRAIN_SCHEDULER_ENABLED = False
+        ADMISSION_USER_RATE = 0  # timed calls would otherwise hit the per-user rate limit
+
+    app = create_app(BenchConfig)
+    init_database(app)
+    price_store.set_source(source)
+    return app
+
+
+def history(source, ticker, rows):
+    """The last `rows` synthetic bars before today, as returned by the price store."""
+    frame = source.fetch(ticker, date.today() - timedelta(days=rows * 2), date.today())
+    return frame.tail(rows).reset_index(drop=True)
+
+
+# --- Benchmarks (each returns a list of (name, fn, repeat cap)) ---
+
+def bench_fetch(source, ctx):
+    from project.data_store import normalize_ohlcv
+    cases = []
+    for rows in FETCH_LENGTHS:
+        raw = source.raw_download('TCS.NS', date.today() - timedelta(days=rows * 2), date.today()).tail(rows)
+        cases.append((f'fetch_postprocess[{rows}]', lambda raw=raw: normalize_ohlcv(raw, 'TCS.NS'), None))
+    return cases
+
+
+def bench_fit(source, ctx):
+    from project.ml_logic import MODELS, fit_model
+    from project.features import compute_features
+    cases = []
+    for rows in HISTORY_LENGTHS:
+        df = history(source, 'TCS.NS', rows)
+        features = compute_features(df)
+        cases.append((f'features[{rows}]', lambda df=df: compute_features(df), None))
+        for model_name in MODELS:
+            cases.append((f'fit[{model_name}][{rows}]',
+                          lambda m=model_name, df=df, f=features: fit_model(m, df, f), 3))
+    return cases
+
+
+def bench_confidence(source, ctx):
+    from project.ml_logic import fit_model, estimate_confidence
+    from project.backtest import walk_forward
+    df = history(source, 'TCS.NS', 500)
+    backtest = walk_forward(df, lambda train_df: fit_model('Linear Regression', train_df), n_folds=8)
+    model = fit_model('Linear Regression', df)
+    cases = []
+    for days in (16, 252):
+        dates = [model.last_date + timedelta(days=i + 1) for i in range(days)]
+        prices = model.predict_dates(dates)
+        cases.append((f'estimate_confidence[{days}]',
+                      lambda d=dates, p=prices: estimate_confidence(backtest, model.last_date, d, p), None))
+    return cases
+
+
+def bench_serialize(source, ctx):
+    from project.ml_logic import train_and_predict
+    with ctx['app'].app_context():
+        result = train_and_predict(BENCH_STOCK, 'Linear Regression', ctx['prediction_date'])
+    return [('serialize_result', lambda: json.dumps(result), None)]
+
+
+def bench_predict(source, ctx):
+    from project.ml_logic import MODELS, run_backtest
+    client = ctx['client']
+    cases = []
+    for model_name in MODELS:
+        # Backtest up front, as the nightly pre-training would: a miss on the warm-up call
+        # queues one in the background and the timed calls would measure the contention
+        with ctx['app'].app_context():
+            run_backtest(BENCH_STOCK, model_name)
+        body = {'stock': BENCH_STOCK, 'model': model_name, 'prediction_date': ctx['prediction_date']}
+
+        def post(body=body):
+            response = client.post('/predict', json=body)
+            assert response.status_code == 200, response.get_data(as_text=True)
+            assert not response.get_json().get('confidence_pending'), "backtest was not precomputed"
+
+        # The warm-up call trains and caches; timed calls measure the cached path
+        cases.append((f'predict_e2e[{model_name}]', post, None))
+    return cases
+
+
+BENCHMARKS = [bench_fetch, bench_fit, bench_confidence, bench_serialize, bench_predict]
+
+
+# --- Results ---
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(results, baseline, threshold):
+    """Prints a comparison table and returns the names of regressed benchmarks."""
+    regressions = []
+    print(f"\n{'benchmark':<45} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, current in results.items():
+        before = baseline.get(name)
+        if before is None:
+            print(f"{name:<45} {'-':>10} {current['median'] * 1000:9.2f}ms {'new':>8}")
+            continue
+        change = current['median'] / before['median'] - 1.0 if before['median'] else 0.0
+        flag = ''
+        if change > threshold:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print(f"{name:<45} {before['median'] * 1000:8.2f}ms {current['median'] * 1000:8.2f}ms {change:+7.1%}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output', default=os.path.join(os.path.dirname(__file__), 'results.json'))
+    parser.add_argument('--compare', metavar='BASELINE', help="baseline results JSON to compare against")
+    parser.add_argument('--threshold', type=float, default=0.15, help="allowed median slowdown (0.15 = 15%%)")
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--only', action='append', default=[], help="run benchmarks whose name contains this")
+    args = parser.parse_args(argv)
+
+    warnings.filterwarnings('ignore')
+    from benchmarks.synthetic import SyntheticSource
+
+    workdir = tempfile.mkdtemp(prefix='stock-bench-')
+    results = {}
+    try:
+        source = SyntheticSource()
+        app = make_app(workdir, source)
+        client = app.test_client()
+        response = client.post('/login', data={'email': 'admin@app.com', 'password': 'admin123'})
+        if response.status_code != 302:
+            raise SystemExit("Could not log in the benchmark user.")
+        ctx = {'app': app, 'client': client,
+               'prediction_date': (date.today() + timedelta(days=30)).strftime('%Y-%m-%d')}
+
+        for make_cases in BENCHMARKS:
+            for name, fn, cap in make_cases(source, ctx):
+                if args.only and not any(part in name for part in args.only):
+                    continue
+                repeat = min(args.repeat, cap) if cap else args.repeat
+                results[name] = measure(fn, repeat)
+                print(f"{name:<45} median {results[name]['median'] * 1000:9.2f}ms  (n={repeat})")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    with open(args.output, 'w') as fh:
+        json.dump({
+            'meta': {
+                'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'git_revision': git_revision(),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'cpu_count': os.cpu_count(),
+            },
+            'results': results,
+        }, fh, indent=2)
+    print(f"\nWrote {len(results)} results to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as fh:
+            baseline = json.load(fh)['results']
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}.")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
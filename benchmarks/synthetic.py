@@ -0,0 +1,57 @@
+"""
+Deterministic synthetic OHLCV feed.
+
+Each ticker gets a geometric random walk seeded from its name, generated once
+over a fixed calendar (weekdays from EPOCH to LAST_DATE). A bar therefore has
+the same value no matter which window is requested, so the price store's delta
+refreshes behave exactly as they would against a real feed.
+"""
+import zlib
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from project.data_store import DataSource, normalize_ohlcv, PRICE_COLUMNS
+
+EPOCH = date(2015, 1, 1)
+LAST_DATE = date(2035, 12, 31)
+
+
+class SyntheticSource(DataSource):
+    """Offline stand-in for YFinanceSource with reproducible prices per ticker."""
+
+    def __init__(self, start_price=100.0, drift=0.0003, volatility=0.015):
+        self.start_price = start_price
+        self.drift = drift
+        self.volatility = volatility
+        self._series = {}
+
+    def series(self, ticker):
+        """Full synthetic history for ticker, indexed by date."""
+        if ticker not in self._series:
+            rng = np.random.default_rng(zlib.crc32(ticker.encode('utf-8')))
+            dates = pd.bdate_range(EPOCH, LAST_DATE, name='Date')
+            returns = rng.normal(self.drift, self.volatility, len(dates))
+            close = self.start_price * np.exp(np.cumsum(returns))
+            spread = np.abs(rng.normal(0.0, self.volatility / 2, len(dates)))
+            open_ = close * np.exp(rng.normal(0.0, self.volatility / 3, len(dates)))
+            self._series[ticker] = pd.DataFrame({
+                'Open': open_,
+                'High': np.maximum(open_, close) * (1 + spread),
+                'Low': np.minimum(open_, close) * (1 - spread),
+                'Close': close,
+                'Volume': rng.lognormal(13.0, 0.5, len(dates)).round(),
+            }, index=dates)
+        return self._series[ticker]
+
+    def raw_download(self, ticker, start, end):
+        """Bars in [start, end) shaped like yf.download output (MultiIndex columns, Date index)."""
+        df = self.series(ticker)
+        df = df[(df.index >= pd.Timestamp(start)) & (df.index < pd.Timestamp(end))][PRICE_COLUMNS]
+        df = df[['Close', 'High', 'Low', 'Open', 'Volume']].copy()
+        df.columns = pd.MultiIndex.from_product([df.columns, [ticker]], names=['Price', 'Ticker'])
+        return df
+
+    def fetch(self, ticker, start, end):
+        return normalize_ohlcv(self.raw_download(ticker, start, end), ticker)
@@ -13,4 +13,123 @@ class Config:
     # Use os.path.join to create a platform-independent path
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 
                                              'sqlite:///' + os.path.join(basedir, 'instance', 'app.db'))
-    SQLALCHEMY_TRACK_MODIFICATIONS = False
\ No newline at end of file
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_pre_ping': True,
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)), # seconds
+    }
+    if not SQLALCHEMY_DATABASE_URI.startswith('sqlite'):
+        SQLALCHEMY_ENGINE_OPTIONS.update(
+            pool_size=int(os.environ.get('DB_POOL_SIZE', 5)),
+            max_overflow=int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+        )
+    # SQLite: WAL lets readers run alongside the (single) writer
+    SQLITE_WAL = os.environ.get('SQLITE_WAL', '1').lower() in ('1', 'true', 'yes')
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL') # NORMAL is durable enough under WAL
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+
+    # Buffered PredictionLog writer (rows are bulk-inserted by a background thread)
+    LOG_WRITER_ENABLED = os.environ.get('LOG_WRITER_ENABLED', '1').lower() in ('1', 'true', 'yes')
+    LOG_FLUSH_SIZE = int(os.environ.get('LOG_FLUSH_SIZE', 100)) # rows
+    LOG_FLUSH_INTERVAL = float(os.environ.get('LOG_FLUSH_INTERVAL', 1.0)) # seconds
+    # Failed flushes back off exponentially up to LOG_FLUSH_MAX_BACKOFF seconds; after
+    # LOG_FLUSH_RETRIES attempts the rows that still fail are dead-lettered
+    LOG_FLUSH_RETRIES = int(os.environ.get('LOG_FLUSH_RETRIES', 8))
+    LOG_FLUSH_MAX_BACKOFF = float(os.environ.get('LOG_FLUSH_MAX_BACKOFF', 60))
+    # Append-only spool so queued rows survive a crash (set to '' to keep them in memory only)
+    LOG_SPOOL_DIR = os.environ.get('LOG_SPOOL_DIR', os.path.join(basedir, 'instance', 'log_spool'))
+
+    # Local price store (one .npz file per ticker)
+    PRICE_STORE_DIR = os.environ.get('PRICE_STORE_DIR', os.path.join(basedir, 'instance', 'price_store'))
+    # Seconds before a ticker whose last bar is not final (missing, or fetched before the close) is re-checked
+    PRICE_STORE_MAX_AGE = int(os.environ.get('PRICE_STORE_MAX_AGE', 900))
+    # Bulk refreshes download stale tickers in batches of this size; sources that allow
+    # concurrent downloads (yfinance does not) can run several batches at a time
+    PRICE_FETCH_BATCH_SIZE = int(os.environ.get('PRICE_FETCH_BATCH_SIZE', 50))
+    PRICE_FETCH_WORKERS = int(os.environ.get('PRICE_FETCH_WORKERS', 1))
+
+    # Stocks covered by the app (CSV with name,ticker,sector columns)
+    UNIVERSE_FILE = os.environ.get('UNIVERSE_FILE', os.path.join(basedir, 'project', 'data', 'nse_universe.csv'))
+
+    # Trained model cache (in-process LRU + serialized copies on disk)
+    MODEL_CACHE_DIR = os.environ.get('MODEL_CACHE_DIR', os.path.join(basedir, 'instance', 'model_cache'))
+    MODEL_CACHE_MAX_MB = int(os.environ.get('MODEL_CACHE_MAX_MB', 512))
+
+    # Background prediction jobs (POST /predict?async=1)
+    PREDICT_WORKERS = int(os.environ.get('PREDICT_WORKERS', os.cpu_count() or 1))
+    PREDICT_EXECUTOR = os.environ.get('PREDICT_EXECUTOR', 'process') # 'process' or 'thread'
+    JOB_STATE_DIR = os.environ.get('JOB_STATE_DIR', os.path.join(basedir, 'instance', 'jobs'))
+    JOB_RESULT_TTL = int(os.environ.get('JOB_RESULT_TTL', 600)) # seconds
+    # Server-Sent Events streams keep a web worker busy while they are open; only enable
+    # them with async (gevent/eventlet) workers. Otherwise clients poll /jobs/<id> and the
+    # 'Online RLS' live updates (/online/<stock>/stream) are off
+    SSE_ENABLED = os.environ.get('SSE_ENABLED', '0').lower() in ('1', 'true', 'yes')
+
+    # Admission control in front of the training pool (see project/admission.py)
+    ADMISSION_SLOTS = int(os.environ.get('ADMISSION_SLOTS', 0)) # concurrent fits; 0 = PREDICT_WORKERS
+    ADMISSION_QUEUE_SIZE = int(os.environ.get('ADMISSION_QUEUE_SIZE', 64)) # waiting fits, all users
+    ADMISSION_USER_CONCURRENCY = int(os.environ.get('ADMISSION_USER_CONCURRENCY', 2)) # running fits per user
+    ADMISSION_USER_QUEUE = int(os.environ.get('ADMISSION_USER_QUEUE', 16)) # waiting requests per user (a batch counts once)
+    ADMISSION_USER_RATE = float(os.environ.get('ADMISSION_USER_RATE', 30)) # requests per minute per user (0 = off)
+    ADMISSION_USER_BURST = int(os.environ.get('ADMISSION_USER_BURST', 10))
+    ADMISSION_DEADLINE = float(os.environ.get('ADMISSION_DEADLINE', 60)) # seconds per request
+
+    # POST /predict/batch
+    BATCH_MAX_ITEMS = int(os.environ.get('BATCH_MAX_ITEMS', 200))
+
+    # GET /series/<stock> browser cache lifetime (seconds) before revalidating with the ETag
+    SERIES_MAX_AGE = int(os.environ.get('SERIES_MAX_AGE', 300))
+
+    # Cross-process single-flight locks (set to '' to coalesce within a process only)
+    SINGLE_FLIGHT_LOCK_DIR = os.environ.get('SINGLE_FLIGHT_LOCK_DIR', os.path.join(basedir, 'instance', 'locks'))
+
+    # Optional bearer token required to scrape /metrics
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+    # /api/v1 bearer tokens: HMAC key for the stored hashes (defaults to SECRET_KEY;
+    # changing it invalidates every token) and the resolver cache
+    API_TOKEN_SECRET = os.environ.get('API_TOKEN_SECRET')
+    API_TOKEN_CACHE_TTL = int(os.environ.get('API_TOKEN_CACHE_TTL', 60)) # seconds, also the revocation delay
+    API_TOKEN_CACHE_SIZE = int(os.environ.get('API_TOKEN_CACHE_SIZE', 1024))
+
+    # Walk-forward backtests behind the confidence labels and error bands
+    BACKTEST_DIR = os.environ.get('BACKTEST_DIR', os.path.join(basedir, 'instance', 'backtests'))
+    BACKTEST_FOLDS = int(os.environ.get('BACKTEST_FOLDS', 8))
+    BACKTEST_WORKERS = int(os.environ.get('BACKTEST_WORKERS', os.cpu_count() or 1)) # threads per backtest
+
+    # 'Auto' model selection (time-series cross-validation over MODELS and a small grid)
+    SELECTION_BUDGET_SECONDS = float(os.environ.get('SELECTION_BUDGET_SECONDS', 20)) # wall-clock cap per search
+    SELECTION_FOLDS = int(os.environ.get('SELECTION_FOLDS', 4))
+    SELECTION_MIN_FOLDS = int(os.environ.get('SELECTION_MIN_FOLDS', 2)) # folds before a candidate can be abandoned
+    SELECTION_ABANDON_MARGIN = float(os.environ.get('SELECTION_ABANDON_MARGIN', 0.5)) # abandon when 50% worse than the best
+    SELECTION_WORKERS = int(os.environ.get('SELECTION_WORKERS', os.cpu_count() or 1))
+    SELECTION_EXECUTOR = os.environ.get('SELECTION_EXECUTOR', 'process') # 'process' or 'thread'
+
+    # Persisted per-ticker technical feature matrices
+    FEATURE_STORE_DIR = os.environ.get('FEATURE_STORE_DIR', os.path.join(basedir, 'instance', 'features'))
+
+    # Nightly pre-training of every stock/model pair (see project/pretrain.py)
+    MARKET_TIMEZONE = os.environ.get('MARKET_TIMEZONE', 'Asia/Kolkata')
+    MARKET_CLOSE = os.environ.get('MARKET_CLOSE', '15:30') # exchange-local HH:MM
+    PRETRAIN_SCHEDULER_ENABLED = os.environ.get('PRETRAIN_SCHEDULER_ENABLED', '0').lower() in ('1', 'true', 'yes')
+    PRETRAIN_RUN_AT = os.environ.get('PRETRAIN_RUN_AT', '16:15') # exchange-local HH:MM, weekdays
+    PRETRAIN_WORKERS = int(os.environ.get('PRETRAIN_WORKERS', os.cpu_count() or 1))
+    PRETRAIN_HORIZON_DAYS = int(os.environ.get('PRETRAIN_HORIZON_DAYS', 90)) # calendar days of trading days per pair
+    PRETRAIN_SHARD = os.environ.get('PRETRAIN_SHARD') # 'INDEX/COUNT' to pre-train one shard of the universe
+    PRETRAIN_MODELS = [name.strip() for name in os.environ.get('PRETRAIN_MODELS', '').split(',') if name.strip()] # empty: all
+
+    # GET /screener over the precomputed forecasts
+    SCREENER_DEFAULT_LIMIT = int(os.environ.get('SCREENER_DEFAULT_LIMIT', 20))
+    SCREENER_MAX_LIMIT = int(os.environ.get('SCREENER_MAX_LIMIT', 500))
+
+    # NSE trading calendar (weekends plus this holiday list) and POST /forecast/range
+    TRADING_HOLIDAYS_FILE = os.environ.get('TRADING_HOLIDAYS_FILE',
+                                           os.path.join(basedir, 'project', 'data', 'nse_holidays.csv'))
+    FORECAST_MAX_HORIZON_DAYS = int(os.environ.get('FORECAST_MAX_HORIZON_DAYS', 366)) # ranges also stop at the holiday list's last year
+    FORECAST_MAX_POINTS = int(os.environ.get('FORECAST_MAX_POINTS', 120)) # downsample longer ranges for charting
+
+    # Live quotes for the 'Online RLS' model (GET /online/<stock>/stream)
+    QUOTE_SOURCE = os.environ.get('QUOTE_SOURCE', 'poll') # 'poll' the data source, or 'replay' CSV files
+    QUOTE_POLL_INTERVAL = float(os.environ.get('QUOTE_POLL_INTERVAL', 60))
+    QUOTE_REPLAY_DIR = os.environ.get('QUOTE_REPLAY_DIR', os.path.join(basedir, 'instance', 'quotes'))
+    QUOTE_REPLAY_DELAY = float(os.environ.get('QUOTE_REPLAY_DELAY', 1.0))
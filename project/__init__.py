@@ -1,7 +1,20 @@
 from flask import Flask
 from config import Config
-from .extensions import db, login_manager, bcrypt
-from .models import User, PredictionLog
+from .extensions import db, login_manager, bcrypt, configure_sqlite
+from .data_store import price_store
+from .model_cache import model_cache
+from .jobs import job_queue
+from .singleflight import single_flight
+from .backtest import backtest_cache
+from .features import feature_store
+from .trading_calendar import trading_calendar
+from .log_writer import log_writer
+from .online import online_hub
+from .model_selection import model_selector
+from .universe import universe
+from .api_auth import token_resolver
+from .admission import admission
+from .models import User, PredictionLog, Forecast
 import os
 
 def create_app(config_class=Config):
@@ -22,8 +35,22 @@ def create_app(config_class=Config):
 
     # Initialize Flask extensions
     db.init_app(app)
+    configure_sqlite(app)
     login_manager.init_app(app)
     bcrypt.init_app(app)
+    universe.init_app(app)
+    price_store.init_app(app)
+    model_cache.init_app(app)
+    job_queue.init_app(app)
+    single_flight.init_app(app)
+    backtest_cache.init_app(app)
+    feature_store.init_app(app)
+    trading_calendar.init_app(app)
+    log_writer.init_app(app)
+    online_hub.init_app(app)
+    model_selector.init_app(app)
+    token_resolver.init_app(app)
+    admission.init_app(app)
 
     # Configure Flask-Login
     login_manager.login_view = 'main.login'
@@ -43,13 +70,47 @@ def create_app(config_class=Config):
     #
     from .routes import main as main_blueprint
     app.register_blueprint(main_blueprint)
+    from .api import api as api_blueprint
+    app.register_blueprint(api_blueprint)
 
-    # Create database tables
+    # Background nightly pre-training (only one process per host runs each slot)
+    if app.config.get('PRETRAIN_SCHEDULER_ENABLED'):
+        from .pretrain import start_scheduler
+        start_scheduler(app)
+
+    return app
+
+
+def init_database(app, create_admin=True):
+    """
+    Creates missing tables and indexes and, optionally, the default admin user.
+    Run once per deployment (flask init-db), not on every worker start.
+    """
     with app.app_context():
+        # Forecast rows are derived data (rewritten by every pre-training run), so a
+        # table from an older schema is dropped and recreated rather than migrated
+        inspector = db.inspect(db.engine)
+        if inspector.has_table(Forecast.__tablename__):
+            existing = {column['name'] for column in inspector.get_columns(Forecast.__tablename__)}
+            if not set(Forecast.__table__.columns.keys()) <= existing:
+                Forecast.__table__.drop(db.engine)
+        # Prediction logs are kept, so nullable columns added since (e.g. timings) are added in place
+        if inspector.has_table(PredictionLog.__tablename__):
+            existing = {column['name'] for column in inspector.get_columns(PredictionLog.__tablename__)}
+            with db.engine.begin() as connection:
+                for column in PredictionLog.__table__.columns:
+                    if column.name not in existing and column.nullable:
+                        column_type = column.type.compile(dialect=db.engine.dialect)
+                        connection.execute(db.text(
+                            f'ALTER TABLE {PredictionLog.__tablename__} ADD COLUMN {column.name} {column_type}'))
         db.create_all()
-        
+        # create_all skips indexes added to tables that already exist
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(db.engine, checkfirst=True)
+
         # --- Create Admin User (Optional) ---
-        if not User.query.filter_by(email='admin@app.com').first():
+        if create_admin and not User.query.filter_by(email='admin@app.com').first():
             print("Creating default admin user...")
             admin_user = User(
                 username='admin',
@@ -60,5 +121,3 @@ def create_app(config_class=Config):
             db.session.add(admin_user)
             db.session.commit()
             print("Admin user created.")
-
-    return app
\ No newline at end of file
@@ -0,0 +1,362 @@
+"""
+Admission control for CPU-heavy training work.
+
+Requests that may fit a model (/predict, /predict/batch, /forecast/range and
+their /api/v1 counterparts) go through here instead of straight to the worker
+pool:
+
+- each user has a token bucket (ADMISSION_USER_RATE requests per minute, bursts
+  of ADMISSION_USER_BURST) and may have at most ADMISSION_USER_QUEUE requests
+  waiting; going over either answers 429. A batch is admitted as one request,
+  however many fits it needs;
+- all users share one bounded queue (ADMISSION_QUEUE_SIZE fits) in front of
+  ADMISSION_SLOTS training slots (by default one per pool worker). Free slots
+  go round-robin across users, and no user runs more than
+  ADMISSION_USER_CONCURRENCY fits at once while others are waiting, so a burst
+  from one user only delays that user. When nobody else is waiting, a user's
+  batch may borrow the idle slots, except one that is kept free for the next
+  arrival. A full queue answers 503 to new requests;
+- every request has a deadline (ADMISSION_DEADLINE seconds). Work still queued
+  at the deadline is dropped without running; a synchronous caller whose fit is
+  still running gets a 503 while the fit finishes in the background and lands
+  in the model cache for the retry.
+
+Low-priority background work (backtests) has its own lane: it only starts
+while no user work is waiting and a slot is idle, runs one job at a time on a
+separate niced worker and never takes a slot, so user requests never wait
+behind it.
+
+Rejections carry a Retry-After estimate based on the recent time per fit.
+Limits are per process: each gunicorn worker admits into its own pool.
+"""
+import heapq
+import itertools
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, InvalidStateError, TimeoutError as FutureTimeout
+from functools import partial
+
+from config import Config
+from .jobs import job_queue
+from .metrics import admission_wait
+
+
+class AdmissionError(Exception):
+    """Work was not admitted. status is the HTTP status to answer with."""
+    status = 503
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class TooManyRequests(AdmissionError):
+    status = 429
+
+
+class Overloaded(AdmissionError):
+    pass
+
+
+class DeadlineExceeded(AdmissionError):
+    pass
+
+
+class _Ticket:
+    """One queued or running unit of work; tickets with the same group belong to one request."""
+    __slots__ = ('seq', 'user_id', 'fn', 'args', 'deadline', 'group', 'future', 'enqueued_at', 'started_at')
+
+    def __init__(self, seq, user_id, fn, args, deadline, group=None):
+        self.seq = seq
+        self.user_id = user_id
+        self.fn = fn
+        self.args = args
+        self.deadline = deadline
+        self.group = self if group is None else group
+        self.future = Future()
+        self.enqueued_at = time.monotonic()
+        self.started_at = None
+
+
+def _resolve(future, result=None, error=None):
+    """Completes future unless it already was (e.g. expired in the queue)."""
+    try:
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+    except InvalidStateError:
+        pass
+
+
+class UserExecutor:
+    """
+    Executor-like view (submit(fn, *args)) whose work is admitted for one user
+    and request. The request is admitted with its first submit; the rest of its
+    fits are then queued without counting against the user's queue limit.
+    """
+
+    def __init__(self, controller, user_id, deadline):
+        self.controller = controller
+        self.user_id = user_id
+        self.deadline = deadline
+        self._tickets = []
+
+    def submit(self, fn, *args):
+        ticket = self.controller._enqueue(self.user_id, fn, args, self.deadline, group=self,
+                                          admitted=bool(self._tickets))
+        self._tickets.append(ticket)
+        return ticket.future
+
+    def cancel_pending(self):
+        """Drops this request's work that has not started yet (e.g. after part of a batch was rejected)."""
+        for ticket in self._tickets:
+            self.controller._cancel(ticket)
+
+
+class AdmissionController:
+    """Rate limits, fair queueing and deadlines in front of the training pool."""
+
+    def __init__(self):
+        self.slots = Config.ADMISSION_SLOTS or Config.PREDICT_WORKERS
+        self.queue_size = Config.ADMISSION_QUEUE_SIZE
+        self.user_concurrency = Config.ADMISSION_USER_CONCURRENCY
+        self.user_queue = Config.ADMISSION_USER_QUEUE
+        self.rate = Config.ADMISSION_USER_RATE
+        self.burst = Config.ADMISSION_USER_BURST
+        self.deadline = Config.ADMISSION_DEADLINE
+        self._queues = OrderedDict()  # user id -> deque of waiting tickets, in round-robin order
+        self._running = {}            # user id -> number of running tickets
+        self._queued = 0
+        self._active = 0
+        self._buckets = {}            # user id -> (tokens, updated_at)
+        self._deadlines = []          # heap of (deadline, seq, ticket) for waiting tickets
+        self._background = deque()    # waiting background tickets (user_id None)
+        self._background_running = False
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._reaper = None
+        self._service_time = 1.0      # moving average of seconds per fit, for Retry-After
+        # Metrics
+        self.completed = 0
+        self.rejected = {'rate': 0, 'user_queue': 0, 'queue_full': 0, 'deadline': 0}
+
+    def init_app(self, app):
+        self.configure(app.config)
+
+    def configure(self, config):
+        self.slots = config.get('ADMISSION_SLOTS') or config.get('PREDICT_WORKERS') or self.slots
+        self.queue_size = config.get('ADMISSION_QUEUE_SIZE', self.queue_size)
+        self.user_concurrency = config.get('ADMISSION_USER_CONCURRENCY', self.user_concurrency)
+        self.user_queue = config.get('ADMISSION_USER_QUEUE', self.user_queue)
+        self.rate = config.get('ADMISSION_USER_RATE', self.rate)
+        self.burst = config.get('ADMISSION_USER_BURST', self.burst)
+        self.deadline = config.get('ADMISSION_DEADLINE', self.deadline)
+
+    # --- Public API ---
+
+    def check_rate(self, user_id):
+        """Takes a token from the user's bucket; raises TooManyRequests when it is empty."""
+        if not self.rate:
+            return
+        now = time.monotonic()
+        with self._cond:
+            tokens, updated_at = self._buckets.get(user_id, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated_at) * self.rate / 60.0)
+            if tokens < 1:
+                self._buckets[user_id] = (tokens, now)
+                self.rejected['rate'] += 1
+                raise TooManyRequests("Too many prediction requests, please slow down.",
+                                      (1 - tokens) * 60.0 / self.rate)
+            self._buckets[user_id] = (tokens - 1, now)
+
+    def submit(self, user_id, fn, args=(), deadline=None):
+        """
+        Queues fn(*args) for a training slot and returns a Future. Raises
+        TooManyRequests or Overloaded when it cannot be queued; the future fails
+        with DeadlineExceeded if the deadline (a time.monotonic() value) passes
+        before the work starts.
+        """
+        return self._enqueue(user_id, fn, args, deadline).future
+
+    def call(self, user_id, fn, args=(), deadline=None):
+        """Runs fn(*args) through admission and waits for it, at most until the deadline."""
+        deadline = deadline or time.monotonic() + self.deadline
+        ticket = self._enqueue(user_id, fn, args, deadline)
+        try:
+            return ticket.future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except FutureTimeout:
+            with self._cond:
+                if ticket.started_at is not None:  # still waiting ones are counted by the reaper
+                    self.rejected['deadline'] += 1
+                retry_after = self._service_time
+            raise DeadlineExceeded("The prediction did not finish in time; it keeps running, "
+                                   "please retry shortly.", retry_after) from None
+
+    def submit_background(self, fn, args=()):
+        """
+        Queues low-priority work in the background lane and returns a Future.
+        Raises Overloaded when ADMISSION_QUEUE_SIZE background jobs are already waiting.
+        """
+        with self._cond:
+            if len(self._background) >= self.queue_size:
+                raise Overloaded("Too much background work is waiting.", self._backlog_seconds())
+            ticket = _Ticket(next(self._seq), None, fn, tuple(args), None)
+            self._background.append(ticket)
+            started = self._dispatch()
+        self._start(started)
+        return ticket.future
+
+    def executor(self, user_id, deadline=None):
+        """An executor whose submit() goes through admission for user_id (batches, async jobs)."""
+        return UserExecutor(self, user_id, deadline or time.monotonic() + self.deadline)
+
+    def stats(self):
+        with self._cond:
+            return {'queued': self._queued, 'running': self._active, 'slots': self.slots,
+                    'background_queued': len(self._background),
+                    'background_running': int(self._background_running),
+                    'completed': self.completed, 'rejected': dict(self.rejected)}
+
+    # --- Internals ---
+
+    def _enqueue(self, user_id, fn, args, deadline, group=None, admitted=False):
+        """Queues one fit. admitted: it belongs to a request whose first fit was already accepted."""
+        with self._cond:
+            ticket = _Ticket(next(self._seq), user_id, fn, tuple(args),
+                             deadline or time.monotonic() + self.deadline, group)
+            waiting = self._queues.get(user_id)
+            if not admitted:
+                requests = len({queued.group for queued in waiting}) if waiting else 0
+                if requests >= self.user_queue:
+                    self.rejected['user_queue'] += 1
+                    raise TooManyRequests("Too many of your predictions are already waiting.",
+                                          len(waiting) / max(self.user_concurrency, 1) * self._service_time)
+                if self._queued >= self.queue_size:
+                    self.rejected['queue_full'] += 1
+                    raise Overloaded("The server is busy, please retry shortly.", self._backlog_seconds())
+
+            if waiting is None:
+                waiting = self._queues[user_id] = deque()
+            waiting.append(ticket)
+            self._queued += 1
+            heapq.heappush(self._deadlines, (ticket.deadline, ticket.seq, ticket))
+            self._ensure_reaper()
+            self._cond.notify_all()
+            started = self._dispatch()
+        self._start(started)
+        return ticket
+
+    def _cancel(self, ticket):
+        with self._cond:
+            if ticket.started_at is None and ticket.future.cancel():
+                self._unqueue(ticket)
+
+    def _unqueue(self, ticket):
+        """Takes a waiting ticket out of its user's queue (lock held)."""
+        waiting = self._queues[ticket.user_id]
+        waiting.remove(ticket)
+        if not waiting:
+            del self._queues[ticket.user_id]
+        self._queued -= 1
+
+    def _backlog_seconds(self):
+        return (self._queued / max(self.slots, 1) + 1) * self._service_time
+
+    def _dispatch(self):
+        """Hands free slots to waiting users in round-robin order (lock held). Returns the started tickets."""
+        started = []
+        while self._active < self.slots and self._queues:
+            user_id = next((user for user in self._queues
+                            if self._running.get(user, 0) < self.user_concurrency), None)
+            if user_id is None:
+                # Everyone waiting is at their concurrency limit: lend idle slots to the
+                # least busy of them, but keep one free so a new user starts right away
+                if self._active >= self.slots - 1:
+                    break
+                user_id = min(self._queues, key=lambda user: self._running.get(user, 0))
+            waiting = self._queues.pop(user_id)
+            ticket = waiting.popleft()
+            if waiting:
+                self._queues[user_id] = waiting  # back of the line
+            self._queued -= 1
+            ticket.future.set_running_or_notify_cancel()
+            self._active += 1
+            self._running[user_id] = self._running.get(user_id, 0) + 1
+            ticket.started_at = time.monotonic()
+            started.append(ticket)
+
+        # Background work only starts on an idle pool, one job at a time, and does not take a slot
+        while (self._background and not self._background_running
+               and not self._queues and self._active < self.slots):
+            ticket = self._background.popleft()
+            if not ticket.future.set_running_or_notify_cancel():
+                continue
+            self._background_running = True
+            ticket.started_at = time.monotonic()
+            started.append(ticket)
+        return started
+
+    def _start(self, tickets):
+        for ticket in tickets:
+            try:
+                if ticket.user_id is None:
+                    inner = job_queue.background_executor().submit(ticket.fn, *ticket.args)
+                else:
+                    admission_wait.observe(ticket.started_at - ticket.enqueued_at)
+                    inner = job_queue.executor().submit(ticket.fn, *ticket.args)
+            except Exception as e:
+                self._finish(ticket, error=e)
+                continue
+            inner.add_done_callback(partial(self._finish, ticket))
+
+    def _finish(self, ticket, inner=None, error=None):
+        with self._cond:
+            if ticket.user_id is None:
+                self._background_running = False
+            else:
+                self._active -= 1
+                self._running[ticket.user_id] -= 1
+                if not self._running[ticket.user_id]:
+                    del self._running[ticket.user_id]
+                self._service_time = 0.8 * self._service_time + 0.2 * (time.monotonic() - ticket.started_at)
+                self.completed += 1
+            started = self._dispatch()
+        if inner is not None and inner.cancelled():  # pool shut down under it
+            _resolve(ticket.future, error=Overloaded("The server is restarting, please retry.", 1))
+        elif inner is not None:
+            error = inner.exception()
+            _resolve(ticket.future, None if error else inner.result(), error)
+        else:
+            _resolve(ticket.future, error=error)
+        self._start(started)
+
+    def _ensure_reaper(self):
+        if self._reaper is None or not self._reaper.is_alive():
+            self._reaper = threading.Thread(target=self._reap, name='admission-reaper', daemon=True)
+            self._reaper.start()
+
+    def _reap(self):
+        """Fails waiting tickets whose deadline passed, so they never take a slot."""
+        while True:
+            with self._cond:
+                now = time.monotonic()
+                expired = []
+                while self._deadlines and self._deadlines[0][0] <= now:
+                    _, _, ticket = heapq.heappop(self._deadlines)
+                    if ticket.started_at is not None or ticket.future.cancelled():
+                        continue
+                    self._unqueue(ticket)
+                    self.rejected['deadline'] += 1
+                    expired.append(ticket)
+                retry_after = self._backlog_seconds()
+                if not expired:
+                    self._cond.wait(self._deadlines[0][0] - now if self._deadlines else None)
+            for ticket in expired:
+                _resolve(ticket.future, error=DeadlineExceeded(
+                    "The server is busy; the prediction was not started in time.", retry_after))
+
+
+admission = AdmissionController()
@@ -0,0 +1,84 @@
+"""
+Versioned JSON API for scripts and other services (/api/v1).
+
+Requests authenticate with a per-user bearer token (see api_auth) instead of
+the session cookie, so there is no login form, CSRF token or template
+rendering involved; every response is JSON.
+"""
+import time
+
+from flask import Blueprint, current_app, g, jsonify, request
+
+from .admission import admission, AdmissionError
+from .api_auth import token_required
+from .extensions import db
+from .metrics import request_latency
+from .ml_logic import train_and_predict
+from .pretrain import lookup_forecast
+from .routes import batch_predict_response, log_prediction, series_response
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+
+@api.route("/predict", methods=['POST'])
+@token_required
+def predict():
+    """
+    Single date prediction: {"stock": ..., "model": ..., "prediction_date": "YYYY-MM-DD"}.
+    With ?timings=1 (or "timings": true in the body) the stage timing breakdown is included.
+    """
+    request_start = time.perf_counter()
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Invalid request: Must be JSON"}), 400
+
+    stock_name = data.get('stock')
+    model_name = data.get('model')
+    prediction_date = data.get('prediction_date')
+    include_timings = request.args.get('timings', '0').lower() in ('1', 'true', 'yes') or data.get('timings') is True
+
+    if not all([stock_name, model_name, prediction_date]):
+        return jsonify({"error": "Missing required fields (stock, model, prediction_date)"}), 400
+
+    try:
+        result = lookup_forecast(stock_name, model_name, prediction_date, current_app.config)
+    except Exception as e:
+        current_app.logger.warning(f"Forecast lookup failed, falling back to training: {e}")
+        result = None
+
+    try:
+        if result is None:
+            admission.check_rate(g.api_user.id)
+            result = admission.call(g.api_user.id, train_and_predict, (stock_name, model_name, prediction_date))
+        if 'error' in result:
+            return jsonify(result), 400
+
+        write_seconds = log_prediction(g.api_user.id, stock_name, model_name, result)
+
+        timings = result.pop('timings', {})
+        if include_timings:
+            result['timings'] = dict(timings, log_write=round(write_seconds, 6))
+        request_latency.observe(time.perf_counter() - request_start, stock=stock_name, model=model_name)
+        return jsonify(result)
+
+    except AdmissionError:
+        raise
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"API prediction failed: {e}", exc_info=True)
+        return jsonify({"error": "An internal error occurred."}), 500
+
+
+@api.route("/predict/batch", methods=['POST'])
+@token_required
+def predict_batch():
+    """Same request and response as POST /predict/batch."""
+    return batch_predict_response(g.api_user.id)
+
+
+@api.route("/series/<stock_name>")
+@token_required
+def series(stock_name):
+    """Same as GET /series/<stock>, including ETag revalidation."""
+    return series_response(stock_name)
+
@@ -0,0 +1,115 @@
+"""
+API token authentication.
+
+Tokens are random strings handed to a user once ('flask create-token'). Only
+their HMAC-SHA256 (keyed with API_TOKEN_SECRET, falling back to SECRET_KEY) is
+stored, so checking a token is one HMAC plus an indexed lookup instead of a
+bcrypt password check. TokenResolver caches the resolved user per token hash
+for API_TOKEN_CACHE_TTL seconds, which also bounds how long a revoked token
+keeps working in other processes.
+"""
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from datetime import datetime
+from functools import wraps
+
+from flask import g, jsonify, request
+
+from config import Config
+from .extensions import db
+from .models import ApiToken
+
+TOKEN_PREFIX = 'spk_'
+
+# What API views see as the caller (a plain tuple, safe to cache across requests)
+ApiUser = namedtuple('ApiUser', ['id', 'username', 'is_admin', 'token_id'])
+
+
+def hash_token(token, secret):
+    return hmac.new(secret.encode('utf-8'), token.encode('utf-8'), hashlib.sha256).hexdigest()
+
+
+def create_token(user, name, secret):
+    """Adds an ApiToken for user and returns (token, row); the caller commits."""
+    token = TOKEN_PREFIX + secrets.token_urlsafe(32)
+    row = ApiToken(user_id=user.id, name=name, token_hash=hash_token(token, secret))
+    db.session.add(row)
+    return token, row
+
+
+class TokenResolver:
+    """Maps bearer tokens to ApiUser tuples through a small TTL + LRU cache."""
+
+    def __init__(self):
+        self.ttl = Config.API_TOKEN_CACHE_TTL
+        self.max_size = Config.API_TOKEN_CACHE_SIZE
+        self.secret = Config.API_TOKEN_SECRET or Config.SECRET_KEY
+        self._entries = OrderedDict()  # token hash -> (expires_at, ApiUser or None)
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.configure(app.config)
+
+    def configure(self, config):
+        self.ttl = config.get('API_TOKEN_CACHE_TTL', self.ttl)
+        self.max_size = config.get('API_TOKEN_CACHE_SIZE', self.max_size)
+        self.secret = config.get('API_TOKEN_SECRET') or config.get('SECRET_KEY') or self.secret
+        self.clear()
+
+    def resolve(self, token):
+        """Returns the ApiUser for a token, or None if it is unknown or revoked."""
+        if not token or not token.startswith(TOKEN_PREFIX):
+            return None
+        digest = hash_token(token, self.secret)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(digest)
+                return entry[1]
+
+        user = self._load(digest)
+        with self._lock:
+            # Unknown tokens are cached too, so retrying a bad token does not hit the database
+            self._entries[digest] = (now + self.ttl, user)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return user
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _load(self, digest):
+        row = ApiToken.query.filter_by(token_hash=digest).first()
+        if row is None or row.revoked_at is not None or not hmac.compare_digest(row.token_hash, digest):
+            return None
+        try:
+            db.session.execute(db.update(ApiToken).where(ApiToken.id == row.id)
+                               .values(last_used_at=datetime.utcnow()))
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error updating API token last use: {e}")
+        return ApiUser(row.user.id, row.user.username, bool(row.user.is_admin), row.id)
+
+
+token_resolver = TokenResolver()
+
+
+def token_required(f):
+    """Requires 'Authorization: Bearer <token>'; the caller is available as g.api_user."""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+        user = token_resolver.resolve(token.strip()) if scheme.lower() == 'bearer' else None
+        if user is None:
+            return jsonify({"error": "A valid API token is required."}), 401, {'WWW-Authenticate': 'Bearer'}
+        g.api_user = user
+        return f(*args, **kwargs)
+    return decorated_function
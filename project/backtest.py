@@ -0,0 +1,156 @@
+"""
+Walk-forward backtesting.
+
+Each model is refit on expanding windows of a ticker's history (one fold per
+forecast origin, folds fitted in parallel) and evaluated at several horizons
+after the origin. Errors are computed on stacked fold x horizon arrays, and the
+summary metrics are cached per (stock, model, data version) in memory and on
+disk, so they are computed once per trading day rather than per request.
+"""
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from config import Config
+
+# Horizons (in trading bars after the forecast origin) that every fold is scored on
+HORIZONS = (1, 5, 10, 21, 42, 63, 126)
+
+# MAPE upper bounds for each confidence label
+CONFIDENCE_LEVELS = ((0.02, "High"), (0.05, "Medium-High"), (0.10, "Medium"), (0.20, "Low"))
+
+
+def walk_forward(df, fit, n_folds=8, horizons=HORIZONS, max_workers=None, min_train=60):
+    """
+    Backtests fit(train_df) -> model (with .predict_dates) on expanding windows of df.
+
+    Returns a metrics dict with per-horizon MAPE, relative RMSE and MAE plus the
+    typical number of calendar days each horizon spans, or None when the history
+    is too short to backtest.
+    """
+    n = len(df)
+    min_train = max(min_train, n // 2)
+    if n - 1 <= min_train:
+        return None
+
+    dates = df['Date'].to_numpy().astype('datetime64[D]')
+    closes = df['Close'].to_numpy(dtype=float)
+    horizons = np.asarray(horizons)
+    origins = np.unique(np.linspace(min_train, n - 1, n_folds).astype(int))
+
+    # fold x horizon index of the bar being forecast (-1 where it lies beyond the data)
+    targets = origins[:, None] - 1 + horizons[None, :]
+    valid = targets < n
+    targets = np.where(valid, targets, -1)
+
+    def run_fold(i):
+        wanted = targets[i][valid[i]]
+        model = fit(df.iloc[:origins[i]])
+        prices = np.full(len(horizons), np.nan)
+        prices[valid[i]] = model.predict_dates(dates[wanted])
+        return prices
+
+    with ThreadPoolExecutor(max_workers=max_workers or os.cpu_count()) as executor:
+        predicted = np.vstack(list(executor.map(run_fold, range(len(origins)))))
+
+    actual = np.where(valid, closes[targets], np.nan)
+    errors = predicted - actual
+    keep = valid.any(axis=0)
+    with np.errstate(invalid='ignore'):
+        rel = errors / actual
+        span_days = (dates[targets] - dates[origins - 1][:, None]).astype(float)
+        span_days[~valid] = np.nan
+        metrics = {
+            'horizons': horizons[keep].tolist(),
+            'horizon_days': np.nanmedian(span_days, axis=0)[keep].tolist(),
+            'mape': np.nanmean(np.abs(rel), axis=0)[keep].tolist(),
+            'rel_rmse': np.sqrt(np.nanmean(rel ** 2, axis=0))[keep].tolist(),
+            'mae': np.nanmean(np.abs(errors), axis=0)[keep].tolist(),
+            'folds': int(len(origins)),
+        }
+    return metrics
+
+
+def relative_error(metrics, days_ahead, field='mape'):
+    """
+    Interpolates a relative error metric at the given calendar-day distances.
+    Beyond the longest backtested horizon the error grows with sqrt(time).
+    """
+    days_ahead = np.asarray(days_ahead, dtype=float)
+    known_days = np.asarray(metrics['horizon_days'])
+    known = np.asarray(metrics[field])
+    error = np.interp(days_ahead, known_days, known)
+    beyond = days_ahead > known_days[-1]
+    error[beyond] = known[-1] * np.sqrt(days_ahead[beyond] / known_days[-1])
+    return error
+
+
+def confidence_label(mape):
+    """Maps a mean absolute percentage error onto the dashboard's confidence labels."""
+    for bound, label in CONFIDENCE_LEVELS:
+        if mape <= bound:
+            return label
+    return "Very Low"
+
+
+class BacktestCache:
+    """Latest backtest metrics per (stock, model), in memory and as JSON on disk."""
+
+    def __init__(self, root=None):
+        self.root = root
+        self.n_folds = Config.BACKTEST_FOLDS
+        self.max_workers = Config.BACKTEST_WORKERS
+        self._entries = {}  # (stock, model) -> metrics
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.configure(app.config)
+
+    def configure(self, config):
+        self.root = config.get('BACKTEST_DIR') or self.root
+        self.n_folds = config.get('BACKTEST_FOLDS', self.n_folds)
+        self.max_workers = config.get('BACKTEST_WORKERS', self.max_workers)
+
+    def get(self, key):
+        """Returns cached metrics for a model cache style key, or None if stale/missing."""
+        with self._lock:
+            metrics = self._entries.get(key[:2])
+        if metrics is None or metrics.get('key') != list(key):
+            # Another process may already have stored metrics for the new data version
+            metrics = self._load(key)
+        if metrics is None or metrics.get('key') != list(key):
+            return None
+        with self._lock:
+            self._entries[key[:2]] = metrics
+        return metrics
+
+    def put(self, key, metrics):
+        metrics = dict(metrics, key=list(key), computed_at=time.time())
+        path = self._path(key)
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'w') as fh:
+            json.dump(metrics, fh)
+        os.replace(tmp, path)
+        with self._lock:
+            self._entries[key[:2]] = metrics
+        return metrics
+
+    def _path(self, key):
+        root = self.root or Config.BACKTEST_DIR
+        os.makedirs(root, exist_ok=True)
+        name = f'{key[0]}__{key[1]}'
+        return os.path.join(root, ''.join(c if c.isalnum() or c in '-_.' else '_' for c in name) + '.json')
+
+    def _load(self, key):
+        try:
+            with open(self._path(key)) as fh:
+                return json.load(fh)
+        except (OSError, ValueError):
+            return None
+
+
+backtest_cache = BacktestCache()
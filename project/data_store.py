@@ -0,0 +1,329 @@
+"""
+Local OHLCV price store.
+
+Every ticker is kept as one columnar .npz file (plus a small JSON file with
+freshness metadata) in the instance folder. Reads are served from disk (or
+from the in-process copy when the file has not changed) and the data source
+is only asked for bars newer than the last stored date.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, time as dtime
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pandas as pd
+
+from config import Config
+
+PRICE_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+logger = logging.getLogger(__name__)
+
+
+# --- Data Sources ---
+
+class DataSource:
+    """Base class for anything that can supply daily OHLCV bars."""
+
+    def fetch(self, ticker, start, end):
+        """
+        Returns a DataFrame with a 'Date' column plus PRICE_COLUMNS for
+        bars in [start, end). Must return an empty frame if there is no data.
+        """
+        raise NotImplementedError
+
+    def fetch_many(self, tickers, start, end):
+        """Returns {ticker: DataFrame} for several tickers; sources may batch this."""
+        return {ticker: self.fetch(ticker, start, end) for ticker in tickers}
+
+
+def normalize_ohlcv(df, ticker):
+    """Flattens yfinance style frames into Date + PRICE_COLUMNS."""
+    if df is None or df.empty:
+        return pd.DataFrame(columns=['Date'] + PRICE_COLUMNS)
+
+    df = df.reset_index()
+
+    # Ensure correct column names if MultiIndex was returned
+    if isinstance(df.columns, pd.MultiIndex):
+        df.columns = ['_'.join(col).strip('_') if col[1] else col[0] for col in df.columns.values]
+        df = df.rename(columns={'Date_': 'Date', f'Open_{ticker}': 'Open', f'High_{ticker}': 'High',
+                                f'Low_{ticker}': 'Low', f'Close_{ticker}': 'Close', f'Volume_{ticker}': 'Volume'})
+
+    df = df[['Date'] + PRICE_COLUMNS].dropna()
+    df['Date'] = pd.to_datetime(df['Date']).dt.tz_localize(None).dt.normalize()
+    return df.reset_index(drop=True)
+
+
+class YFinanceSource(DataSource):
+    """Downloads bars from Yahoo Finance (yfinance is imported on the first download)."""
+
+    # yf.download collects results in module-level state, so calls must not overlap
+    _download_lock = threading.Lock()
+
+    def fetch(self, ticker, start, end):
+        import yfinance as yf
+        with self._download_lock:
+            df = yf.download(ticker, start=start.strftime('%Y-%m-%d'), end=end.strftime('%Y-%m-%d'),
+                             progress=False)
+        return normalize_ohlcv(df, ticker)
+
+    def fetch_many(self, tickers, start, end):
+        import yfinance as yf
+        # One HTTP round-trip for all tickers instead of one per ticker
+        with self._download_lock:
+            df = yf.download(list(tickers), start=start.strftime('%Y-%m-%d'), end=end.strftime('%Y-%m-%d'),
+                             group_by='ticker', progress=False)
+        frames = {}
+        for ticker in tickers:
+            if isinstance(df.columns, pd.MultiIndex) and ticker in df.columns.get_level_values(0):
+                frames[ticker] = normalize_ohlcv(df[ticker], ticker)
+            else:
+                frames[ticker] = normalize_ohlcv(None, ticker)
+        return frames
+
+
+class FixtureSource(DataSource):
+    """
+    Reads bars from '<directory>/<ticker>.csv' files (Date,Open,High,Low,Close,Volume).
+    Meant for tests and offline development.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def fetch(self, ticker, start, end):
+        path = os.path.join(self.directory, f'{ticker}.csv')
+        if not os.path.exists(path):
+            return pd.DataFrame(columns=['Date'] + PRICE_COLUMNS)
+        df = pd.read_csv(path, parse_dates=['Date'])
+        df = df[(df['Date'] >= pd.Timestamp(start)) & (df['Date'] < pd.Timestamp(end))]
+        return normalize_ohlcv(df.set_index('Date'), ticker)
+
+
+# --- Price Store ---
+
+class PriceStore:
+    """
+    Per-ticker columnar price cache with incremental (delta) refresh.
+
+    Metadata per ticker:
+        covered_from - earliest date that has been requested from the source
+        last_date    - date of the last stored bar
+        checked_at   - unix time of the last successful source check
+
+    A last bar that was fetched before its session closed may still change, so
+    it only counts as fresh for max_age seconds like any other check.
+    """
+
+    def __init__(self, root=None, source=None, max_age=None):
+        self.root = root
+        self.source = source or YFinanceSource()
+        self.max_age = max_age if max_age is not None else Config.PRICE_STORE_MAX_AGE
+        self.batch_size = Config.PRICE_FETCH_BATCH_SIZE
+        self.fetch_workers = Config.PRICE_FETCH_WORKERS
+        self.market_timezone = Config.MARKET_TIMEZONE
+        self.market_close = dtime.fromisoformat(Config.MARKET_CLOSE)
+        self._frames = {}  # ticker -> (mtime_ns, DataFrame)
+        self._locks = defaultdict(threading.Lock)
+        self._guard = threading.Lock()
+
+    def init_app(self, app):
+        """Configures the store from the Flask app config."""
+        self.configure(app.config)
+
+    def configure(self, config):
+        """Configures the store from a config mapping (also used by worker processes)."""
+        self.root = config.get('PRICE_STORE_DIR') or self.root
+        self.max_age = config.get('PRICE_STORE_MAX_AGE', self.max_age)
+        self.batch_size = config.get('PRICE_FETCH_BATCH_SIZE', self.batch_size)
+        self.fetch_workers = config.get('PRICE_FETCH_WORKERS', self.fetch_workers)
+        self.market_timezone = config.get('MARKET_TIMEZONE', self.market_timezone)
+        if config.get('MARKET_CLOSE'):
+            self.market_close = dtime.fromisoformat(config['MARKET_CLOSE'])
+
+    def set_source(self, source):
+        """Swaps the upstream data source (e.g. a FixtureSource in tests)."""
+        self.source = source
+        with self._guard:
+            self._frames.clear()
+
+    # --- Public API ---
+
+    def get_history(self, ticker, start, end=None):
+        """
+        Returns stored bars for [start, end], refreshing from the source if stale.
+        If the refresh fails, the stored bars are served; it only raises when
+        nothing is stored for the ticker.
+        """
+        end = end or date.today()
+        with self._lock_for(ticker):
+            df = self._load_frame(ticker)
+            meta = self._load_meta(ticker)
+            if self._is_stale(meta, start, end):
+                try:
+                    df = self._refresh(ticker, df, meta, start, end)
+                except Exception:
+                    if df.empty:
+                        raise
+                    logger.warning("Price refresh for %s failed, serving stored bars through %s",
+                                   ticker, meta.get('last_date'), exc_info=True)
+
+        mask = (df['Date'] >= pd.Timestamp(start)) & (df['Date'] <= pd.Timestamp(end))
+        return df.loc[mask].reset_index(drop=True)
+
+    def get_many(self, tickers, start, end=None):
+        """
+        Like get_history for several tickers. Stale tickers are refreshed with
+        batched source calls of at most batch_size tickers (instead of one call
+        per ticker), fetch_workers batches at a time.
+        """
+        end = end or date.today()
+        stale = [ticker for ticker in tickers if self._is_stale(self._load_meta(ticker), start, end)]
+
+        if len(stale) > 1:
+            batches = [stale[i:i + self.batch_size] for i in range(0, len(stale), self.batch_size)]
+            if len(batches) == 1:
+                self._refresh_batch(batches[0], start, end)
+            else:
+                with ThreadPoolExecutor(max_workers=self.fetch_workers, thread_name_prefix='price-fetch') as executor:
+                    for future in [executor.submit(self._refresh_batch, batch, start, end) for batch in batches]:
+                        try:
+                            future.result()
+                        except Exception as e:
+                            # The batch's tickers are retried one by one by get_history below
+                            print(f"Batched price refresh failed: {e}")
+
+        return {ticker: self.get_history(ticker, start, end) for ticker in tickers}
+
+    def metadata(self, ticker):
+        """Returns the freshness metadata for a ticker (empty dict if never fetched)."""
+        return self._load_meta(ticker)
+
+    # --- Internals ---
+
+    def _refresh_batch(self, tickers, start, end):
+        fetch_start = min(self._fetch_start(self._load_frame(ticker), self._load_meta(ticker), start)
+                          for ticker in tickers)
+        fetched = self.source.fetch_many(tickers, fetch_start, end + timedelta(days=1))
+        for ticker in tickers:
+            with self._lock_for(ticker):
+                self._merge(ticker, self._load_frame(ticker), self._load_meta(ticker),
+                            fetched.get(ticker), start)
+
+    def _root(self):
+        root = self.root or Config.PRICE_STORE_DIR
+        os.makedirs(root, exist_ok=True)
+        return root
+
+    def _lock_for(self, ticker):
+        with self._guard:
+            return self._locks[ticker]
+
+    def _paths(self, ticker):
+        safe = ticker.replace('/', '_')
+        root = self._root()
+        return os.path.join(root, f'{safe}.npz'), os.path.join(root, f'{safe}.json')
+
+    def _is_stale(self, meta, start, end):
+        if not meta:
+            return True
+        if start < date.fromisoformat(meta['covered_from']):
+            return True
+        last_date = date.fromisoformat(meta['last_date'])
+        if last_date >= end and not self._is_partial(last_date, meta['checked_at']):
+            return False
+        return time.time() - meta['checked_at'] > self.max_age
+
+    def _is_partial(self, last_date, checked_at):
+        """True if the bar for last_date was fetched before that session's close."""
+        close = datetime.combine(last_date, self.market_close, ZoneInfo(self.market_timezone))
+        return checked_at < close.timestamp()
+
+    def _fetch_start(self, df, meta, start):
+        """First date that has to be requested from the source to bring a ticker up to date."""
+        if not meta or df.empty or start < date.fromisoformat(meta['covered_from']):
+            return start
+        # Re-fetch the last stored bar as well, it may have been a partial intraday bar
+        return df['Date'].iloc[-1].date()
+
+    def _refresh(self, ticker, df, meta, start, end):
+        fetched = self.source.fetch(ticker, self._fetch_start(df, meta, start), end + timedelta(days=1))
+        return self._merge(ticker, df, meta, fetched, start)
+
+    def _merge(self, ticker, df, meta, fetched, start):
+        """Appends freshly fetched bars to the stored frame and persists the result."""
+        covered_from = start
+        if meta:
+            covered_from = min(start, date.fromisoformat(meta['covered_from']))
+
+        frames = [f for f in (df, fetched) if f is not None and not f.empty]
+        if frames:
+            df = pd.concat(frames, ignore_index=True)
+            df = df.drop_duplicates(subset='Date', keep='last').sort_values('Date').reset_index(drop=True)
+
+        if df.empty:
+            return df
+
+        self._save(ticker, df, {
+            'ticker': ticker,
+            'covered_from': covered_from.isoformat(),
+            'last_date': df['Date'].iloc[-1].date().isoformat(),
+            'checked_at': time.time(),
+            'rows': int(len(df)),
+        })
+        return df
+
+    def _load_meta(self, ticker):
+        _, meta_path = self._paths(ticker)
+        try:
+            with open(meta_path) as fh:
+                return json.load(fh)
+        except (OSError, ValueError):
+            return {}
+
+    def _load_frame(self, ticker):
+        data_path, _ = self._paths(ticker)
+        try:
+            mtime = os.stat(data_path).st_mtime_ns
+        except OSError:
+            return pd.DataFrame(columns=['Date'] + PRICE_COLUMNS)
+
+        cached = self._frames.get(ticker)
+        if cached and cached[0] == mtime:
+            return cached[1]
+
+        with np.load(data_path) as data:
+            df = pd.DataFrame({'Date': pd.to_datetime(data['date'].astype('datetime64[D]'))})
+            for column in PRICE_COLUMNS:
+                df[column] = data[column.lower()]
+
+        self._frames[ticker] = (mtime, df)
+        return df
+
+    def _save(self, ticker, df, meta):
+        data_path, meta_path = self._paths(ticker)
+        columns = {column.lower(): df[column].to_numpy(dtype=np.float64) for column in PRICE_COLUMNS}
+        days = df['Date'].to_numpy().astype('datetime64[D]').astype(np.int64)
+
+        # Write to temp files and swap in atomically so readers never see partial files
+        tmp_data = f'{data_path}.{os.getpid()}.tmp'
+        with open(tmp_data, 'wb') as fh:
+            np.savez(fh, date=days, **columns)
+        os.replace(tmp_data, data_path)
+
+        tmp_meta = f'{meta_path}.{os.getpid()}.tmp'
+        with open(tmp_meta, 'w') as fh:
+            json.dump(meta, fh)
+        os.replace(tmp_meta, meta_path)
+
+        self._frames[ticker] = (os.stat(data_path).st_mtime_ns, df)
+
+
+price_store = PriceStore()
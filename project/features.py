@@ -0,0 +1,140 @@
+"""
+Feature engineering for the price models.
+
+All features are causal rolling-window statistics (returns, moving-average
+gaps, volatility, RSI, volume ratios and lagged returns) built with pandas
+rolling kernels. Because every window is bounded, a new bar only needs the last
+WARMUP bars to compute its row, so the per-ticker feature matrix is persisted
+and extended incrementally instead of being rebuilt over the whole history.
+"""
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from config import Config
+
+RETURN_WINDOWS = (1, 5, 10, 21)
+MA_WINDOWS = (5, 21, 63)
+VOLATILITY_WINDOWS = (10, 21)
+RSI_WINDOW = 14
+VOLUME_WINDOW = 21
+RETURN_LAGS = (1, 2, 3, 4, 5)
+
+# Bars of history needed before the first fully populated feature row
+WARMUP = max(MA_WINDOWS + VOLATILITY_WINDOWS + RETURN_WINDOWS + (RSI_WINDOW, VOLUME_WINDOW)) + max(RETURN_LAGS)
+
+TECHNICAL_COLUMNS = (
+    [f'ret_{w}' for w in RETURN_WINDOWS]
+    + [f'ma_gap_{w}' for w in MA_WINDOWS]
+    + [f'vol_{w}' for w in VOLATILITY_WINDOWS]
+    + ['rsi_14', 'volume_ratio', 'log_volume']
+    + [f'ret_1_lag_{k}' for k in RETURN_LAGS]
+)
+
+# Feature sets a model can ask for by name
+FEATURE_SETS = {
+    'day': ['Day'],
+    'technical': TECHNICAL_COLUMNS,
+}
+
+
+def compute_features(df):
+    """Computes the technical feature matrix for every row of an OHLCV DataFrame (NaN during warm-up)."""
+    close = df['Close'].astype(float)
+    volume = df['Volume'].astype(float)
+    log_close = np.log(close)
+    ret_1 = log_close.diff()
+
+    features = {}
+    for w in RETURN_WINDOWS:
+        features[f'ret_{w}'] = log_close.diff(w)
+    for w in MA_WINDOWS:
+        features[f'ma_gap_{w}'] = close / close.rolling(w).mean() - 1.0
+    for w in VOLATILITY_WINDOWS:
+        features[f'vol_{w}'] = ret_1.rolling(w).std()
+
+    # Cutler's RSI (simple moving averages) keeps the window bounded
+    gains = ret_1.clip(lower=0).rolling(RSI_WINDOW).mean()
+    losses = (-ret_1).clip(lower=0).rolling(RSI_WINDOW).mean()
+    features['rsi_14'] = 100.0 - 100.0 / (1.0 + gains / losses.replace(0.0, np.nan))
+    features['rsi_14'] = features['rsi_14'].where(losses > 0, 100.0).where(gains.notna())
+
+    features['volume_ratio'] = volume / volume.rolling(VOLUME_WINDOW).mean().replace(0.0, np.nan)
+    features['log_volume'] = np.log1p(volume)
+    for k in RETURN_LAGS:
+        features[f'ret_1_lag_{k}'] = ret_1.shift(k)
+
+    return pd.DataFrame(features, index=df.index)[TECHNICAL_COLUMNS]
+
+
+class FeatureStore:
+    """Per-ticker persisted feature matrices, extended bar by bar."""
+
+    def __init__(self, root=None):
+        self.root = root
+        self._frames = {}  # ticker -> DataFrame indexed by date
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.configure(app.config)
+
+    def configure(self, config):
+        self.root = config.get('FEATURE_STORE_DIR') or self.root
+
+    def get(self, ticker, df):
+        """Returns the technical features aligned row-for-row with df (Date + OHLCV frame)."""
+        dates = pd.DatetimeIndex(df['Date'])
+        with self._lock:
+            stored = self._frames.get(ticker)
+        if stored is None:
+            stored = self._load(ticker)
+
+        if (stored is None or dates[0] < stored.index[0]
+                or not dates[dates <= stored.index[-1]].isin(stored.index).all()):
+            # Nothing usable stored (or older history appeared): build from scratch
+            stored = compute_features(df).set_index(dates)
+            self._save(ticker, stored)
+        else:
+            # Recompute the last stored bar (it may have been a partial intraday bar) plus new bars
+            first_new = max(int(dates.searchsorted(stored.index[-1])), 0)
+            if first_new < len(dates):
+                window = df.iloc[max(first_new - WARMUP, 0):]
+                fresh = compute_features(window).set_index(pd.DatetimeIndex(window['Date']))
+                fresh = fresh.iloc[first_new - max(first_new - WARMUP, 0):]
+                unchanged = (len(fresh) == 1 and fresh.index[0] == stored.index[-1]
+                             and np.allclose(fresh.to_numpy(), stored.iloc[-1:].to_numpy(), equal_nan=True))
+                if not unchanged:
+                    stored = pd.concat([stored[stored.index < fresh.index[0]], fresh])
+                    self._save(ticker, stored)
+
+        with self._lock:
+            self._frames[ticker] = stored
+        return stored.reindex(dates).reset_index(drop=True)
+
+    def _path(self, ticker):
+        root = self.root or Config.FEATURE_STORE_DIR
+        os.makedirs(root, exist_ok=True)
+        return os.path.join(root, f"{ticker.replace('/', '_')}.npz")
+
+    def _load(self, ticker):
+        try:
+            with np.load(self._path(ticker), allow_pickle=False) as data:
+                if list(data['columns']) != TECHNICAL_COLUMNS:
+                    return None
+                index = pd.DatetimeIndex(data['date'].astype('datetime64[D]'))
+                return pd.DataFrame(data['values'], index=index, columns=TECHNICAL_COLUMNS)
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def _save(self, ticker, frame):
+        path = self._path(ticker)
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as fh:
+            np.savez(fh, date=frame.index.to_numpy().astype('datetime64[D]').astype(np.int64),
+                     values=frame.to_numpy(dtype=np.float64), columns=np.array(TECHNICAL_COLUMNS))
+        os.replace(tmp, path)
+
+
+feature_store = FeatureStore()
@@ -0,0 +1,220 @@
+"""
+Background prediction jobs.
+
+Training runs in a bounded process pool so CPU-bound fits never tie up the
+web workers. Job state is written as small JSON files in the instance folder,
+which lets any gunicorn worker answer a poll for a job started by another one.
+"""
+import json
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from config import Config
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+# Niceness of the background worker (backtests), so user fits win the CPU
+BACKGROUND_NICE = 10
+
+
+def _init_worker(config, source, nice=0):
+    """Process pool initializer: point the worker's stores at the app's folders."""
+    if nice and hasattr(os, 'nice'):
+        os.nice(nice)
+    from .data_store import price_store
+    from .model_cache import model_cache
+    from .singleflight import single_flight
+    from .backtest import backtest_cache
+    from .features import feature_store
+    from .trading_calendar import trading_calendar
+    from .model_selection import model_selector
+    from .universe import universe
+    universe.configure(config)
+    price_store.configure(config)
+    if source is not None:
+        price_store.set_source(source)
+    model_cache.configure(config)
+    single_flight.configure(config)
+    backtest_cache.configure(config)
+    feature_store.configure(config)
+    trading_calendar.configure(config)
+    model_selector.configure(config)
+
+
+def create_worker_pool(config, workers, kind='process', nice=0):
+    """
+    Creates a pool whose workers share the app's stores and caches.
+    Process pools use 'spawn' to avoid forking a multi-threaded web worker;
+    their workers run at the given niceness.
+    """
+    if kind == 'thread':
+        return ThreadPoolExecutor(max_workers=workers, thread_name_prefix='predict')
+
+    from .data_store import price_store
+    # Plain config values only, the mapping has to be pickled into the workers
+    worker_config = {key: value for key, value in config.items()
+                     if key.isupper() and isinstance(value, (str, int, float, bool, type(None)))}
+    return ProcessPoolExecutor(max_workers=workers,
+                               mp_context=multiprocessing.get_context('spawn'),
+                               initializer=_init_worker,
+                               initargs=(worker_config, price_store.source, nice))
+
+
+def _run_job(state_path, fn, args):
+    """Executed in the pool: flags the job as running, then does the work."""
+    try:
+        with open(state_path) as fh:
+            state = json.load(fh)
+        state.update(status=RUNNING, started_at=time.time())
+        _write_json(state_path, state)
+    except (OSError, ValueError):
+        pass
+    return fn(*args)
+
+
+def _write_json(path, state):
+    tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp, 'w') as fh:
+        json.dump(state, fh)
+    os.replace(tmp, path)
+
+
+class JobQueue:
+    """Runs prediction jobs on a worker pool and tracks their state."""
+
+    def __init__(self):
+        self.app = None
+        self.root = None
+        self.result_ttl = Config.JOB_RESULT_TTL
+        self._executor = None
+        self._background = None
+        self._lock = threading.Lock()
+        self._last_purge = 0.0
+
+    def init_app(self, app):
+        """Stores the app for completion callbacks; the pool itself is started lazily."""
+        self.app = app
+        self.root = app.config.get('JOB_STATE_DIR') or os.path.join(app.instance_path, 'jobs')
+        self.result_ttl = app.config.get('JOB_RESULT_TTL', self.result_ttl)
+
+    # --- Public API ---
+
+    def submit(self, fn, args, user_id, on_success=None, executor=None):
+        """
+        Queues fn(*args) and returns the new job id. fn must return a result dict
+        ('error' key on failure). on_success(result) runs in an app context in the
+        web process once the job finishes. executor defaults to the shared pool;
+        if submitting to it raises, no job is created.
+        """
+        job_id = uuid.uuid4().hex
+        self._write_state(job_id, {'id': job_id, 'user_id': user_id, 'status': QUEUED,
+                                   'submitted_at': time.time()})
+
+        try:
+            future = (executor or self.executor()).submit(_run_job, self._path(job_id), fn, args)
+        except Exception:
+            os.remove(self._path(job_id))
+            raise
+        future.add_done_callback(lambda f: self._finish(job_id, user_id, f, on_success))
+        self._purge_expired()
+        return job_id
+
+    def get(self, job_id):
+        """Returns the job state dict, or None if unknown/expired."""
+        if not job_id.isalnum():
+            return None
+        try:
+            with open(self._path(job_id)) as fh:
+                return json.load(fh)
+        except (OSError, ValueError):
+            return None
+
+    def executor(self):
+        """Returns the shared worker pool, creating it on first use."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = self._create_executor()
+            return self._executor
+
+    def background_executor(self):
+        """A one-worker pool for low-priority background work (niced when it is a process pool)."""
+        with self._lock:
+            if self._background is None:
+                config = self.app.config if self.app else {}
+                self._background = create_worker_pool(config, 1, config.get('PREDICT_EXECUTOR', 'process'),
+                                                      nice=BACKGROUND_NICE)
+            return self._background
+
+    def shutdown(self, wait=True):
+        # Not under the lock: done callbacks that submit follow-up work call executor()
+        with self._lock:
+            executors = [self._executor, self._background]
+            self._executor = self._background = None
+        for executor in executors:
+            if executor is not None:
+                executor.shutdown(wait=wait)
+
+    # --- Internals ---
+
+    def _create_executor(self):
+        config = self.app.config if self.app else {}
+        workers = config.get('PREDICT_WORKERS') or os.cpu_count() or 1
+        return create_worker_pool(config, workers, config.get('PREDICT_EXECUTOR', 'process'))
+
+    def _finish(self, job_id, user_id, future, on_success):
+        state = self.get(job_id) or {'id': job_id, 'user_id': user_id}
+        state['finished_at'] = time.time()
+        try:
+            result = future.result()
+        except Exception as e:
+            state.update(status=FAILED, error=f"An unexpected error occurred: {e}")
+            self._write_state(job_id, state)
+            return
+
+        if 'error' in result:
+            state.update(status=FAILED, error=result['error'])
+        else:
+            if on_success is not None:
+                try:
+                    with self.app.app_context():
+                        on_success(result)
+                except Exception as e:
+                    print(f"Job {job_id} completion callback failed: {e}")
+            state.update(status=DONE, result=result)
+        self._write_state(job_id, state)
+
+    def _dir(self):
+        root = self.root or Config.JOB_STATE_DIR
+        os.makedirs(root, exist_ok=True)
+        return root
+
+    def _path(self, job_id):
+        return os.path.join(self._dir(), f'{job_id}.json')
+
+    def _write_state(self, job_id, state):
+        _write_json(self._path(job_id), state)
+
+    def _purge_expired(self):
+        now = time.time()
+        if now - self._last_purge < 60:
+            return
+        self._last_purge = now
+        cutoff = now - self.result_ttl
+        directory = self._dir()
+        for filename in os.listdir(directory):
+            path = os.path.join(directory, filename)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+
+job_queue = JobQueue()
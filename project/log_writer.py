@@ -0,0 +1,274 @@
+"""
+Buffered PredictionLog writer.
+
+Requests hand their log rows to log_writer.write(), which only appends them to
+an in-memory queue (and to this process's spool file, so rows survive a crash)
+and returns. A background thread flushes the queue with one bulk insert, via
+record_predictions, when it reaches LOG_FLUSH_SIZE rows or LOG_FLUSH_INTERVAL
+seconds have passed. Whatever is left is flushed at interpreter exit, and the
+spool files left behind by processes that died are replayed on startup.
+
+A failed flush is retried with exponential backoff. After LOG_FLUSH_RETRIES
+failed attempts the batch is inserted row by row and the rows that still fail
+are moved to '<LOG_SPOOL_DIR>/dead_letter/<pid>.jsonl' (or dropped without a
+spool), so one bad row cannot hold up every later log.
+"""
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+from datetime import date, datetime
+
+from .extensions import db
+from .metrics import registry
+
+try:
+    import fcntl
+except ImportError:  # Windows: spool files are not recovered across processes
+    fcntl = None
+
+# Row columns that need converting back from their JSON (ISO string) form
+DATE_COLUMNS = ('predicted_date',)
+DATETIME_COLUMNS = ('timestamp',)
+
+flush_latency = registry.histogram(
+    'prediction_log_flush_seconds',
+    'Time spent bulk-inserting buffered prediction logs.',
+    [],
+)
+
+
+def _to_json(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def _from_json(row):
+    for column in DATE_COLUMNS:
+        if row.get(column):
+            row[column] = date.fromisoformat(row[column])
+    for column in DATETIME_COLUMNS:
+        if row.get(column):
+            row[column] = datetime.fromisoformat(row[column])
+    return row
+
+
+class PredictionLogWriter:
+    """Queues prediction log rows and writes them to the database in bulk."""
+
+    def __init__(self):
+        self.app = None
+        self.enabled = True
+        self.flush_size = 100
+        self.flush_interval = 1.0
+        self.spool_dir = None
+        self.max_retries = 8
+        self.max_backoff = 60.0
+        self.flushed = 0
+        self.flush_errors = 0
+        self.dropped = 0
+        self._failures = 0       # consecutive failed flushes
+        self._retry_at = 0.0     # time.monotonic() before which the writer thread does not retry
+        self._pending = []
+        self._lock = threading.Lock()        # guards _pending and the spool file
+        self._flush_lock = threading.Lock()  # one flush at a time
+        self._wake = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._spool = None
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = app.config.get('LOG_WRITER_ENABLED', True)
+        self.flush_size = app.config.get('LOG_FLUSH_SIZE', self.flush_size)
+        self.flush_interval = app.config.get('LOG_FLUSH_INTERVAL', self.flush_interval)
+        self.spool_dir = app.config.get('LOG_SPOOL_DIR') or None
+        self.max_retries = app.config.get('LOG_FLUSH_RETRIES', self.max_retries)
+        self.max_backoff = app.config.get('LOG_FLUSH_MAX_BACKOFF', self.max_backoff)
+        atexit.register(self.close)
+
+    def write(self, rows):
+        """Queues PredictionLog rows (dicts of column values); returns immediately."""
+        now = datetime.utcnow()
+        rows = [dict(row, timestamp=row.get('timestamp') or now) for row in rows]
+        if not self.enabled:
+            self._insert(rows)
+            return
+        with self._lock:
+            self._ensure_started()
+            if self._spool is not None:
+                self._spool.write(''.join(json.dumps(row, default=_to_json) + '\n' for row in rows))
+                self._spool.flush()
+            self._pending.extend(rows)
+            if len(self._pending) >= self.flush_size:
+                self._wake.set()
+
+    def pending(self):
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self):
+        """Writes everything queued so far in one transaction; returns the number of rows written."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return 0
+            start = time.perf_counter()
+            try:
+                self._insert(batch)
+                written = len(batch)
+                flush_latency.observe(time.perf_counter() - start)
+            except Exception as e:
+                self.flush_errors += 1
+                self._failures += 1
+                if self._failures < self.max_retries:
+                    delay = min(self.max_backoff, self.flush_interval * 2 ** self._failures)
+                    self._retry_at = time.monotonic() + delay
+                    print(f"Error flushing prediction logs (retrying in {delay:.0f}s): {e}")
+                    with self._lock:
+                        self._pending[:0] = batch
+                    return 0
+                print(f"Error flushing prediction logs, giving up on the batch after {self._failures} attempts: {e}")
+                written = self._insert_each(batch)
+            self._failures = 0
+            self._retry_at = 0.0
+            self.flushed += written
+            with self._lock:
+                # The spool only has to hold what is still queued
+                self._rewrite_spool(self._pending)
+            return written
+
+    def close(self):
+        """Final flush (registered with atexit)."""
+        if self._pid == os.getpid():
+            self.flush()
+
+    # --- Internals ---
+
+    def _insert(self, rows):
+        from .prediction_log import record_predictions
+        with self.app.app_context():
+            try:
+                record_predictions(rows)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+
+    def _insert_each(self, rows):
+        """Inserts rows one at a time and dead-letters the ones that fail; returns the number written."""
+        dead = []
+        for row in rows:
+            try:
+                self._insert([row])
+            except Exception:
+                dead.append(row)
+        if dead:
+            self.dropped += len(dead)
+            self._dead_letter(dead)
+        return len(rows) - len(dead)
+
+    def _dead_letter(self, rows):
+        if not self.spool_dir:
+            print(f"Dropped {len(rows)} prediction logs that could not be written")
+            return
+        # A subdirectory, so the rows are not replayed with the crash spools
+        directory = os.path.join(self.spool_dir, 'dead_letter')
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'{os.getpid()}.jsonl')
+        with open(path, 'a') as fh:
+            fh.write(''.join(json.dumps(row, default=_to_json) + '\n' for row in rows))
+        print(f"Moved {len(rows)} prediction logs that could not be written to {path}")
+
+    def _ensure_started(self):
+        # Started lazily so every (forked) web worker gets its own thread and spool
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._pending = []
+        self._spool = None
+        if self.spool_dir:
+            os.makedirs(self.spool_dir, exist_ok=True)
+            self._spool = open(os.path.join(self.spool_dir, f'{self._pid}.jsonl'), 'a+')
+            if fcntl is not None:
+                fcntl.flock(self._spool, fcntl.LOCK_EX) # marks the spool as owned by a live process
+            # A dead process with the same pid may have left rows behind
+            self._spool.seek(0)
+            self._pending = self._read_spool(self._spool)
+        self._wake = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name='prediction-log-writer')
+        self._thread.start()
+
+    def _run(self):
+        self._recover_spools()
+        while True:
+            self._wake.wait(max(self.flush_interval, self._retry_at - time.monotonic()))
+            self._wake.clear()
+            if time.monotonic() >= self._retry_at: # backing off after a failed flush
+                self.flush()
+
+    def _rewrite_spool(self, rows):
+        if self._spool is None:
+            return
+        self._spool.seek(0)
+        self._spool.truncate()
+        self._spool.write(''.join(json.dumps(row, default=_to_json) + '\n' for row in rows))
+        self._spool.flush()
+
+    def _read_spool(self, fh):
+        rows = []
+        for line in fh:
+            try:
+                rows.append(_from_json(json.loads(line)))
+            except ValueError:
+                pass # torn last line from a crash
+        return rows
+
+    def _recover_spools(self):
+        """Replays spool files whose owning process is gone."""
+        if not self.spool_dir or fcntl is None:
+            return
+        own = os.path.join(self.spool_dir, f'{self._pid}.jsonl')
+        for path in glob.glob(os.path.join(self.spool_dir, '*.jsonl')):
+            if path == own:
+                continue
+            try:
+                with open(path, 'r+') as fh:
+                    try:
+                        fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except BlockingIOError:
+                        continue # still owned by a running worker
+                    if os.fstat(fh.fileno()).st_nlink == 0:
+                        continue # another worker recovered it first
+                    rows = self._read_spool(fh)
+                    if rows:
+                        self._insert(rows)
+                        print(f"Recovered {len(rows)} spooled prediction logs from {path}")
+                    os.remove(path)
+            except FileNotFoundError:
+                continue
+            except Exception as e:
+                print(f"Error recovering prediction log spool {path}: {e}")
+
+
+log_writer = PredictionLogWriter()
+
+
+def _log_writer_metrics():
+    return [
+        ('prediction_log_pending', 'gauge', 'Prediction log rows waiting to be flushed.',
+         [({}, log_writer.pending())]),
+        ('prediction_log_flushed_total', 'counter', 'Prediction log rows written by the buffered writer.',
+         [({}, log_writer.flushed)]),
+        ('prediction_log_flush_errors_total', 'counter', 'Failed prediction log flushes (rows are retried).',
+         [({}, log_writer.flush_errors)]),
+        ('prediction_log_dropped_total', 'counter', 'Prediction log rows dead-lettered after repeated failures.',
+         [({}, log_writer.dropped)]),
+    ]
+
+
+registry.add_collector(_log_writer_metrics)
@@ -0,0 +1,183 @@
+"""
+Lightweight timing spans and Prometheus text metrics for the prediction pipeline.
+
+Timer collects per-stage durations for a single prediction (it is plain data,
+so it also works inside pool worker processes and travels back in the result).
+The module-level registry keeps latency histograms for this process and renders
+them, plus any registered collectors, in the Prometheus text format.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Timer:
+    """Records how long each named stage of one request took (in seconds)."""
+
+    def __init__(self):
+        self.stages = {}
+
+    @contextmanager
+    def span(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[stage] = self.stages.get(stage, 0.0) + time.perf_counter() - start
+
+    def as_dict(self, precision=6):
+        return {stage: round(seconds, precision) for stage, seconds in self.stages.items()}
+
+
+class Histogram:
+    """Cumulative-bucket histogram with label support."""
+
+    def __init__(self, name, documentation, labelnames, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+        for key, series in items:
+            labels = list(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{_labels(labels + [("le", repr(bound))])} {cumulative}')
+            lines.append(f'{self.name}_bucket{_labels(labels + [("le", "+Inf")])} {series[-1]}')
+            lines.append(f'{self.name}_sum{_labels(labels)} {series[-2]}')
+            lines.append(f'{self.name}_count{_labels(labels)} {series[-1]}')
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(pairs):
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class Registry:
+    """Holds histograms plus collector callbacks for values owned by other modules."""
+
+    def __init__(self):
+        self._histograms = []
+        self._collectors = []
+
+    def histogram(self, name, documentation, labelnames, buckets=DEFAULT_BUCKETS):
+        histogram = Histogram(name, documentation, labelnames, buckets)
+        self._histograms.append(histogram)
+        return histogram
+
+    def add_collector(self, collector):
+        """
+        collector() returns a list of (name, type, documentation, samples) tuples,
+        where samples is a list of ({label: value}, number) pairs.
+        """
+        self._collectors.append(collector)
+
+    def render(self):
+        lines = []
+        for histogram in self._histograms:
+            lines.extend(histogram.render())
+        for collector in self._collectors:
+            for name, kind, documentation, samples in collector():
+                lines.append(f'# HELP {name} {documentation}')
+                lines.append(f'# TYPE {name} {kind}')
+                for labels, value in samples:
+                    lines.append(f'{name}{_labels(sorted(labels.items()))} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+stage_latency = registry.histogram(
+    'prediction_stage_seconds',
+    'Time spent in each stage of the prediction pipeline.',
+    ['stage', 'stock', 'model'],
+)
+request_latency = registry.histogram(
+    'prediction_request_seconds',
+    'End-to-end /predict latency.',
+    ['stock', 'model'],
+)
+admission_wait = registry.histogram(
+    'admission_queue_wait_seconds',
+    'Time training requests waited in the admission queue for a slot.',
+    [],
+)
+
+
+def observe_timings(stock_name, model_name, timings):
+    """Feeds a per-request stage breakdown (Timer.as_dict()) into the histograms."""
+    for stage, seconds in timings.items():
+        stage_latency.observe(seconds, stage=stage, stock=stock_name, model=model_name)
+
+
+# --- Collectors for counters owned by other modules ---
+
+def _cache_metrics():
+    from .model_cache import model_cache
+    from .singleflight import single_flight
+    flight = single_flight.stats()
+    return [
+        ('model_cache_lookups_total', 'counter', 'Model cache lookups by outcome.',
+         [({'result': 'memory_hit'}, model_cache.hits),
+          ({'result': 'disk_hit'}, model_cache.disk_hits),
+          ({'result': 'miss'}, model_cache.misses)]),
+        ('single_flight_executions_total', 'counter', 'Model fits actually executed by the single-flight layer.',
+         [({}, flight['executions'])]),
+        ('single_flight_coalesced_total', 'counter', 'Requests that shared another in-process request\'s fit.',
+         [({}, flight['coalesced'])]),
+        ('single_flight_cross_process_hits_total', 'counter', 'Fits reused from another process after waiting on its lock.',
+         [({}, flight['cross_process_hits'])]),
+        ('single_flight_in_flight', 'gauge', 'Fits currently running.',
+         [({}, flight['in_flight'])]),
+    ]
+
+
+registry.add_collector(_cache_metrics)
+
+
+def _admission_metrics():
+    from .admission import admission
+    stats = admission.stats()
+    return [
+        ('admission_queue_depth', 'gauge', 'Training requests waiting for a slot.',
+         [({}, stats['queued'])]),
+        ('admission_running', 'gauge', 'Training requests holding a slot.',
+         [({}, stats['running'])]),
+        ('admission_slots', 'gauge', 'Training slots (concurrent fits) in this process.',
+         [({}, stats['slots'])]),
+        ('admission_completed_total', 'counter', 'Training requests that ran to completion.',
+         [({}, stats['completed'])]),
+        ('admission_rejected_total', 'counter', 'Training requests turned away, by reason.',
+         [({'reason': reason}, count) for reason, count in sorted(stats['rejected'].items())]),
+    ]
+
+
+registry.add_collector(_admission_metrics)
@@ -1,177 +1,496 @@
-import yfinance as yf
-import pandas as pd
 import numpy as np
-from sklearn.linear_model import LinearRegression
-from sklearn.ensemble import RandomForestRegressor
-# KNN related import is removed
-from xgboost import XGBRegressor
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import mean_squared_error, mean_absolute_error
 import json
+import base64
+import hashlib
+import logging
+import threading
+from functools import lru_cache
 from datetime import datetime, timedelta, date
+from statistics import NormalDist
 import traceback # Keep for debugging if needed
 
-# --- KNN removed from MODELS ---
-MODELS = {
-    'Linear Regression': LinearRegression(),
-    'Random Forest': RandomForestRegressor(n_estimators=100, random_state=42),
-    # 'KNN' entry removed
-    'XGBoost': XGBRegressor(n_estimators=100, random_state=42, objective='reg:squarederror')
-}
-# --- End of change ---
-
-STOCK_TICKERS = {
-    'TCS': 'TCS.NS',
-    'HDFC': 'HDFCBANK.NS',
-    'Infosys': 'INFY.NS',
-    'Yes Bank': 'YESBANK.NS',
-    'ITC': 'ITC.NS',
-    'Adani Power': 'ADANIPOWER.NS'
-}
-
-def get_model(model_name):
-    """Fetches an untrained model instance."""
-    if model_name in MODELS:
-        if model_name == 'Linear Regression': return LinearRegression()
-        if model_name == 'Random Forest': return RandomForestRegressor(n_estimators=100, random_state=42)
-        # KNN case removed
-        if model_name == 'XGBoost': return XGBRegressor(n_estimators=100, random_state=42, objective='reg:squarederror')
-    else:
+from .data_store import price_store
+from .model_cache import model_cache, CacheKey
+from .singleflight import single_flight
+from .metrics import Timer
+from .admission import admission, AdmissionError
+from .backtest import backtest_cache, walk_forward, relative_error, confidence_label
+from .features import FEATURE_SETS, compute_features, feature_store
+from .trading_calendar import trading_calendar, downsample_indices
+# Model backends are registered there and imported lazily on first use
+from .model_backends import MODELS, create_estimator, model_spec
+from .model_selection import model_selector, AUTO_MODEL
+from .universe import universe
+
+logger = logging.getLogger(__name__)
+
+# Forecast distances (in bars) that 'technical' models learn directly
+DIRECT_HORIZONS = (1, 3, 5, 10, 21, 42, 63, 126)
+
+# Prediction interval quantiles (low, median, high) returned with every forecast
+INTERVAL_QUANTILES = (0.1, 0.5, 0.9)
+
+# Display name -> data source ticker, loaded from the universe file (UNIVERSE_FILE)
+STOCK_TICKERS = universe.tickers
+
+def get_model(model_name, params=None):
+    """Fetches an untrained model instance (importing its backend on first use)."""
+    return create_estimator(model_name, params)
+
+@lru_cache(maxsize=None)
+def model_config_hash(model_name, params=()):
+    """
+    Short hash of a model's hyperparameters and feature set, used in model cache keys.
+    params: hyperparameter overrides as sorted (name, value) pairs.
+    """
+    params = sorted(get_model(model_name, dict(params)).get_params().items())
+    feature_set = model_spec(model_name).feature_set
+    columns = FEATURE_SETS[feature_set]
+    horizons = DIRECT_HORIZONS if feature_set != 'day' else ()
+    payload = f"{model_name}|{feature_set}|{columns!r}|{horizons!r}|{params!r}"
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:12]
+
+def data_version(df):
+    """Identifies a historical DataFrame by its first/last bar, row count and latest close."""
+    return (f"{df['Date'].iloc[0]:%Y%m%d}-{df['Date'].iloc[-1]:%Y%m%d}"
+            f"-{len(df)}-{float(df['Close'].iloc[-1]):.4f}")
+
+def cache_key(stock_name, model_name, df, params=None):
+    """
+    Model/backtest cache key. Tuned hyperparameters (from 'Auto' selection) are
+    cached under '<model> (tuned)' so they do not evict the default model.
+    """
+    params = tuple(sorted((params or {}).items()))
+    name = f'{model_name} (tuned)' if params else model_name
+    return CacheKey(stock_name, name, data_version(df), model_config_hash(model_name, params))
+
+def resolve_model(stock_name, model_name, df):
+    """
+    Maps a requested model onto (model name, hyperparameter overrides, selection).
+    'Auto' uses the cross-validated choice for this data version; selection is None otherwise.
+    """
+    if model_name != AUTO_MODEL:
+        return model_name, None, None
+    selection = model_selector.select(stock_name, df)
+    return selection['model'], selection['params'] or None, selection
+
+class FittedModel:
+    """
+    A trained estimator plus what is needed to turn future dates into its inputs.
+
+    'day' models regress the close on a day counter relative to origin.
+    'technical' models predict the log return from the last bar's features
+    and the number of calendar days ahead, so they carry that last feature row.
+
+    Prediction intervals come from the per-tree predictions for forests, a
+    multi-quantile booster for XGBoost and the residual variance for linear
+    models (see fit_intervals); other models have none.
+    """
+    # Class-level defaults, so artifacts pickled before intervals existed still load
+    interval_estimator = None  # XGBoost booster trained on INTERVAL_QUANTILES
+    residual_std = None        # linear models: residual standard deviation...
+    xtx_inv = None             # ...and (X'X)^-1 of the design with intercept
+
+    def __init__(self, model_name, estimator, origin, last_date, version,
+                 feature_set='day', last_features=None, last_close=None):
+        self.model_name = model_name
+        self.estimator = estimator
+        self.origin = origin          # date of the first training bar (Day 0)
+        self.last_date = last_date    # date of the last training bar
+        self.data_version = version
+        self.feature_set = feature_set
+        self.last_features = last_features
+        self.last_close = last_close
+
+    def day_numbers(self, dates):
+        """Converts an iterable of dates into 'Day' feature values."""
+        days = np.array(dates, dtype='datetime64[D]') - np.datetime64(self.origin, 'D')
+        return days.astype(np.int64)
+
+    def design_matrix(self, dates):
+        """Model inputs for a batch of target dates."""
+        if self.feature_set == 'day':
+            return self.day_numbers(dates).reshape(-1, 1)
+        days_ahead = (np.array(dates, dtype='datetime64[D]') - np.datetime64(self.last_date, 'D')).astype(float)
+        return np.column_stack([np.repeat(self.last_features[None, :], len(days_ahead), axis=0), days_ahead])
+
+    def to_prices(self, raw):
+        """Maps raw estimator outputs onto closing prices."""
+        if self.feature_set == 'day':
+            return np.asarray(raw, dtype=float)
+        return self.last_close * np.exp(np.asarray(raw, dtype=float))
+
+    def fit_intervals(self, X, y, params=None):
+        """Fits what predict_dates(intervals=True) needs beyond the point estimator."""
+        if hasattr(self.estimator, 'save_model'):  # XGBoost: one booster for all quantiles
+            quantile_params = dict(params or {}, objective='reg:quantileerror',
+                                   quantile_alpha=np.array(INTERVAL_QUANTILES))
+            self.interval_estimator = get_model(self.model_name, quantile_params).fit(X, y)
+        elif hasattr(self.estimator, 'coef_') and self.feature_set == 'day':
+            design = np.column_stack([np.ones(len(X)), X]).astype(float)
+            residuals = y - self.estimator.predict(X)
+            self.residual_std = float(np.sqrt(residuals @ residuals / max(len(y) - design.shape[1], 1)))
+            self.xtx_inv = np.linalg.pinv(design.T @ design)
+
+    def predict_dates(self, dates, intervals=False):
+        """
+        Predicts closing prices for all dates in one vectorized call. With
+        intervals=True returns (prices, intervals), where intervals is a
+        (len(INTERVAL_QUANTILES), len(dates)) price array, or None if this model
+        has no interval method.
+        """
+        X = self.design_matrix(dates)
+        if not intervals:
+            return self.to_prices(self.estimator.predict(X))
+
+        if hasattr(self.estimator, 'predict_trees'):
+            # Forest: mean and quantiles of one stacked (trees, dates) prediction
+            trees = self.estimator.predict_trees(X)
+            raw, raw_intervals = trees.mean(axis=0), np.quantile(trees, INTERVAL_QUANTILES, axis=0)
+        else:
+            raw, raw_intervals = self.estimator.predict(X), None
+            if self.interval_estimator is not None:
+                # Quantile boosters can cross slightly, keep them ordered
+                raw_intervals = np.sort(np.asarray(self.interval_estimator.predict(X)).reshape(len(X), -1).T, axis=0)
+            elif self.residual_std is not None:
+                design = np.column_stack([np.ones(len(X)), X]).astype(float)
+                scale = self.residual_std * np.sqrt(1.0 + np.einsum('ij,jk,ik->i', design, self.xtx_inv, design))
+                z = np.array([NormalDist().inv_cdf(q) for q in INTERVAL_QUANTILES])
+                raw_intervals = raw[None, :] + z[:, None] * scale[None, :]
+        return self.to_prices(raw), None if raw_intervals is None else self.to_prices(raw_intervals)
+
+def direct_training_set(df, features, horizons=DIRECT_HORIZONS):
+    """
+    Builds (X, y) for direct multi-horizon training: one row per (bar, horizon) with
+    the bar's features plus calendar days ahead, target = log return over the horizon.
+    """
+    values = features.to_numpy(dtype=float)
+    log_close = np.log(df['Close'].to_numpy(dtype=float))
+    days = df['Date'].to_numpy().astype('datetime64[D]').astype(np.int64)
+
+    n = len(df)
+    targets = np.arange(n)[:, None] + np.asarray(horizons)[None, :]
+    valid = (targets < n) & ~np.isnan(values).any(axis=1)[:, None]
+    rows, cols = np.nonzero(valid)
+    ahead = targets[rows, cols]
+
+    X = np.column_stack([values[rows], (days[ahead] - days[rows]).astype(float)])
+    y = log_close[ahead] - log_close[rows]
+    return X, y
+
+def fit_model(model_name, df, features=None, params=None, intervals=True):
+    """
+    Trains a fresh model on the historical DataFrame (features: precomputed technical
+    features, params: hyperparameter overrides). intervals=False skips what only
+    prediction intervals need (backtest and selection folds).
+    """
+    if model_name not in MODELS:
         raise ValueError("Invalid model name provided.")
+    feature_set = model_spec(model_name).feature_set
+    origin = df['Date'].iloc[0].date()
+    last_date = df['Date'].iloc[-1].date()
+    model = get_model(model_name, params)
+
+    if feature_set == 'day':
+        X_train = ((df['Date'] - df['Date'].iloc[0]).dt.days).to_numpy().reshape(-1, 1)
+        y_train = df['Close'].to_numpy()
+        model.fit(X_train, y_train)
+        fitted = FittedModel(model_name, model, origin, last_date, data_version(df))
+        if intervals:
+            fitted.fit_intervals(X_train, y_train, params)
+        return fitted
+
+    if features is None:
+        features = compute_features(df)
+    X_train, y_train = direct_training_set(df, features)
+    if len(X_train) == 0:
+        raise ValueError("Not enough historical data to build features.")
+    model.fit(X_train, y_train)
+    fitted = FittedModel(model_name, model, origin, last_date, data_version(df), feature_set=feature_set,
+                         last_features=features.iloc[-1].to_numpy(dtype=float),
+                         last_close=float(df['Close'].iloc[-1]))
+    if intervals:
+        fitted.fit_intervals(X_train, y_train, params)
+    return fitted
+
+def get_features(stock_name, model_name, df):
+    """Technical features for df from the incremental feature store (None for 'day' models)."""
+    if model_spec(model_name).feature_set == 'day':
+        return None
+    return feature_store.get(STOCK_TICKERS[stock_name], df)
+
+def get_fitted_model(stock_name, model_name, df, features=None, params=None):
+    """
+    Returns a trained model for this data version, from the model cache when possible.
+    Concurrent requests for the same (stock, model, data version) share a single fit.
+    """
+    key = cache_key(stock_name, model_name, df, params)
+    fitted = model_cache.get(key)
+    if fitted is not None:
+        return fitted
+
+    def fit_and_cache():
+        # The cache hands back the shared, memory-mapped copy of the new model
+        return model_cache.put(key, fit_model(model_name, df, features, params))
+
+    return single_flight.do(key, fit_and_cache, recheck=lambda: model_cache.get(key))
 
 def fetch_historical_data(stock_name, years=2):
-    """Fetches historical data up to today for training."""
+    """Fetches historical data up to today for training (served from the local price store)."""
     ticker = STOCK_TICKERS.get(stock_name)
     if not ticker:
         raise ValueError("Invalid stock name provided.")
 
-    # Fetch slightly more than 'years' to be safe, end one day after today
-    end_date = date.today() + timedelta(days=1)
+    # Fetch slightly more than 'years' to be safe
+    end_date = date.today()
     start_date = date.today() - timedelta(days=years*365 + 5) # Start 5 days earlier
 
     try:
-        print(f"Fetching data for {ticker} from {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}") # Debug print
-        df = yf.download(ticker, start=start_date.strftime('%Y-%m-%d'), end=end_date.strftime('%Y-%m-%d'))
-        df.reset_index(inplace=True)
-        df = df.dropna()
+        df = price_store.get_history(ticker, start_date, end_date)
     except Exception as e:
-         print(f"yfinance download failed: {e}") # Debug print for download errors
+         print(f"Price data refresh failed: {e}") # Debug print for download errors
          raise ValueError(f"Failed to download data for {stock_name} ({ticker}). Error: {e}")
 
-
     if df.empty:
-        # Raise the error again if still empty after download attempt
         raise ValueError(f"No data found for {stock_name} ({ticker}) between {start_date.strftime('%Y-%m-%d')} and {end_date.strftime('%Y-%m-%d')}.")
 
-    # Ensure correct column names if MultiIndex was returned previously
-    if isinstance(df.columns, pd.MultiIndex):
-        df.columns = ['_'.join(col).strip('_') if col[1] else col[0] for col in df.columns.values]
-        # Rename columns to simple names if needed
-        df = df.rename(columns={f'Date_': 'Date', f'Open_{ticker}': 'Open', f'High_{ticker}': 'High',
-                                f'Low_{ticker}': 'Low', f'Close_{ticker}': 'Close', f'Volume_{ticker}': 'Volume'})
+    return df
 
-    df['Date'] = pd.to_datetime(df['Date']) # Ensure Date is datetime object
-    # Filter df to ensure it doesn't go beyond today's actual date if extra days were fetched
-    df = df[df['Date'] <= pd.to_datetime(date.today())]
+def fetch_many_historical_data(stock_names, years=2):
+    """Fetches history for several stocks at once (one batched source call for stale tickers)."""
+    unknown = [name for name in stock_names if name not in STOCK_TICKERS]
+    if unknown:
+        raise ValueError(f"Invalid stock name provided: {', '.join(unknown)}")
 
-    return df
+    end_date = date.today()
+    start_date = date.today() - timedelta(days=years*365 + 5)
+    frames = price_store.get_many([STOCK_TICKERS[name] for name in stock_names], start_date, end_date)
+    return {name: frames[STOCK_TICKERS[name]] for name in stock_names}
 
-def estimate_confidence(model_name, last_historical_date, prediction_date_dt, historical_df, model, days_to_predict=1):
-    """Estimates model confidence based on error on recent historical data and extrapolation distance."""
-    days_diff = (prediction_date_dt - last_historical_date).days
+# --- Compact price series for charts ---
+_series_cache = {}  # stock -> (etag, payload)
+_series_lock = threading.Lock()
 
-    if len(historical_df) < 30: # Not enough data for robust confidence
-        return "Very Low"
+def get_series(stock_name, years=2):
+    """
+    Returns (etag, payload) for the full closing price history of a stock.
+
+    The payload carries the dates as little-endian int32 epoch days and the closes
+    as little-endian float32, both base64 encoded. It is built once per data version.
+    """
+    df = fetch_historical_data(stock_name, years=years)
+    version = data_version(df)
+    etag = hashlib.sha1(f"{stock_name}|{version}".encode('utf-8')).hexdigest()
+
+    with _series_lock:
+        cached = _series_cache.get(stock_name)
+        if cached and cached[0] == etag:
+            return cached
 
-    train_size = max(30, int(len(historical_df) * 0.8)) # At least 30 days, or 80%
-    recent_X = historical_df['Day'].iloc[-train_size:].values.reshape(-1, 1)
-    recent_y = historical_df['Close'].iloc[-train_size:].values
+    days = df['Date'].to_numpy().astype('datetime64[D]').astype('<i4')
+    closes = df['Close'].to_numpy().astype('<f4')
+    payload = {
+        'stock_name': stock_name,
+        'last_date': df['Date'].iloc[-1].strftime('%Y-%m-%d'),
+        'length': int(len(df)),
+        'encoding': 'base64-le',
+        'days': base64.b64encode(days.tobytes()).decode('ascii'),      # int32 days since 1970-01-01
+        'close': base64.b64encode(closes.tobytes()).decode('ascii'),   # float32 closing prices
+    }
+
+    with _series_lock:
+        _series_cache[stock_name] = (etag, payload)
+    return etag, payload
+
+def get_backtest(stock_name, model_name, df, features=None, params=None, max_workers=None):
+    """
+    Walk-forward backtest metrics for this model on this data version.
+    Computed at most once per data version (cached in memory and on disk),
+    with the folds on max_workers threads (default BACKTEST_WORKERS).
+    """
+    key = cache_key(stock_name, model_name, df, params)
+    metrics = backtest_cache.get(key)
+    if metrics is not None:
+        return metrics
 
-    if len(recent_X) > 1 and len(recent_y) > 1: # Need at least 2 points
-        if model_name == 'Linear Regression':
-            if days_diff > 365: return "Very Low"
-            if days_diff > 180: return "Low"
-            if days_diff > 90: return "Medium"
-            return "Medium-High"
-        else: # RF, XGBoost
-            if days_diff > 365: return "Very Low"
-            if days_diff > 180: return "Low"
-            if days_diff > 90: return "Medium"
-            if days_diff > 30: return "Medium-High"
-            return "High"
+    def run_and_store():
+        # Features are causal, so each fold can use a prefix of the full feature matrix
+        metrics = walk_forward(df, lambda train_df: fit_model(
+                                   model_name, train_df,
+                                   None if features is None else features.iloc[:len(train_df)], params,
+                                   intervals=False),
+                               n_folds=backtest_cache.n_folds,
+                               max_workers=max_workers or backtest_cache.max_workers)
+        # Too little history is a result too: cache it so the pair stops counting as pending
+        return backtest_cache.put(key, metrics or {'folds': 0})
+
+    return single_flight.do(('backtest',) + tuple(key), run_and_store,
+                            recheck=lambda: backtest_cache.get(key))
+
+# (stock, requested model) pairs whose backtest is queued in the background lane of this process
+_backtests_pending = set()
+_backtests_lock = threading.Lock()
+
+def run_backtest(stock_name, model_name):
+    """Background job: runs and stores the backtest for the current data version, on one thread."""
+    df = fetch_historical_data(stock_name, years=2)
+    model_used, params, _ = resolve_model(stock_name, model_name, df)
+    get_backtest(stock_name, model_used, df, get_features(stock_name, model_used, df), params,
+                 max_workers=1)
+
+def schedule_backtest(stock_name, model_name):
+    """
+    Queues the backtest for a pair in the admission controller's background
+    lane, which only uses idle capacity. Web process only; a full lane is
+    ignored and the next request for the pair tries again.
+    """
+    pair = (stock_name, model_name)
+    with _backtests_lock:
+        if pair in _backtests_pending:
+            return
+        _backtests_pending.add(pair)
+    try:
+        future = admission.submit_background(run_backtest, (stock_name, model_name))
+    except AdmissionError:
+        with _backtests_lock:
+            _backtests_pending.discard(pair)
+        return
+    future.add_done_callback(lambda f: _backtests_pending.discard(pair))
 
-    return "Low" # Default if insufficient data
+def schedule_pending_backtest(result):
+    """Queues the backtest behind a train_and_predict / forecast_range result marked confidence_pending."""
+    if isinstance(result, dict) and result.get('confidence_pending'):
+        schedule_backtest(result['stock_name'], result['prediction_model'])
+
+def cached_backtest(stock_name, model_name, df, params=None):
+    """
+    The stored backtest for this data version, or None while it is not computed yet.
+    Backtests come from the nightly pre-training; the caller queues a missing
+    one with schedule_backtest instead of running it on the request path.
+    """
+    return backtest_cache.get(cache_key(stock_name, model_name, df, params))
+
+def estimate_confidence(backtest, last_historical_date, prediction_dates, predicted_prices):
+    """
+    Derives confidence labels and numeric error bands (+/- price) for predictions
+    from the walk-forward backtest error at the matching forecast distance.
+    Both are None while the backtest is still pending (backtest is None).
+    """
+    days_ahead = [(d - last_historical_date).days for d in prediction_dates]
+    if backtest is None:
+        return [None] * len(days_ahead), [None] * len(days_ahead)
+    if not backtest.get('folds'): # Not enough history to backtest
+        return ["Very Low"] * len(days_ahead), [None] * len(days_ahead)
+
+    mape = relative_error(backtest, days_ahead, 'mape')
+    bands = relative_error(backtest, days_ahead, 'rel_rmse') * np.asarray(predicted_prices, dtype=float)
+    return [confidence_label(m) for m in mape], [round(float(b), 2) for b in bands]
+
+def backtest_intervals(backtest, last_historical_date, prediction_dates, predicted_prices):
+    """
+    Fallback intervals for models without their own: normal quantiles around the
+    prediction, scaled by the backtest relative RMSE at each forecast distance.
+    """
+    if not backtest or not backtest.get('folds'):
+        return None
+    days_ahead = [(d - last_historical_date).days for d in prediction_dates]
+    spread = relative_error(backtest, days_ahead, 'rel_rmse') * np.asarray(predicted_prices, dtype=float)
+    z = np.array([NormalDist().inv_cdf(q) for q in INTERVAL_QUANTILES])
+    return np.asarray(predicted_prices, dtype=float)[None, :] + z[:, None] * spread[None, :]
+
+def interval_dict(intervals, index):
+    """{'p10': ..., 'p50': ..., 'p90': ...} for intervals[:, index], rounded like the prices."""
+    return {f'p{round(q * 100)}': np.round(intervals[i, index], 2).tolist()
+            for i, q in enumerate(INTERVAL_QUANTILES)}
+
+def selection_summary(selection):
+    """The part of an 'Auto' selection that is returned to clients."""
+    return {
+        'model': selection['model'],
+        'params': selection['params'],
+        'cv_error': selection['cv_error'],
+        'folds': selection['folds'],
+        'budget_exhausted': selection.get('budget_exhausted', False),
+    }
 
 def train_and_predict(stock_name, model_name, prediction_date_str):
     """
     Fetches data, trains, predicts a single future date, estimates confidence,
     and also generates a short-term future trend for charting.
+    The result carries a 'timings' dict with the duration of each stage in seconds.
     """
+    timer = Timer()
     try:
-        # 1. Validate Prediction Date
-        try:
-            prediction_date_dt = datetime.strptime(prediction_date_str, '%Y-%m-%d').date()
-            if prediction_date_dt <= date.today():
-                 return {'error': "Prediction date must be in the future."}
-        except ValueError as e:
-            return {'error': f"Invalid date format or value: {e}"}
+        # 1. Validate the model and prediction date
+        with timer.span('validate'):
+            if model_name not in MODELS and model_name != AUTO_MODEL:
+                return {'error': "Invalid model name provided."}
+            try:
+                prediction_date_dt = datetime.strptime(prediction_date_str, '%Y-%m-%d').date()
+                if prediction_date_dt <= date.today():
+                     return {'error': "Prediction date must be in the future."}
+            except ValueError as e:
+                return {'error': f"Invalid date format or value: {e}"}
 
         # 2. Fetch Historical Data
-        df = fetch_historical_data(stock_name, years=2)
+        with timer.span('fetch'):
+            df = fetch_historical_data(stock_name, years=2)
         if df.empty:
             return {'error': f"Could not fetch sufficient historical data for {stock_name}."}
 
         last_historical_date = df['Date'].iloc[-1].date()
 
-        # 3. Feature Engineering
-        df['Day'] = (df['Date'] - df['Date'].min()).dt.days
-        X_train = df[['Day']]
-        y_train = df['Close']
+        # 3. Pick the model ('Auto': cross-validated choice, cached per data version)
+        with timer.span('select'):
+            model_used, params, selection = resolve_model(stock_name, model_name, df)
 
-        # 4. Train Model
-        model = get_model(model_name)
-        model.fit(X_train, y_train)
+        # 4. Feature Engineering (incremental, from the feature store)
+        with timer.span('features'):
+            features = get_features(stock_name, model_used, df)
 
-        # 5. Predict Single Future Price (for the main display)
-        prediction_day_num = (prediction_date_dt - df['Date'].min().date()).days
-        # --- CAST TO FLOAT HERE ---
-        predicted_price_main = float(model.predict(np.array([[prediction_day_num]]))[0])
-        # --- End of change ---
-
-        # 6. Estimate Confidence
-        confidence = estimate_confidence(model_name, last_historical_date, prediction_date_dt, df, model)
-
-        # 7. Generate Data for Charts
-        #    a) Historical Trend Data (Last 30 Days)
-        historical_30_days = df.tail(30).copy()
-        historical_30_data = {
-            'x': historical_30_days['Date'].dt.strftime('%Y-%m-%d').tolist(),
-            # --- Ensure historical y-values are standard floats ---
-            'y': [float(p) for p in historical_30_days['Close'].tolist()],
-        }
+        # 5. Train Model (or reuse the cached one for this data version)
+        with timer.span('fit'):
+            model = get_fitted_model(stock_name, model_used, df, features, params)
 
-        #    b) Full Historical Trend Data
-        full_historical_data = {
-            'x': df['Date'].dt.strftime('%Y-%m-%d').tolist(),
-            # --- Ensure historical y-values are standard floats ---
-            'y': [float(p) for p in df['Close'].tolist()],
-        }
-
-        #    c) Predicted Trend Data
+        # 6. Predict the main date and the trend over the next trading days in one call
         future_days_for_trend = 15
-        future_dates = [prediction_date_dt + timedelta(days=i) for i in range(future_days_for_trend + 1)]
-        future_day_nums = [(d - df['Date'].min().date()).days for d in future_dates]
-        # --- CAST EACH PREDICTED PRICE TO FLOAT HERE ---
-        predicted_future_prices = [float(p) for p in model.predict(np.array(future_day_nums).reshape(-1, 1)).tolist()]
-        # --- End of change ---
-
-        predicted_trend_data = {
-            'x': [d.strftime('%Y-%m-%d') for d in future_dates],
-            # Use the already converted list, but round for display/logging consistency
-            'y': [round(p, 2) for p in predicted_future_prices],
-        }
+        future_dates = trading_calendar.starting_at(prediction_date_dt, future_days_for_trend + 1).tolist()
+        with timer.span('predict'):
+            predicted_prices, intervals = model.predict_dates([prediction_date_dt] + future_dates, intervals=True)
+        predicted_price_main, predicted_future_prices = float(predicted_prices[0]), predicted_prices[1:].tolist()
+
+        # 7. Estimate Confidence
+        with timer.span('confidence'):
+            backtest = cached_backtest(stock_name, model_used, df, params)
+            confidences, error_bands = estimate_confidence(backtest, last_historical_date,
+                                                           [prediction_date_dt], [predicted_price_main])
+            confidence, error_band = confidences[0], error_bands[0]
+            if intervals is None:
+                intervals = backtest_intervals(backtest, last_historical_date,
+                                               [prediction_date_dt] + future_dates, predicted_prices)
 
-        # 8. Prepare results dictionary with standard floats
+        # 8. Generate Data for Charts
+        with timer.span('chart'):
+            #    a) Historical Trend Data (Last 30 Days)
+            historical_30_days = df.tail(30).copy()
+            historical_30_data = {
+                'x': historical_30_days['Date'].dt.strftime('%Y-%m-%d').tolist(),
+                # --- Ensure historical y-values are standard floats ---
+                'y': [float(p) for p in historical_30_days['Close'].tolist()],
+            }
+
+            #    b) Full Historical Trend Data is served separately by get_series (GET /series/<stock>)
+
+            #    c) Predicted Trend Data
+            predicted_trend_data = {
+                'x': [d.strftime('%Y-%m-%d') for d in future_dates],
+                # Round for display/logging consistency
+                'y': [round(p, 2) for p in predicted_future_prices],
+            }
+            if intervals is not None:
+                predicted_trend_data['interval'] = interval_dict(intervals, slice(1, None))
+
+        # 9. Prepare results dictionary with standard floats
         result_data = {
             'predicted_date': prediction_date_str,
             'prediction_model': model_name,
@@ -179,14 +498,250 @@ def train_and_predict(stock_name, model_name, prediction_date_str):
             # Use the converted float, round for display/logging consistency
             'predicted_price': round(predicted_price_main, 2),
             'confidence': confidence,
+            'error_band': error_band,
             'historical_30_data': historical_30_data,
-            'full_historical_data': full_historical_data,
             'predicted_trend_data': predicted_trend_data,
+            'timings': timer.as_dict(),
         }
+        if backtest is None:
+            result_data['confidence_pending'] = True
+        if intervals is not None:
+            result_data['prediction_interval'] = interval_dict(intervals, 0)
+        if selection is not None:
+            result_data['selected_model'] = selection_summary(selection)
 
         return result_data
 
     except Exception as e:
         print(f"Error in ML logic: {e}")
         traceback.print_exc()
-        return {'error': f"An unexpected error occurred: {str(e)}"}
\ No newline at end of file
+        return {'error': f"An unexpected error occurred: {str(e)}"}
+
+def forecast_range(stock_name, model_name, end_date_str=None, horizon_days=None,
+                   max_points=None, max_horizon_days=366):
+    """
+    Forecasts every NSE trading day from tomorrow through end_date (or horizon_days
+    calendar days ahead) with one batched predict. When the range has more than
+    max_points trading days, an evenly spaced subset (first and last day kept) is
+    predicted and returned instead, which is all a chart needs. Ranges are cut
+    off at the end of the last year in the NSE holiday list ('requested_end_date'
+    is then included), since later holidays are not known yet.
+    """
+    timer = Timer()
+    try:
+        # 1. Validate the request
+        with timer.span('validate'):
+            if stock_name not in STOCK_TICKERS:
+                return {'error': "Invalid stock name provided."}
+            if model_name not in MODELS and model_name != AUTO_MODEL:
+                return {'error': "Invalid model name provided."}
+            start_date = date.today() + timedelta(days=1)
+            try:
+                if end_date_str:
+                    end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
+                else:
+                    horizon_days = max_horizon_days if horizon_days is None else int(horizon_days)
+                    if horizon_days < 1:
+                        return {'error': "horizon_days must be at least 1."}
+                    end_date = start_date + timedelta(days=horizon_days - 1)
+            except (TypeError, ValueError) as e:
+                return {'error': f"Invalid end date or horizon: {e}"}
+            if end_date < start_date:
+                return {'error': "The forecast range must end in the future."}
+            if (end_date - date.today()).days > max_horizon_days:
+                return {'error': f"The forecast horizon is limited to {max_horizon_days} days."}
+            requested_end_date = end_date
+            covered_until = trading_calendar.covered_until()
+            if covered_until is not None and end_date > covered_until:
+                if start_date > covered_until:
+                    return {'error': f"Trading holidays are only known through {covered_until:%Y-%m-%d}."}
+                end_date = covered_until
+
+        # 2. Fetch, featurize and fit (cached per data version)
+        with timer.span('fetch'):
+            df = fetch_historical_data(stock_name, years=2)
+        if df.empty:
+            return {'error': f"Could not fetch sufficient historical data for {stock_name}."}
+        with timer.span('select'):
+            model_used, params, selection = resolve_model(stock_name, model_name, df)
+        with timer.span('features'):
+            features = get_features(stock_name, model_used, df)
+        with timer.span('fit'):
+            model = get_fitted_model(stock_name, model_used, df, features, params)
+
+        # 3. Trading days in the range, thinned out for long horizons
+        dates = trading_calendar.between(start_date, end_date)
+        if len(dates) == 0:
+            return {'error': "There are no trading days in the requested range."}
+        dates_to_predict = dates[downsample_indices(len(dates), max_points)].tolist()
+
+        # 4. One batched predict plus vectorized error bands
+        with timer.span('predict'):
+            prices, intervals = model.predict_dates(dates_to_predict, intervals=True)
+        with timer.span('confidence'):
+            backtest = cached_backtest(stock_name, model_used, df, params)
+            confidences, error_bands = estimate_confidence(backtest, model.last_date, dates_to_predict, prices)
+            if intervals is None:
+                intervals = backtest_intervals(backtest, model.last_date, dates_to_predict, prices)
+
+        result = {
+            'stock_name': stock_name,
+            'prediction_model': model_name,
+            'last_historical_date': model.last_date.strftime('%Y-%m-%d'),
+            'start_date': start_date.strftime('%Y-%m-%d'),
+            'end_date': end_date.strftime('%Y-%m-%d'),
+            'trading_days': int(len(dates)),
+            'downsampled': len(dates_to_predict) < len(dates),
+            'forecast': {
+                'x': [d.strftime('%Y-%m-%d') for d in dates_to_predict],
+                'y': np.round(prices, 2).tolist(),
+                'confidence': confidences,
+                'error_band': error_bands,
+            },
+            'timings': timer.as_dict(),
+        }
+        if intervals is not None:
+            result['forecast']['interval'] = interval_dict(intervals, slice(None))
+        if end_date != requested_end_date:
+            result['requested_end_date'] = requested_end_date.strftime('%Y-%m-%d')
+        if backtest is None:
+            result['confidence_pending'] = True
+        if selection is not None:
+            result['selected_model'] = selection_summary(selection)
+        return result
+
+    except Exception as e:
+        print(f"Error in ML logic: {e}")
+        traceback.print_exc()
+        return {'error': f"An unexpected error occurred: {str(e)}"}
+
+def _fit_error(pair, error):
+    """The per-item error message for a (stock, model) pair whose fit raised error."""
+    if isinstance(error, (ValueError, AdmissionError)):
+        return str(error)
+    logger.error("Batch fit for %s / %s failed", pair[0], pair[1], exc_info=error)
+    return f"An unexpected error occurred: {error}"
+
+def batch_train_and_predict(items, executor=None):
+    """
+    Predicts many (stock, model, dates) requests at once.
+
+    items is a list of {'stock': ..., 'model': ..., 'dates': [...]} dicts. History
+    for all stocks is loaded in one go, every unique (stock, model) pair is fitted
+    once (in parallel on executor when given, skipping cached models) and all
+    requested dates for a pair are predicted in a single vectorized call.
+    Returns a list with one result dict per item, in order.
+    """
+    results = [None] * len(items)
+    parsed_dates = [None] * len(items)
+    wanted = {}  # (stock, model) -> set of dates
+
+    # 1. Validate every item up front
+    for i, item in enumerate(items):
+        stock_name, model_name, dates = item.get('stock'), item.get('model'), item.get('dates')
+        if (stock_name not in STOCK_TICKERS or model_name not in MODELS or not isinstance(dates, list)
+                or not dates or not all(isinstance(d, str) for d in dates)):
+            results[i] = {'error': "Each item needs a valid stock, model and a non-empty list of dates."}
+            continue
+        try:
+            parsed = [datetime.strptime(d, '%Y-%m-%d').date() for d in dates]
+        except (TypeError, ValueError) as e:
+            results[i] = {'error': f"Invalid date format or value: {e}"}
+            continue
+        if min(parsed) <= date.today():
+            results[i] = {'error': "Prediction dates must be in the future."}
+            continue
+        parsed_dates[i] = parsed
+        wanted.setdefault((stock_name, model_name), set()).update(parsed)
+
+    if not wanted:
+        return results
+
+    # 2. Fetch history for all stocks together
+    # A pair that fails (e.g. too little history) only fails the items that asked for it
+    frames = fetch_many_historical_data(sorted({stock for stock, _ in wanted}))
+    failed = {}  # (stock, model) -> error message
+    features = {}
+    for pair in wanted:
+        if frames[pair[0]].empty:
+            failed[pair] = f"Could not fetch sufficient historical data for {pair[0]}."
+            continue
+        try:
+            features[pair] = get_features(pair[0], pair[1], frames[pair[0]])
+        except ValueError as e:
+            failed[pair] = str(e)
+
+    # 3. Fit unique (stock, model) pairs, in parallel where the cache misses
+    fitted = {}
+    pending = {}
+    for stock_name, model_name in features:
+        pair = (stock_name, model_name)
+        df = frames[stock_name]
+        key = cache_key(stock_name, model_name, df)
+        fitted[pair] = model_cache.get(key)
+        if fitted[pair] is None:
+            if executor is not None:
+                pending[pair] = (key, executor.submit(fit_model, model_name, df, features[pair]))
+                continue
+            try:
+                fitted[pair] = model_cache.put(key, fit_model(model_name, df, features[pair]))
+            except Exception as e:
+                failed[pair] = _fit_error(pair, e)
+
+    # A fit that fails (or expires in the admission queue) only fails its own items. The whole
+    # batch is rejected only when submitting its first fit raises AdmissionError above
+    for pair, (key, future) in pending.items():
+        try:
+            fitted[pair] = model_cache.put(key, future.result())
+        except Exception as e:
+            failed[pair] = _fit_error(pair, e)
+
+    # 4. One vectorized predict per (stock, model) pair
+    predictions = {}
+    confidence_pending = set()
+    for pair, dates in wanted.items():
+        if pair in failed:
+            continue
+        model = fitted[pair]
+        ordered = sorted(dates)
+        try:
+            prices, intervals = model.predict_dates(ordered, intervals=True)
+        except ValueError as e:
+            failed[pair] = str(e)
+            continue
+        backtest = cached_backtest(pair[0], pair[1], frames[pair[0]])
+        confidences, bands = estimate_confidence(backtest, model.last_date, ordered, prices)
+        if intervals is None:
+            intervals = backtest_intervals(backtest, model.last_date, ordered, prices)
+        if backtest is None:
+            confidence_pending.add(pair)
+            schedule_backtest(*pair)
+        predictions[pair] = {
+            d: (round(float(p), 2), label, band, None if intervals is None else interval_dict(intervals, i))
+            for i, (d, p, label, band) in enumerate(zip(ordered, prices, confidences, bands))
+        }
+
+    # 5. Assemble per-item results
+    for i, item in enumerate(items):
+        if results[i] is not None:
+            continue
+        pair = (item['stock'], item['model'])
+        if pair in failed:
+            results[i] = {'error': failed[pair]}
+            continue
+        results[i] = {
+            'stock_name': item['stock'],
+            'prediction_model': item['model'],
+            'predictions': [
+                {'predicted_date': d.strftime('%Y-%m-%d'),
+                 'predicted_price': predictions[pair][d][0],
+                 'confidence': predictions[pair][d][1],
+                 'error_band': predictions[pair][d][2],
+                 'interval': predictions[pair][d][3]}
+                for d in parsed_dates[i]
+            ],
+        }
+        if pair in confidence_pending:
+            results[i]['confidence_pending'] = True
+
+    return results
@@ -0,0 +1,58 @@
+"""
+Registry of model backends.
+
+Each model is described by the module and class that implement it plus its
+hyperparameters. The backend library (scikit-learn, XGBoost, ...) is imported
+the first time a model of that kind is actually built, so importing the web
+app does not pay for libraries a worker may never use.
+"""
+import importlib
+import threading
+from collections import namedtuple
+
+ModelSpec = namedtuple('ModelSpec', ['module', 'class_name', 'params', 'feature_set'])
+
+MODELS = {} # display name -> ModelSpec, in registration order
+_classes = {}
+_lock = threading.Lock()
+
+
+def register_model(name, module, class_name, params=None, feature_set='technical'):
+    """Adds (or replaces) a model backend under a display name."""
+    MODELS[name] = ModelSpec(module, class_name, dict(params or {}), feature_set)
+    _classes.pop(name, None)
+    return MODELS[name]
+
+
+def model_spec(name):
+    try:
+        return MODELS[name]
+    except KeyError:
+        raise ValueError("Invalid model name provided.") from None
+
+
+def estimator_class(name):
+    """Imports the backend for a model on first use and returns its estimator class."""
+    cls = _classes.get(name)
+    if cls is None:
+        spec = model_spec(name)
+        with _lock:
+            cls = _classes.get(name)
+            if cls is None:
+                cls = _classes[name] = getattr(importlib.import_module(spec.module), spec.class_name)
+    return cls
+
+
+def create_estimator(name, params=None):
+    """A fresh, untrained estimator for a registered model (params override its defaults)."""
+    return estimator_class(name)(**{**model_spec(name).params, **(params or {})})
+
+
+# --- Built-in models ---
+
+register_model('Linear Regression', 'sklearn.linear_model', 'LinearRegression', feature_set='day')
+register_model('Random Forest', 'sklearn.ensemble', 'RandomForestRegressor',
+               {'n_estimators': 100, 'random_state': 42, 'max_features': 0.5, 'min_samples_leaf': 3})
+register_model('XGBoost', 'xgboost', 'XGBRegressor',
+               {'n_estimators': 100, 'random_state': 42, 'objective': 'reg:squarederror'})
+register_model('Online RLS', 'project.online', 'RecursiveLeastSquares', {'forgetting': 0.999})
@@ -0,0 +1,102 @@
+"""
+Two-tier cache for trained models.
+
+Tier 1 is an in-process LRU bounded by an approximate memory cap (counting
+only private memory, memory-mapped forests are shared), tier 2 is the
+on-disk model registry, so fitted models survive worker restarts and are
+shared between workers.
+Keys contain the data version, so new bars automatically produce new keys and
+older versions for the same stock/model are dropped on the next put.
+"""
+import threading
+from collections import OrderedDict, namedtuple
+
+from config import Config
+from .model_registry import model_registry
+
+CacheKey = namedtuple('CacheKey', ['stock', 'model_name', 'data_version', 'config_hash'])
+
+
+class ModelCache:
+    """LRU + on-disk cache of FittedModel objects."""
+
+    def __init__(self, max_bytes=None):
+        self.max_bytes = max_bytes if max_bytes is not None else Config.MODEL_CACHE_MAX_MB * 1024 * 1024
+        self._entries = OrderedDict()  # key -> (fitted, size)
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def init_app(self, app):
+        """Configures the cache from the Flask app config."""
+        self.configure(app.config)
+
+    def configure(self, config):
+        """Configures the cache from a config mapping (also used by worker processes)."""
+        model_registry.configure(config)
+        if config.get('MODEL_CACHE_MAX_MB') is not None:
+            self.max_bytes = config['MODEL_CACHE_MAX_MB'] * 1024 * 1024
+
+    # --- Public API ---
+
+    def get(self, key):
+        """Returns the cached model for key, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+
+        fitted, size = model_registry.load(key)
+        if fitted is None:
+            self.misses += 1
+            return None
+
+        self.disk_hits += 1
+        self._remember(key, fitted, size)
+        return fitted
+
+    def put(self, key, fitted):
+        """
+        Publishes a freshly trained model, then keeps the memory-mapped copy
+        (shared with other workers) in the in-process tier and drops stale versions.
+        """
+        model_registry.publish(key, fitted)
+        shared, size = model_registry.load(key)
+        if shared is None:
+            shared, size = fitted, 0
+        self._remember(key, shared, size)
+        self._drop_stale(key)
+        return shared
+
+    def clear(self):
+        """Empties the in-process tier (disk artifacts are kept)."""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    # --- Internals ---
+
+    def _remember(self, key, fitted, size):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= old[1]
+            self._entries[key] = (fitted, size)
+            self._size += size
+            # Evict least recently used entries, but always keep the newest one
+            while self._size > self.max_bytes and len(self._entries) > 1:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._size -= evicted_size
+
+    def _drop_stale(self, key):
+        with self._lock:
+            for other in [k for k in self._entries
+                          if k[:2] == key[:2] and k != key]:
+                self._size -= self._entries.pop(other)[1]
+
+
+model_cache = ModelCache()
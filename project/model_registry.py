@@ -0,0 +1,227 @@
+"""
+Shared, memory-mapped model artifacts.
+
+Trained models are published to the instance folder in formats every worker
+can map read-only instead of unpickling a private copy:
+
+* Random Forests are flattened into one set of node arrays (children, split
+  feature, threshold, leaf value) saved as .npy files and loaded with
+  mmap_mode='r', so all workers share the same page-cache pages. scikit-learn
+  copies tree nodes into private memory when unpickling, which is why the
+  forest is served by PackedForest rather than the original estimator.
+* XGBoost boosters (and their prediction interval booster) use the native
+  binary format.
+* Everything else (small linear models, FittedModel metadata) uses joblib.
+
+Each (stock, model) directory holds one subdirectory per published version
+plus a CURRENT pointer file. Versions are written to a temp directory and
+renamed into place, then CURRENT is swapped atomically, so readers never see
+a half-written artifact.
+"""
+import os
+import shutil
+
+import joblib
+import numpy as np
+
+from config import Config
+
+FOREST_ARRAYS = ('left', 'right', 'feature', 'threshold', 'value', 'missing_left', 'roots')
+
+
+class PackedForest:
+    """
+    Read-only Random Forest predictor over flat (optionally memory-mapped) node arrays.
+    Traverses all trees for all samples at once with NumPy, one tree level per step.
+    """
+
+    def __init__(self, left, right, feature, threshold, value, missing_left, roots, max_depth):
+        self.left = left
+        self.right = right
+        self.feature = feature
+        self.threshold = threshold
+        self.value = value
+        self.missing_left = missing_left
+        self.roots = roots
+        self.max_depth = int(max_depth)
+
+    @classmethod
+    def from_estimator(cls, forest):
+        """Flattens a fitted RandomForestRegressor (single output) into node arrays."""
+        trees = [estimator.tree_ for estimator in forest.estimators_]
+        offsets = np.cumsum([0] + [tree.node_count for tree in trees])
+
+        def children(tree, array, offset):
+            return np.where(array == -1, -1, array + offset)
+
+        left = np.concatenate([children(t, t.children_left, o) for t, o in zip(trees, offsets)])
+        right = np.concatenate([children(t, t.children_right, o) for t, o in zip(trees, offsets)])
+        missing = [getattr(t, 'missing_go_to_left', np.zeros(t.node_count, dtype=np.uint8)) for t in trees]
+        return cls(
+            left=left.astype(np.int64),
+            right=right.astype(np.int64),
+            feature=np.concatenate([t.feature for t in trees]).astype(np.int64),
+            threshold=np.concatenate([t.threshold for t in trees]).astype(np.float64),
+            value=np.concatenate([t.value[:, 0, 0] for t in trees]).astype(np.float64),
+            missing_left=np.concatenate(missing).astype(bool),
+            roots=offsets[:-1].astype(np.int64),
+            max_depth=max(t.max_depth for t in trees),
+        )
+
+    def predict_trees(self, X):
+        """Per-tree predictions as a (n_trees, n_samples) array."""
+        # sklearn compares float32 inputs against float64 thresholds
+        X = np.asarray(X, dtype=np.float32)
+        samples = np.arange(X.shape[0])[None, :]
+        node = np.repeat(self.roots[:, None], X.shape[0], axis=1)
+        for _ in range(self.max_depth):
+            is_leaf = self.left[node] == -1
+            if is_leaf.all():
+                break
+            x = X[samples, np.maximum(self.feature[node], 0)]
+            go_left = np.where(np.isnan(x), self.missing_left[node], x <= self.threshold[node])
+            node = np.where(is_leaf, node, np.where(go_left, self.left[node], self.right[node]))
+        return self.value[node]
+
+    def predict(self, X):
+        return self.predict_trees(X).mean(axis=0)
+
+    def save(self, directory):
+        for name in FOREST_ARRAYS:
+            np.save(os.path.join(directory, f'{name}.npy'), np.ascontiguousarray(getattr(self, name)))
+
+    @classmethod
+    def load(cls, directory, max_depth):
+        arrays = {name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode='r') for name in FOREST_ARRAYS}
+        return cls(max_depth=max_depth, **arrays)
+
+
+def _safe(name):
+    return ''.join(c if c.isalnum() or c in '-_.' else '_' for c in name)
+
+
+class ModelRegistry:
+    """Publishes and loads versioned model artifacts for a (stock, model) pair."""
+
+    def __init__(self, root=None):
+        self.root = root
+
+    def init_app(self, app):
+        self.configure(app.config)
+
+    def configure(self, config):
+        self.root = config.get('MODEL_CACHE_DIR') or self.root
+
+    def publish(self, key, fitted):
+        """Writes fitted under key, makes it the current version and removes older versions."""
+        base = self._base(key)
+        version = self._version(key)
+        final = os.path.join(base, version)
+        tmp = os.path.join(base, f'.{version}.{os.getpid()}.tmp')
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+
+        estimator = fitted.estimator
+        kind = 'joblib'
+        if type(estimator).__name__ == 'RandomForestRegressor':
+            kind = 'forest'
+            packed = PackedForest.from_estimator(estimator)
+            packed.save(tmp)
+        elif isinstance(estimator, PackedForest):
+            kind = 'forest'
+            estimator.save(tmp)
+            packed = estimator
+        elif hasattr(estimator, 'save_model'):
+            kind = 'xgboost'
+            estimator.save_model(os.path.join(tmp, 'model.ubj'))
+        interval_estimator = fitted.interval_estimator
+        if interval_estimator is not None:
+            interval_estimator.save_model(os.path.join(tmp, 'intervals.ubj'))
+
+        # The metadata pickle never carries a forest or booster
+        fitted.estimator = estimator if kind == 'joblib' else None
+        fitted.interval_estimator = None
+        try:
+            joblib.dump({'kind': kind, 'fitted': fitted,
+                         'max_depth': packed.max_depth if kind == 'forest' else None},
+                        os.path.join(tmp, 'meta.joblib'))
+        finally:
+            fitted.estimator = estimator
+            fitted.interval_estimator = interval_estimator
+
+        if os.path.isdir(final):
+            shutil.rmtree(tmp, ignore_errors=True)  # another worker published the same version
+        else:
+            try:
+                os.rename(tmp, final)
+            except OSError:
+                shutil.rmtree(tmp, ignore_errors=True)
+
+        pointer = os.path.join(base, 'CURRENT')
+        pointer_tmp = f'{pointer}.{os.getpid()}.tmp'
+        with open(pointer_tmp, 'w') as fh:
+            fh.write(version)
+        os.replace(pointer_tmp, pointer)
+
+        self._remove_old_versions(base, version)
+
+    def load(self, key):
+        """Returns (fitted, private_bytes) for key if it is the current version, else (None, 0)."""
+        base = self._base(key)
+        version = self._version(key)
+        try:
+            with open(os.path.join(base, 'CURRENT')) as fh:
+                if fh.read().strip() != version:
+                    return None, 0
+        except OSError:
+            return None, 0
+
+        directory = os.path.join(base, version)
+        try:
+            meta = joblib.load(os.path.join(directory, 'meta.joblib'))
+            fitted = meta['fitted']
+            size = os.path.getsize(os.path.join(directory, 'meta.joblib'))
+            if meta['kind'] == 'forest':
+                # Shared read-only pages, nothing private beyond the metadata
+                fitted.estimator = PackedForest.load(directory, meta['max_depth'])
+            elif meta['kind'] == 'xgboost':
+                from xgboost import XGBRegressor
+                estimator = XGBRegressor()
+                estimator.load_model(os.path.join(directory, 'model.ubj'))
+                fitted.estimator = estimator
+                size += os.path.getsize(os.path.join(directory, 'model.ubj'))
+                if os.path.exists(os.path.join(directory, 'intervals.ubj')):
+                    intervals = XGBRegressor()
+                    intervals.load_model(os.path.join(directory, 'intervals.ubj'))
+                    fitted.interval_estimator = intervals
+                    size += os.path.getsize(os.path.join(directory, 'intervals.ubj'))
+        except Exception as e:
+            print(f"Discarding unreadable model artifact {directory}: {e}")
+            return None, 0
+        return fitted, size
+
+    def _base(self, key):
+        root = self.root or Config.MODEL_CACHE_DIR
+        path = os.path.join(root, _safe(key.stock), _safe(key.model_name))
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def _version(self, key):
+        return f'{_safe(key.data_version)}-{key.config_hash}'
+
+    def _remove_old_versions(self, base, keep):
+        for name in os.listdir(base):
+            if name in (keep, 'CURRENT') or name.startswith('.') or name.endswith('.tmp'):
+                continue
+            # Workers that still map the old files keep their pages until they reload
+            path = os.path.join(base, name)
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+
+model_registry = ModelRegistry()
@@ -0,0 +1,209 @@
+"""
+Automatic model selection ('Auto').
+
+Every registered model is tried with a small hyperparameter grid using
+time-series cross-validation: each fold fits on the bars before an origin and
+is scored on the following SELECTION_HORIZONS bars, most recent origin first.
+Folds run in parallel on a worker pool and candidates race each other: a
+candidate whose error after SELECTION_MIN_FOLDS folds is clearly worse than
+the best one on the same folds is abandoned, and whatever has finished when
+the wall-clock budget runs out decides. The choice is cached per (stock, data
+version) in the backtest cache, so the search runs at most once a trading day.
+"""
+import hashlib
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+
+import numpy as np
+
+from config import Config
+from .backtest import backtest_cache
+from .model_backends import MODELS
+from .singleflight import single_flight
+
+AUTO_MODEL = 'Auto'
+
+# Bars after each fold origin that a candidate is scored on
+SELECTION_HORIZONS = (1, 5, 10, 21, 42, 63)
+
+# Hyperparameter overrides tried per model (on top of its registered defaults)
+SEARCH_SPACE = {
+    'Linear Regression': [{}],
+    'Random Forest': [
+        {},
+        {'max_features': 0.3, 'min_samples_leaf': 10},
+        {'n_estimators': 50, 'max_depth': 6},
+    ],
+    'XGBoost': [
+        {},
+        {'max_depth': 3, 'learning_rate': 0.05, 'n_estimators': 200},
+        {'max_depth': 4, 'subsample': 0.8, 'colsample_bytree': 0.8},
+    ],
+    'Online RLS': [{'forgetting': 0.999}, {'forgetting': 0.99}],
+}
+
+
+def score_fold(model_name, params, df, features, origin, horizons=SELECTION_HORIZONS):
+    """Fits on the bars before origin; returns the mean absolute percentage error over horizons."""
+    from .ml_logic import fit_model
+    model = fit_model(model_name, df.iloc[:origin],
+                      None if features is None else features.iloc[:origin], params, intervals=False)
+    targets = origin - 1 + np.asarray(horizons)
+    actual = df['Close'].to_numpy(dtype=float)[targets]
+    predicted = model.predict_dates(df['Date'].to_numpy().astype('datetime64[D]')[targets])
+    return float(np.mean(np.abs(predicted - actual) / actual))
+
+
+class ModelSelector:
+    """Picks the best (model, hyperparameters) for a stock under a time budget."""
+
+    def __init__(self):
+        self.config = {}
+        self.budget = Config.SELECTION_BUDGET_SECONDS
+        self.n_folds = Config.SELECTION_FOLDS
+        self.min_folds = Config.SELECTION_MIN_FOLDS
+        self.abandon_margin = Config.SELECTION_ABANDON_MARGIN
+        self.workers = Config.SELECTION_WORKERS
+        self.executor_kind = Config.SELECTION_EXECUTOR
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.configure(app.config)
+
+    def configure(self, config):
+        self.config = config
+        self.budget = config.get('SELECTION_BUDGET_SECONDS', self.budget)
+        self.n_folds = config.get('SELECTION_FOLDS', self.n_folds)
+        self.min_folds = config.get('SELECTION_MIN_FOLDS', self.min_folds)
+        self.abandon_margin = config.get('SELECTION_ABANDON_MARGIN', self.abandon_margin)
+        self.workers = config.get('SELECTION_WORKERS', self.workers)
+        self.executor_kind = config.get('SELECTION_EXECUTOR', self.executor_kind)
+
+    def executor(self):
+        """The shared evaluation pool, started on first use and reused across selections."""
+        from .jobs import create_worker_pool
+        with self._lock:
+            if self._executor is None:
+                # Inside a pool worker, a nested process pool would oversubscribe the
+                # CPU and keep the worker from exiting on shutdown
+                kind = 'thread' if multiprocessing.parent_process() is not None else self.executor_kind
+                self._executor = create_worker_pool(self.config, self.workers or os.cpu_count() or 1,
+                                                    kind=kind)
+            return self._executor
+
+    def candidates(self):
+        return [(name, params) for name in MODELS for params in SEARCH_SPACE.get(name, [{}])]
+
+    def search_hash(self):
+        """Identifies the search (candidates, folds, horizons) so a changed grid invalidates cached choices."""
+        from .ml_logic import model_config_hash
+        payload = repr(([model_config_hash(name, tuple(sorted(params.items())))
+                         for name, params in self.candidates()], self.n_folds, SELECTION_HORIZONS))
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:12]
+
+    def select(self, stock_name, df):
+        """Returns the selection dict ('model', 'params', ...) for this data version, searching at most once."""
+        from .ml_logic import data_version
+        from .model_cache import CacheKey
+        key = CacheKey(stock_name, AUTO_MODEL, data_version(df), self.search_hash())
+        selection = backtest_cache.get(key)
+        if selection is not None:
+            return selection
+
+        def search_and_store():
+            return backtest_cache.put(key, self.search(stock_name, df))
+
+        return single_flight.do(('select',) + tuple(key), search_and_store,
+                                recheck=lambda: backtest_cache.get(key))
+
+    def search(self, stock_name, df):
+        """Races all candidates over the cross-validation folds within the time budget."""
+        from .ml_logic import get_features
+        start = time.perf_counter()
+        candidates = self.candidates()
+        n = len(df)
+        last_origin = n - max(SELECTION_HORIZONS)
+        first_origin = max(60, n // 2)
+        if last_origin <= first_origin:
+            name = next(iter(MODELS))
+            return {'model': name, 'params': {}, 'cv_error': None, 'folds': 0,
+                    'reason': 'not enough history', 'candidates': [], 'seconds': 0.0}
+        # Most recent fold first, so an early stop still judges on recent behaviour
+        origins = np.unique(np.linspace(first_origin, last_origin, self.n_folds).astype(int))[::-1].tolist()
+        features = {name: get_features(stock_name, name, df) for name in {name for name, _ in candidates}}
+
+        errors = [[] for _ in candidates]
+        status = ['running'] * len(candidates)
+        executor = self.executor()
+        pending = {}
+
+        def submit(i):
+            name, params = candidates[i]
+            future = executor.submit(score_fold, name, params, df, features[name], origins[len(errors[i])])
+            pending[future] = i
+
+        def best_error(folds, exclude):
+            scores = [np.mean(e[:folds]) for j, e in enumerate(errors)
+                      if j != exclude and len(e) >= folds and status[j] != 'failed']
+            return min(scores) if scores else None
+
+        for i in range(len(candidates)):
+            submit(i)
+        deadline = start + self.budget
+        while pending:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            done, _ = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                i = pending.pop(future)
+                try:
+                    errors[i].append(future.result())
+                except Exception as e:
+                    print(f"Model selection candidate {candidates[i]} failed: {e}")
+                    status[i] = 'failed'
+                    continue
+                folds = len(errors[i])
+                best = best_error(folds, exclude=i)
+                if folds >= self.min_folds and best is not None and np.mean(errors[i]) > best * (1 + self.abandon_margin):
+                    status[i] = 'abandoned'
+                elif folds == len(origins):
+                    status[i] = 'done'
+                else:
+                    submit(i)
+
+        budget_exhausted = bool(pending)
+        for future, i in pending.items():
+            future.cancel() # folds already running finish in the background and are ignored
+            status[i] = 'timed out'
+
+        # Compare the remaining candidates on the folds they all completed
+        # (the most recent ones), so slow candidates are not judged on fewer folds than fast ones
+        contenders = [i for i, e in enumerate(errors) if e and status[i] not in ('failed', 'abandoned')]
+        summary = [{'model': name, 'params': params, 'status': status[i], 'folds': len(errors[i]),
+                    'cv_error': float(np.mean(errors[i])) if errors[i] else None}
+                   for i, (name, params) in enumerate(candidates)]
+        if not contenders:
+            name = next(iter(MODELS))
+            return {'model': name, 'params': {}, 'cv_error': None, 'folds': 0,
+                    'reason': 'no candidate finished within the budget', 'candidates': summary,
+                    'budget_exhausted': budget_exhausted, 'seconds': time.perf_counter() - start}
+        folds = min(len(errors[i]) for i in contenders)
+        winner = min(contenders, key=lambda i: np.mean(errors[i][:folds]))
+        name, params = candidates[winner]
+        return {
+            'model': name,
+            'params': params,
+            'cv_error': float(np.mean(errors[winner][:folds])),
+            'folds': folds,
+            'candidates': summary,
+            'budget_exhausted': budget_exhausted,
+            'seconds': time.perf_counter() - start,
+        }
+
+
+model_selector = ModelSelector()
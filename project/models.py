@@ -46,6 +46,12 @@ class PredictionLog(db.Model):
     PredictionLog model storing single date predictions.
     """
     __tablename__ = 'prediction_log' # Keep table name consistent
+    __table_args__ = (
+        # Admin keyset pagination walks (timestamp, id) newest first
+        db.Index('ix_prediction_log_timestamp_id', 'timestamp', 'id'),
+        db.Index('ix_prediction_log_user_timestamp', 'user_id', 'timestamp'),
+        db.Index('ix_prediction_log_stock_model_timestamp', 'stock_ticker', 'model_used', 'timestamp'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -56,7 +62,112 @@ class PredictionLog(db.Model):
     predicted_price = db.Column(db.Float, nullable=False) # Store the single predicted price
     confidence = db.Column(db.String(20), nullable=True, default='Low') # Store confidence level
     # --- End of Updated Fields ---
+    timings = db.Column(db.Text, nullable=True) # JSON stage timing breakdown (seconds)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
 
     def __repr__(self):
-        return f'<Log {self.id} for {self.stock_ticker} on {self.predicted_date}>'
\ No newline at end of file
+        return f'<Log {self.id} for {self.stock_ticker} on {self.predicted_date}>'
+
+
+class PredictionDailyStats(db.Model):
+    """Rollup: number of predictions per stock, model and (UTC) day, maintained on every log write."""
+    __tablename__ = 'prediction_daily_stats'
+
+    day = db.Column(db.Date, primary_key=True)
+    stock_ticker = db.Column(db.String(20), primary_key=True)
+    model_used = db.Column(db.String(50), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<PredictionDailyStats {self.day} {self.stock_ticker} {self.model_used}: {self.count}>'
+
+
+class UserPredictionStats(db.Model):
+    """Rollup: number of predictions and the latest one per user, maintained on every log write."""
+    __tablename__ = 'user_prediction_stats'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    last_prediction_at = db.Column(db.DateTime, nullable=True)
+
+    user = db.relationship('User', lazy='joined')
+
+    def __repr__(self):
+        return f'<UserPredictionStats {self.user_id}: {self.count}>'
+
+
+class Forecast(db.Model):
+    """
+    Precomputed forecast for one stock/model/target date, written by the
+    nightly pre-training run and served by /predict when the date is in the grid.
+    GET /screener ranks the universe by these rows at a fixed trading-day horizon.
+    """
+    __tablename__ = 'forecast'
+    __table_args__ = (
+        db.UniqueConstraint('stock_ticker', 'model_used', 'target_date', name='uq_forecast_target'),
+        # Screener: one model and horizon, ranked by predicted return
+        db.Index('ix_forecast_screen', 'model_used', 'trading_days_ahead', 'predicted_return'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    stock_ticker = db.Column(db.String(20), nullable=False)
+    model_used = db.Column(db.String(50), nullable=False)
+    target_date = db.Column(db.Date, nullable=False)
+    predicted_price = db.Column(db.Float, nullable=False)
+    confidence = db.Column(db.String(20), nullable=True)
+    error_band = db.Column(db.Float, nullable=True)
+    # Prediction interval at ml_logic.INTERVAL_QUANTILES (low, median, high); None if the model has none
+    interval_low = db.Column(db.Float, nullable=True)
+    interval_mid = db.Column(db.Float, nullable=True)
+    interval_high = db.Column(db.Float, nullable=True)
+    last_date = db.Column(db.Date, nullable=False) # last historical bar the model was trained on
+    last_close = db.Column(db.Float, nullable=False)
+    trading_days_ahead = db.Column(db.Integer, nullable=False) # target_date is this many trading days after last_date
+    predicted_return = db.Column(db.Float, nullable=False) # predicted_price / last_close - 1
+    data_version = db.Column(db.String(64), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<Forecast {self.stock_ticker} {self.model_used} {self.target_date}>'
+
+
+class PretrainJob(db.Model):
+    """One (stock, model) unit of work in a pre-training run; lets a crashed run resume."""
+    __tablename__ = 'pretrain_job'
+    __table_args__ = (
+        db.UniqueConstraint('run_date', 'stock_ticker', 'model_used', name='uq_pretrain_job'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    run_date = db.Column(db.Date, nullable=False, index=True)
+    stock_ticker = db.Column(db.String(20), nullable=False)
+    model_used = db.Column(db.String(50), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending') # pending/running/done/failed
+    duration = db.Column(db.Float, nullable=True) # seconds
+    error = db.Column(db.Text, nullable=True)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f'<PretrainJob {self.run_date} {self.stock_ticker} {self.model_used} {self.status}>'
+
+
+class ApiToken(db.Model):
+    """
+    Bearer token for the /api/v1 endpoints. Only an HMAC-SHA256 of the token is
+    stored (see api_auth); the token itself is shown once, when it is created.
+    """
+    __tablename__ = 'api_token'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    name = db.Column(db.String(80), nullable=False)
+    token_hash = db.Column(db.String(64), unique=True, nullable=False) # hex HMAC-SHA256
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_used_at = db.Column(db.DateTime, nullable=True) # refreshed at most once per resolver cache TTL
+    revoked_at = db.Column(db.DateTime, nullable=True)
+
+    user = db.relationship('User', lazy='joined')
+
+    def __repr__(self):
+        return f'<ApiToken {self.id} {self.name} for user {self.user_id}>'
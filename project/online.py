@@ -0,0 +1,323 @@
+"""
+Online (incremental) forecasting.
+
+RecursiveLeastSquares is a linear model over the technical features that can
+be updated one sample at a time. It is registered as a normal model, so it is
+batch-fitted from history and cached like the others. OnlineTracker then keeps
+a private copy of it current with a stream of quotes: a quote for the forming
+bar refreshes the prediction inputs, and when a new bar starts the finished one
+is learned with one update per direct horizon. Each update only touches the
+last WARMUP bars and a d x d matrix, so its cost does not grow with history.
+
+Quotes come from a pluggable QuoteSource (polling the configured data source in
+production, a replayed CSV file offline). OnlineHub runs one consumer thread
+per stock that has subscribers and fans updated forecasts out to them, which
+the /online/<stock>/stream SSE endpoint delivers to the dashboard.
+"""
+import copy
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+ONLINE_MODEL = 'Online RLS'
+
+
+class RecursiveLeastSquares:
+    """
+    Exponentially weighted recursive least squares with an intercept.
+    Inputs are standardized with the mean/scale of the initial fit; partial_fit
+    costs O(d^2) per sample.
+    """
+
+    def __init__(self, forgetting=0.999, delta=100.0):
+        self.forgetting = forgetting
+        self.delta = delta
+
+    def get_params(self, deep=True):
+        return {'forgetting': self.forgetting, 'delta': self.delta}
+
+    def _design(self, X):
+        X = (np.asarray(X, dtype=float) - self.mean_) / self.scale_
+        return np.column_stack([X, np.ones(len(X))])
+
+    def fit(self, X, y):
+        """Batch solution identical to running partial_fit over the rows in order."""
+        X = np.asarray(X, dtype=float)
+        y = np.asarray(y, dtype=float)
+        self.mean_ = X.mean(axis=0)
+        self.scale_ = X.std(axis=0)
+        self.scale_[self.scale_ == 0] = 1.0
+        Z = self._design(X)
+        n, d = Z.shape
+        weights = self.forgetting ** np.arange(n - 1, -1, -1, dtype=float)
+        A = (Z * weights[:, None]).T @ Z + np.eye(d) * (self.forgetting ** n / self.delta)
+        self.P_ = np.linalg.inv(A)
+        self.coef_ = self.P_ @ ((Z * weights[:, None]).T @ y)
+        self.n_updates_ = n
+        return self
+
+    def partial_fit(self, X, y):
+        if not hasattr(self, 'coef_'):
+            return self.fit(X, y)
+        for z, target in zip(self._design(X), np.asarray(y, dtype=float)):
+            Pz = self.P_ @ z
+            gain = Pz / (self.forgetting + z @ Pz)
+            self.coef_ = self.coef_ + gain * (target - z @ self.coef_)
+            self.P_ = (self.P_ - np.outer(gain, Pz)) / self.forgetting
+        self.n_updates_ += len(X)
+        return self
+
+    def predict(self, X):
+        return self._design(X) @ self.coef_
+
+
+# --- Quote sources ---
+
+class QuoteSource:
+    """
+    Base class for live quote feeds. quotes(ticker) is a blocking iterator of bar
+    dicts ('Date' plus OHLCV) for the forming bar; it may yield None as a heartbeat.
+    """
+
+    def quotes(self, ticker):
+        raise NotImplementedError
+
+
+class PollingQuoteSource(QuoteSource):
+    """Polls the price store's data source for the latest bar every `interval` seconds."""
+
+    def __init__(self, interval=60.0):
+        self.interval = interval
+
+    def quotes(self, ticker):
+        from .data_store import price_store
+        last = None
+        while True:
+            bar = None
+            try:
+                today = date.today()
+                df = price_store.source.fetch(ticker, today - timedelta(days=7), today + timedelta(days=1))
+                if not df.empty:
+                    bar = df.iloc[-1].to_dict()
+            except Exception as e:
+                logger.warning("Error polling quotes for %s: %s", ticker, e)
+            if bar is not None and bar != last:
+                last = bar
+                yield bar
+            else:
+                yield None
+            time.sleep(self.interval)
+
+
+class ReplayQuoteSource(QuoteSource):
+    """
+    Replays '<directory>/<ticker>.csv' (Date,Open,High,Low,Close,Volume) one row per
+    `delay` seconds. Repeated dates are intraday updates of the same bar.
+    """
+
+    def __init__(self, directory, delay=1.0):
+        self.directory = directory
+        self.delay = delay
+
+    def quotes(self, ticker):
+        path = os.path.join(self.directory, f'{ticker}.csv')
+        if not os.path.exists(path):
+            return
+        for bar in pd.read_csv(path, parse_dates=['Date']).to_dict('records'):
+            yield bar
+            time.sleep(self.delay)
+
+
+# --- Tracking one stock ---
+
+class OnlineTracker:
+    """Keeps an online model for one stock current with incoming bars."""
+
+    def __init__(self, stock_name, model_name=ONLINE_MODEL):
+        from .ml_logic import fetch_historical_data, get_features, get_fitted_model, DIRECT_HORIZONS
+        from .features import WARMUP
+
+        df = fetch_historical_data(stock_name, years=2)
+        if df.empty:
+            raise ValueError(f"Could not fetch sufficient historical data for {stock_name}.")
+        features = get_features(stock_name, model_name, df)
+        # Private copy: the cached model must keep matching its data version
+        self.model = copy.deepcopy(get_fitted_model(stock_name, model_name, df, features))
+        self.stock_name = stock_name
+        self.horizons = DIRECT_HORIZONS
+
+        keep = WARMUP + max(DIRECT_HORIZONS) + 1
+        self.bars = df.tail(keep).reset_index(drop=True)
+        self.features = features.tail(keep).to_numpy(dtype=float)
+        self.learned_through = self.bars['Date'].iloc[-1] # the batch fit already used this bar
+        self.updates = 0
+
+    def apply(self, bar):
+        """Applies one quote; returns False if it is older than the current bar."""
+        from .features import compute_features, WARMUP
+
+        bar_date = pd.Timestamp(bar['Date']).tz_localize(None).normalize()
+        last_date = self.bars['Date'].iloc[-1]
+        if bar_date < last_date:
+            return False
+
+        row = {'Date': bar_date, **{column: float(bar[column]) for column in ('Open', 'High', 'Low', 'Close', 'Volume')}}
+        if bar_date > last_date:
+            self._learn_last_bar() # the previous bar is final now
+            self.bars = pd.concat([self.bars.iloc[1:], pd.DataFrame([row])], ignore_index=True)
+            self.features = np.vstack([self.features[1:], np.full((1, self.features.shape[1]), np.nan)])
+        else:
+            self.bars.iloc[-1] = pd.Series(row)[self.bars.columns]
+
+        # Only the forming bar's feature row changes
+        self.features[-1] = compute_features(self.bars.tail(WARMUP + 1)).iloc[-1].to_numpy(dtype=float)
+        self.model.last_features = self.features[-1]
+        self.model.last_close = row['Close']
+        self.model.last_date = bar_date.date()
+        return True
+
+    def _learn_last_bar(self):
+        last_date = self.bars['Date'].iloc[-1]
+        if last_date <= self.learned_through:
+            return
+        closes = self.bars['Close'].to_numpy(dtype=float)
+        days = self.bars['Date'].to_numpy().astype('datetime64[D]').astype(np.int64)
+        X, y = [], []
+        for h in self.horizons:
+            origin = len(closes) - 1 - h
+            if origin < 0 or np.isnan(self.features[origin]).any():
+                continue
+            X.append(np.append(self.features[origin], float(days[-1] - days[origin])))
+            y.append(np.log(closes[-1] / closes[origin]))
+        if X:
+            self.model.estimator.partial_fit(np.array(X), np.array(y))
+            self.updates += 1
+        self.learned_through = last_date
+
+    def snapshot(self, trend_days=15, target_dates=()):
+        """Current forecast for the next trading days (plus any requested dates) in one predict."""
+        from .trading_calendar import trading_calendar
+
+        trend = trading_calendar.next(self.model.last_date, trend_days + 1).tolist()
+        targets = sorted(set(target_dates) - set(trend))
+        prices = self.model.predict_dates(trend + targets)
+        predicted = dict(zip(trend + targets, (round(float(p), 2) for p in prices)))
+        return {
+            'stock_name': self.stock_name,
+            'prediction_model': self.model.model_name,
+            'last_date': self.model.last_date.strftime('%Y-%m-%d'),
+            'last_close': round(float(self.model.last_close), 2),
+            'updates': self.updates,
+            'predicted_trend_data': {
+                'x': [d.strftime('%Y-%m-%d') for d in trend],
+                'y': [predicted[d] for d in trend],
+            },
+            'predictions': {d.strftime('%Y-%m-%d'): predicted[d] for d in target_dates},
+        }
+
+
+# --- Fan-out to SSE subscribers ---
+
+class OnlineHub:
+    """Runs one quote consumer per subscribed stock and pushes forecast updates to subscriber queues."""
+
+    def __init__(self):
+        self.source = None
+        self.trend_days = 15
+        self._subscribers = {}  # stock -> {queue: target date or None}
+        self._threads = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.configure(app.config)
+
+    def configure(self, config):
+        if config.get('QUOTE_SOURCE', 'poll') == 'replay':
+            self.source = ReplayQuoteSource(config.get('QUOTE_REPLAY_DIR'), config.get('QUOTE_REPLAY_DELAY', 1.0))
+        else:
+            self.source = PollingQuoteSource(config.get('QUOTE_POLL_INTERVAL', 60.0))
+
+    def set_source(self, source):
+        self.source = source
+
+    def subscribe(self, stock_name, target_date=None):
+        """Returns a queue of (event, payload) tuples for stock_name."""
+        updates = queue.Queue(maxsize=100)
+        with self._lock:
+            self._subscribers.setdefault(stock_name, {})[updates] = target_date
+            if stock_name not in self._threads:
+                self._start(stock_name)
+        return updates
+
+    def unsubscribe(self, stock_name, updates):
+        with self._lock:
+            self._subscribers.get(stock_name, {}).pop(updates, None)
+
+    def _start(self, stock_name):
+        """Starts the quote consumer for a stock (lock held)."""
+        thread = threading.Thread(target=self._run, args=(stock_name,), daemon=True, name=f'online-{stock_name}')
+        self._threads[stock_name] = thread
+        thread.start()
+
+    def _publish(self, stock_name, event, tracker=None, payload=None, update_seconds=None, final=False):
+        with self._lock:
+            subscribers = dict(self._subscribers.get(stock_name, {}))
+            if final:
+                # These subscribers are told the stream ended; anyone subscribing later needs a new consumer
+                self._subscribers.pop(stock_name, None)
+        if tracker is not None:
+            targets = sorted({d for d in subscribers.values() if d is not None})
+            payload = tracker.snapshot(self.trend_days, targets)
+            payload['update_seconds'] = update_seconds
+        for updates, target in subscribers.items():
+            message = payload
+            if target is not None and tracker is not None:
+                key = target.strftime('%Y-%m-%d')
+                message = dict(payload, predicted_date=key, predicted_price=payload['predictions'].get(key))
+            try:
+                updates.put_nowait((event, message))
+            except queue.Full:
+                try:
+                    updates.get_nowait() # slow client: drop its oldest update
+                except queue.Empty:
+                    pass
+                updates.put_nowait((event, message))
+
+    def _run(self, stock_name):
+        from .ml_logic import STOCK_TICKERS
+        try:
+            tracker = OnlineTracker(stock_name)
+            self._publish(stock_name, 'forecast', tracker)
+            for bar in self.source.quotes(STOCK_TICKERS[stock_name]):
+                with self._lock:
+                    # Decided under the same lock subscribe() checks, so no subscriber is left without a consumer
+                    if not self._subscribers.get(stock_name):
+                        self._threads.pop(stock_name, None)
+                        self._subscribers.pop(stock_name, None)
+                        return
+                if bar is None:
+                    continue
+                start = time.perf_counter()
+                if tracker.apply(bar):
+                    self._publish(stock_name, 'forecast', tracker, update_seconds=time.perf_counter() - start)
+            self._publish(stock_name, 'end', payload={'stock_name': stock_name}, final=True)
+        except Exception as e:
+            logger.exception("Online tracking for %s failed", stock_name)
+            self._publish(stock_name, 'error', payload={'error': str(e)}, final=True)
+        finally:
+            with self._lock:
+                if self._threads.get(stock_name) is threading.current_thread():
+                    del self._threads[stock_name]
+                    if self._subscribers.get(stock_name):
+                        self._start(stock_name) # subscribed after the end was published
+
+
+online_hub = OnlineHub()
@@ -0,0 +1,165 @@
+"""
+Prediction log writes and the rollup tables kept next to them.
+
+Every PredictionLog insert also bumps PredictionDailyStats (per stock, model
+and day) and UserPredictionStats (per user) in the same transaction, using
+INSERT ... ON CONFLICT DO UPDATE where the database supports it. The admin
+dashboard reads its summary numbers from these small tables instead of
+counting the log.
+"""
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, tuple_
+
+from .extensions import db
+from .models import User, PredictionLog, PredictionDailyStats, UserPredictionStats
+
+
+def record_predictions(rows):
+    """
+    Bulk-inserts PredictionLog rows (dicts of column values) and updates the rollups.
+    The caller commits (or rolls back) the session.
+    """
+    if not rows:
+        return
+    now = datetime.utcnow()
+    for row in rows:
+        row.setdefault('timestamp', now)
+    db.session.execute(db.insert(PredictionLog), rows)
+
+    per_day = Counter((row['timestamp'].date(), row['stock_ticker'], row['model_used']) for row in rows)
+    per_user = {}
+    for row in rows:
+        count, last = per_user.get(row['user_id'], (0, row['timestamp']))
+        per_user[row['user_id']] = (count + 1, max(last, row['timestamp']))
+
+    _upsert_counts(
+        PredictionDailyStats,
+        [{'day': day, 'stock_ticker': stock, 'model_used': model, 'count': count}
+         for (day, stock, model), count in per_day.items()],
+        keys=('day', 'stock_ticker', 'model_used'),
+    )
+    _upsert_counts(
+        UserPredictionStats,
+        [{'user_id': user_id, 'count': count, 'last_prediction_at': last}
+         for user_id, (count, last) in per_user.items()],
+        keys=('user_id',),
+        latest='last_prediction_at',
+    )
+
+
+def _upsert_counts(model, values, keys, latest=None):
+    """Adds values[i]['count'] to existing rows (inserting new ones); 'latest' keeps the max."""
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        stmt = insert(model).values(values)
+        table = model.__table__
+        updates = {'count': table.c.count + stmt.excluded.count}
+        if latest:
+            pick_max = func.greatest if dialect == 'postgresql' else func.max # SQLite's two-argument max() is scalar
+            updates[latest] = pick_max(func.coalesce(table.c[latest], stmt.excluded[latest]), stmt.excluded[latest])
+        db.session.execute(stmt.on_conflict_do_update(index_elements=list(keys), set_=updates))
+        return
+
+    # Portable fallback: read-modify-write inside the caller's transaction
+    for value in values:
+        row = db.session.get(model, tuple(value[k] for k in keys) if len(keys) > 1 else value[keys[0]])
+        if row is None:
+            db.session.add(model(**value))
+            continue
+        row.count += value['count']
+        if latest and (getattr(row, latest) is None or value[latest] > getattr(row, latest)):
+            setattr(row, latest, value[latest])
+    db.session.flush()
+
+
+def rebuild_rollups():
+    """Recomputes both rollup tables from the full log (for backfills); the caller commits."""
+    day = func.date(PredictionLog.timestamp)
+    daily = (db.session.query(day, PredictionLog.stock_ticker, PredictionLog.model_used, func.count())
+             .group_by(day, PredictionLog.stock_ticker, PredictionLog.model_used).all())
+    users = (db.session.query(PredictionLog.user_id, func.count(), func.max(PredictionLog.timestamp))
+             .group_by(PredictionLog.user_id).all())
+
+    db.session.query(PredictionDailyStats).delete()
+    db.session.query(UserPredictionStats).delete()
+    if daily:
+        db.session.execute(db.insert(PredictionDailyStats), [
+            {'day': d if not isinstance(d, str) else datetime.strptime(d, '%Y-%m-%d').date(),
+             'stock_ticker': stock, 'model_used': model, 'count': count}
+            for d, stock, model, count in daily
+        ])
+    if users:
+        db.session.execute(db.insert(UserPredictionStats), [
+            {'user_id': user_id, 'count': count, 'last_prediction_at': last}
+            for user_id, count, last in users
+        ])
+    return len(daily), len(users)
+
+
+# --- Keyset pagination ---
+
+def encode_cursor(log):
+    return f"{log.timestamp.isoformat()}_{log.id}"
+
+
+def decode_cursor(cursor):
+    """Parses a '<timestamp>_<id>' cursor, or returns None if it is missing/invalid."""
+    try:
+        timestamp, log_id = cursor.rsplit('_', 1)
+        return datetime.fromisoformat(timestamp), int(log_id)
+    except (AttributeError, ValueError):
+        return None
+
+
+def logs_page(cursor=None, per_page=10):
+    """Newest-first page of logs older than cursor; returns (logs, next_cursor or None)."""
+    query = PredictionLog.query.options(db.joinedload(PredictionLog.user))
+    position = decode_cursor(cursor)
+    if position is not None:
+        query = query.filter(tuple_(PredictionLog.timestamp, PredictionLog.id) < position)
+    logs = (query.order_by(PredictionLog.timestamp.desc(), PredictionLog.id.desc())
+            .limit(per_page + 1).all())
+    next_cursor = encode_cursor(logs[per_page - 1]) if len(logs) > per_page else None
+    return logs[:per_page], next_cursor
+
+
+def users_page(cursor=None, per_page=10):
+    """Newest-first page of users with an id below cursor; returns (users, next_cursor or None)."""
+    query = User.query
+    try:
+        if cursor:
+            query = query.filter(User.id < int(cursor))
+    except ValueError:
+        pass
+    users = query.order_by(User.id.desc()).limit(per_page + 1).all()
+    next_cursor = str(users[per_page - 1].id) if len(users) > per_page else None
+    return users[:per_page], next_cursor
+
+
+# --- Admin summary (reads the rollups only) ---
+
+def admin_summary(days=7, top=5):
+    since = datetime.utcnow().date() - timedelta(days=days - 1)
+    total = db.session.query(func.coalesce(func.sum(UserPredictionStats.count), 0)).scalar()
+    recent = db.session.query(func.coalesce(func.sum(PredictionDailyStats.count), 0)) \
+        .filter(PredictionDailyStats.day >= since).scalar()
+    by_stock_model = (db.session.query(PredictionDailyStats.stock_ticker, PredictionDailyStats.model_used,
+                                       func.sum(PredictionDailyStats.count).label('count'))
+                      .filter(PredictionDailyStats.day >= since)
+                      .group_by(PredictionDailyStats.stock_ticker, PredictionDailyStats.model_used)
+                      .order_by(func.sum(PredictionDailyStats.count).desc())
+                      .all())
+    top_users = UserPredictionStats.query.order_by(UserPredictionStats.count.desc()).limit(top).all()
+    return {
+        'days': days,
+        'total': int(total),
+        'recent': int(recent),
+        'by_stock_model': by_stock_model,
+        'top_users': top_users,
+    }
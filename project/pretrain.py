@@ -0,0 +1,282 @@
+"""
+Nightly pre-training.
+
+After the NSE close every (stock, model) pair in the universe (or in one shard
+of it) is refreshed, trained (which publishes the model to the shared
+registry), backtested and used to forecast a standard horizon grid. Forecasts go into the Forecast table, which /predict
+serves from when the requested date falls inside the grid. Work units are
+tracked in PretrainJob rows, so a crashed run resumes where it stopped.
+"""
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import as_completed
+from datetime import datetime, timedelta, time as dtime
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+from config import Config
+from .extensions import db
+from .jobs import create_worker_pool
+from .metrics import Timer
+from .models import Forecast, PretrainJob
+from .trading_calendar import trading_calendar
+from .universe import universe, parse_shard
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-worker scheduler lock
+    fcntl = None
+
+TREND_DAYS = 15
+
+
+def market_now(config=None):
+    """Current time on the exchange clock."""
+    timezone = config['MARKET_TIMEZONE'] if config is not None else Config.MARKET_TIMEZONE
+    return datetime.now(ZoneInfo(timezone))
+
+
+def last_completed_session(df, config):
+    """Date of the last bar in df that is final (today's bar only counts after the close)."""
+    now = market_now(config)
+    close_at = dtime.fromisoformat(config['MARKET_CLOSE'])
+    last = df['Date'].iloc[-1].date()
+    if last >= now.date() and now.time() < close_at and len(df) > 1:
+        return df['Date'].iloc[-2].date()
+    return last
+
+
+# --- Work done in the pool workers ---
+
+def pretrain_pair(stock_name, model_name, horizon_days):
+    """Trains one (stock, model) pair and forecasts every trading day in the horizon grid."""
+    from .ml_logic import (fetch_historical_data, get_features, get_fitted_model,
+                           get_backtest, estimate_confidence, backtest_intervals, data_version)
+
+    start = time.perf_counter()
+    df = fetch_historical_data(stock_name, years=2)
+    features = get_features(stock_name, model_name, df)
+    model = get_fitted_model(stock_name, model_name, df, features)
+    backtest = get_backtest(stock_name, model_name, df, features)
+
+    # Trading days in the horizon, plus enough beyond it for the last date's trend window
+    horizon_end = model.last_date + timedelta(days=horizon_days)
+    dates = (trading_calendar.between(model.last_date + timedelta(days=1), horizon_end).tolist()
+             + trading_calendar.next(horizon_end, TREND_DAYS).tolist())
+    prices, intervals = model.predict_dates(dates, intervals=True)
+    confidences, bands = estimate_confidence(backtest, model.last_date, dates, prices)
+    if intervals is None:
+        intervals = backtest_intervals(backtest, model.last_date, dates, prices)
+    intervals = [(None,) * 3] * len(dates) if intervals is None else np.round(intervals, 2).T.tolist()
+
+    # The grid is contiguous, so the i-th date is i + 1 trading days ahead
+    return {
+        'data_version': data_version(df),
+        'last_date': model.last_date,
+        'last_close': float(df['Close'].iloc[-1]),
+        'forecasts': [(d, i + 1, round(float(p), 2), c, b, q)
+                      for i, (d, p, c, b, q) in enumerate(zip(dates, prices, confidences, bands, intervals))],
+        'duration': time.perf_counter() - start,
+    }
+
+
+# --- Orchestration (web/CLI process) ---
+
+def run_pretrain(app, run_date=None, workers=None, log=print, shard=None):
+    """
+    Runs (or resumes) the pre-training run for run_date across a process pool.
+    shard ((index, count), default PRETRAIN_SHARD) limits the run to one shard of
+    the universe. Must be called inside an app context. Returns the PretrainJob rows.
+    """
+    from .ml_logic import MODELS, fetch_many_historical_data
+
+    config = app.config
+    run_date = run_date or market_now(config).date()
+    horizon_days = config['PRETRAIN_HORIZON_DAYS']
+    workers = workers or config['PRETRAIN_WORKERS']
+    shard = shard or parse_shard(config.get('PRETRAIN_SHARD'))
+    stock_names = universe.names(shard)
+    model_names = config.get('PRETRAIN_MODELS') or list(MODELS)
+    run_start = time.perf_counter()
+
+    # 1. Refresh the shard's tickers with batched downloads
+    fetch_many_historical_data(stock_names)
+
+    # 2. Create the work units that do not exist yet; finished ones are skipped on resume
+    existing = (PretrainJob.query
+                .filter(PretrainJob.run_date == run_date, PretrainJob.stock_ticker.in_(stock_names))
+                .all())
+    jobs = {(job.stock_ticker, job.model_used): job for job in existing}
+    for stock_name in stock_names:
+        for model_name in model_names:
+            if (stock_name, model_name) not in jobs:
+                jobs[(stock_name, model_name)] = PretrainJob(run_date=run_date, stock_ticker=stock_name,
+                                                             model_used=model_name, status='pending')
+                db.session.add(jobs[(stock_name, model_name)])
+    todo = [pair for pair, job in jobs.items() if job.status != 'done']
+    for pair in todo:
+        jobs[pair].status = 'running'
+        jobs[pair].started_at = datetime.utcnow()
+    db.session.commit()
+    log(f"Pre-training {len(todo)} of {len(jobs)} jobs for {run_date} on {workers} workers"
+        + (f" (shard {shard[0]}/{shard[1]})" if shard else ""))
+
+    # 3. Train in parallel and store each pair's forecasts as soon as it finishes
+    pool = create_worker_pool(config, workers)
+    try:
+        futures = {pool.submit(pretrain_pair, stock_name, model_name, horizon_days): (stock_name, model_name)
+                   for stock_name, model_name in todo}
+        for future in as_completed(futures):
+            stock_name, model_name = futures[future]
+            job = jobs[(stock_name, model_name)]
+            try:
+                result = future.result()
+                _store_forecasts(stock_name, model_name, result)
+                job.status, job.duration, job.error = 'done', result['duration'], None
+            except Exception as e:
+                db.session.rollback()
+                job.status, job.error = 'failed', f"{e}\n{traceback.format_exc()}"
+            job.finished_at = datetime.utcnow()
+            db.session.commit()
+            log(f"  {stock_name:<12} {model_name:<18} {job.status:<7} "
+                f"{job.duration if job.duration is not None else float('nan'):7.2f}s")
+    finally:
+        pool.shutdown()
+
+    log(f"Pre-training finished in {time.perf_counter() - run_start:.1f}s")
+    return list(jobs.values())
+
+
+def _store_forecasts(stock_name, model_name, result):
+    Forecast.query.filter_by(stock_ticker=stock_name, model_used=model_name).delete()
+    now = datetime.utcnow()
+    db.session.execute(db.insert(Forecast), [
+        {
+            'stock_ticker': stock_name,
+            'model_used': model_name,
+            'target_date': target_date,
+            'predicted_price': price,
+            'confidence': confidence,
+            'error_band': band,
+            'interval_low': low,
+            'interval_mid': mid,
+            'interval_high': high,
+            'last_date': result['last_date'],
+            'last_close': result['last_close'],
+            'trading_days_ahead': days_ahead,
+            'predicted_return': price / result['last_close'] - 1.0,
+            'data_version': result['data_version'],
+            'created_at': now,
+        }
+        for target_date, days_ahead, price, confidence, band, (low, mid, high) in result['forecasts']
+    ])
+
+
+# --- Serving ---
+
+def lookup_forecast(stock_name, model_name, prediction_date_str, config):
+    """
+    Builds a /predict result from the Forecast table, or returns None when the
+    date (plus its trend window) is not in the grid or the forecasts are stale.
+    """
+    from .ml_logic import fetch_historical_data, INTERVAL_QUANTILES
+
+    timer = Timer()
+    try:
+        prediction_date_dt = datetime.strptime(prediction_date_str, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        return None
+    if prediction_date_dt <= datetime.now().date():
+        return None
+
+    with timer.span('lookup'):
+        trend_dates = trading_calendar.starting_at(prediction_date_dt, TREND_DAYS + 1).tolist()
+        if trend_dates[0] != prediction_date_dt:
+            return None # Only trading days are in the grid
+        rows = (Forecast.query
+                .filter(Forecast.stock_ticker == stock_name,
+                        Forecast.model_used == model_name,
+                        Forecast.target_date.between(trend_dates[0], trend_dates[-1]))
+                .order_by(Forecast.target_date)
+                .all())
+    if [row.target_date for row in rows] != trend_dates:
+        return None
+
+    with timer.span('fetch'):
+        df = fetch_historical_data(stock_name, years=2)
+    if rows[0].last_date < last_completed_session(df, config):
+        return None # A newer completed bar exists, the precomputed forecast is stale
+
+    with timer.span('chart'):
+        historical_30_days = df.tail(30)
+        result = {
+            'predicted_date': prediction_date_str,
+            'prediction_model': model_name,
+            'stock_name': stock_name,
+            'predicted_price': rows[0].predicted_price,
+            'confidence': rows[0].confidence,
+            'error_band': rows[0].error_band,
+            'historical_30_data': {
+                'x': historical_30_days['Date'].dt.strftime('%Y-%m-%d').tolist(),
+                'y': [float(p) for p in historical_30_days['Close'].tolist()],
+            },
+            'predicted_trend_data': {
+                'x': [row.target_date.strftime('%Y-%m-%d') for row in rows],
+                'y': [row.predicted_price for row in rows],
+            },
+            'source': 'precomputed',
+        }
+        if rows[0].interval_low is not None:
+            labels = [f'p{round(q * 100)}' for q in INTERVAL_QUANTILES]
+            columns = ('interval_low', 'interval_mid', 'interval_high')
+            result['prediction_interval'] = {label: getattr(rows[0], column) for label, column in zip(labels, columns)}
+            result['predicted_trend_data']['interval'] = {
+                label: [getattr(row, column) for row in rows] for label, column in zip(labels, columns)}
+    result['timings'] = timer.as_dict()
+    return result
+
+
+# --- In-process scheduler ---
+
+def _next_run(config):
+    """Next weekday at PRETRAIN_RUN_AT on the exchange clock."""
+    now = market_now(config)
+    run_at = dtime.fromisoformat(config['PRETRAIN_RUN_AT'])
+    candidate = now.replace(hour=run_at.hour, minute=run_at.minute, second=0, microsecond=0)
+    if candidate <= now:
+        candidate += timedelta(days=1)
+    while candidate.weekday() >= 5:
+        candidate += timedelta(days=1)
+    return candidate
+
+
+def _scheduler_loop(app):
+    lock_dir = app.config.get('SINGLE_FLIGHT_LOCK_DIR') or app.instance_path
+    while True:
+        next_run = _next_run(app.config)
+        time.sleep(max(0.0, (next_run - market_now(app.config)).total_seconds()))
+
+        os.makedirs(lock_dir, exist_ok=True)
+        with open(os.path.join(lock_dir, 'pretrain.lock'), 'w') as lock_file:
+            if fcntl is not None:
+                try:
+                    # Only one gunicorn worker runs the job; the others skip this round
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue
+            try:
+                with app.app_context():
+                    run_pretrain(app, run_date=next_run.date(), log=app.logger.info)
+            except Exception:
+                app.logger.exception("Scheduled pre-training failed")
+        time.sleep(60) # never fire twice for the same slot
+
+
+def start_scheduler(app):
+    """Starts the background pre-training thread for this process."""
+    thread = threading.Thread(target=_scheduler_loop, args=(app,), daemon=True, name='pretrain-scheduler')
+    thread.start()
+    return thread
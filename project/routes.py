@@ -1,16 +1,30 @@
 from flask import (
     render_template, redirect, url_for,
-    flash, request, jsonify, Blueprint, current_app
+    flash, request, jsonify, Blueprint, current_app, Response, abort
 )
 from flask_login import login_user, current_user, logout_user, login_required
 from .forms import LoginForm, RegistrationForm, ForgotPasswordForm, ResetPasswordForm # Ensure these are correct
-from .models import User, PredictionLog
+from .models import User
 from .extensions import db, bcrypt, mail # Ensure mail is imported if used
-from .ml_logic import train_and_predict, STOCK_TICKERS
+from .ml_logic import (train_and_predict, batch_train_and_predict, forecast_range, get_series,
+                       schedule_pending_backtest, STOCK_TICKERS)
+from .model_backends import MODELS
+from .model_selection import AUTO_MODEL
+from .online import online_hub
+from .screener import screen
+from .universe import universe
+from .jobs import job_queue, DONE, FAILED
+from .admission import admission, AdmissionError
+from .metrics import registry, observe_timings, request_latency
+from .pretrain import lookup_forecast
+from .prediction_log import logs_page, users_page, admin_summary
+from .log_writer import log_writer
 from flask_mail import Message # Ensure this is imported if mail is used
 import json
-from functools import wraps
+import time
+from functools import partial, wraps
 from datetime import datetime
+import queue
 
 main = Blueprint('main', __name__)
 
@@ -24,6 +38,11 @@ def admin_required(f):
          return f(*args, **kwargs)
      return decorated_function
 
+@main.app_errorhandler(AdmissionError)
+def admission_error(e):
+    """Rate limited (429) or no training capacity in time (503), with a Retry-After hint."""
+    return jsonify({"error": str(e)}), e.status, {'Retry-After': str(e.retry_after)}
+
 # --- (Email sending function send_reset_email if used) ---
 # Define send_reset_email function here if you are using password reset
 
@@ -35,15 +54,14 @@ def admin_required(f):
 def home():
     """Renders the main dashboard page."""
     stock_options = list(STOCK_TICKERS.keys())
-    # --- KNN removed from model_options ---
-    model_options = ['Linear Regression', 'Random Forest', 'XGBoost'] # <-- REMOVED 'KNN'
-    # --- End of change ---
+    model_options = list(MODELS) + [AUTO_MODEL]
 
     return render_template(
         'home.html',
         title='Prediction Dashboard',
         stocks=stock_options,
-        models=model_options
+        models=model_options,
+        sse_enabled=current_app.config['SSE_ENABLED']
     )
 
 @main.route("/register", methods=['GET', 'POST'])
@@ -91,10 +109,48 @@ def logout():
 @login_required
 @admin_required
 def admin():
-    page = request.args.get('page', 1, type=int)
-    users = User.query.order_by(User.id.desc()).paginate(page=page, per_page=10)
-    logs = PredictionLog.query.order_by(PredictionLog.timestamp.desc()).paginate(page=page, per_page=10)
-    return render_template('admin.html', title='Admin Dashboard', users=users, logs=logs)
+    """
+    Admin dashboard. Users and logs are keyset-paginated with independent cursors
+    (?users_before=<id>, ?logs_before=<timestamp>_<id>); summary numbers come from the rollup tables.
+    """
+    users_cursor = request.args.get('users_before')
+    logs_cursor = request.args.get('logs_before')
+    users, next_users = users_page(users_cursor, per_page=10)
+    logs, next_logs = logs_page(logs_cursor, per_page=10)
+    return render_template('admin.html', title='Admin Dashboard',
+                           users=users, logs=logs, summary=admin_summary(),
+                           users_cursor=users_cursor, logs_cursor=logs_cursor,
+                           next_users=next_users, next_logs=next_logs)
+
+# --- Prediction logging helper ---
+def log_prediction(user_id, stock_name, model_name, result):
+    """
+    Queues one PredictionLog row for a successful prediction result on the buffered
+    writer, records the stage timings in the latency histograms, queues the backtest
+    if the confidence is still pending and returns the time spent handing the row
+    over, in seconds.
+    """
+    timings = result.get('timings') or {}
+    start = time.perf_counter()
+    try:
+        predicted_date_obj = datetime.strptime(result['predicted_date'], '%Y-%m-%d').date()
+
+        log_writer.write([{
+            'user_id': user_id,
+            'stock_ticker': stock_name,
+            'model_used': model_name,
+            'predicted_date': predicted_date_obj,
+            'predicted_price': result['predicted_price'],
+            'confidence': result['confidence'],
+            'timings': json.dumps(timings) if timings else None,
+        }])
+    except Exception:
+        current_app.logger.exception("Error logging prediction for %s / %s", stock_name, model_name)
+    write_seconds = time.perf_counter() - start
+
+    observe_timings(stock_name, model_name, dict(timings, log_write=write_seconds))
+    schedule_pending_backtest(result)
+    return write_seconds
 
 # --- API Route (for ML) - UPDATED ---
 @main.route("/predict", methods=['POST'])
@@ -102,7 +158,10 @@ def admin():
 def predict():
     """
     Handles AJAX request for single date prediction.
+    With ?async=1 the work is queued and a job id is returned immediately.
+    With ?timings=1 (or "timings": true in the body) the stage timing breakdown is included.
     """
+    request_start = time.perf_counter()
     if not request.is_json:
         return jsonify({"error": "Invalid request: Must be JSON"}), 400
 
@@ -111,40 +170,342 @@ def predict():
     stock_name = data.get('stock')
     model_name = data.get('model')
     prediction_date = data.get('prediction_date')
+    include_timings = request.args.get('timings', '0').lower() in ('1', 'true', 'yes') or data.get('timings') is True
 
     if not all([stock_name, model_name, prediction_date]):
         return jsonify({"error": "Missing required fields (stock, model, prediction_date)"}), 400
 
     try:
-        result = train_and_predict(
-            stock_name,
-            model_name,
-            prediction_date
+        # Served straight from the nightly pre-training when the date is in its grid
+        result = lookup_forecast(stock_name, model_name, prediction_date, current_app.config)
+    except Exception as e:
+        current_app.logger.warning(f"Forecast lookup failed, falling back to training: {e}")
+        result = None
+
+    if result is None:
+        admission.check_rate(current_user.id)
+
+    if result is None and request.args.get('async', '0').lower() in ('1', 'true', 'yes'):
+        job_id = job_queue.submit(
+            train_and_predict,
+            (stock_name, model_name, prediction_date),
+            user_id=current_user.id,
+            on_success=partial(log_prediction, current_user.id, stock_name, model_name),
+            executor=admission.executor(current_user.id)
         )
+        job = {
+            'job_id': job_id,
+            'status': 'queued',
+            'status_url': url_for('main.job_status', job_id=job_id),
+        }
+        if current_app.config['SSE_ENABLED']:
+            job['stream_url'] = url_for('main.job_stream', job_id=job_id)
+        return jsonify(job), 202
+
+    try:
+        if result is None:
+            result = admission.call(current_user.id, train_and_predict,
+                                    (stock_name, model_name, prediction_date))
 
         if 'error' in result:
             return jsonify(result), 400
 
-        try:
-            predicted_date_obj = datetime.strptime(result['predicted_date'], '%Y-%m-%d').date()
-
-            log_entry = PredictionLog(
-                user_id=current_user.id,
-                stock_ticker=stock_name,
-                model_used=model_name,
-                predicted_date=predicted_date_obj,
-                predicted_price=result['predicted_price'],
-                confidence=result['confidence']
-            )
-            db.session.add(log_entry)
-            db.session.commit()
-        except Exception as log_e:
-             db.session.rollback()
-             print(f"Error logging prediction: {log_e}")
-
-        return jsonify(result)
+        write_seconds = log_prediction(current_user.id, stock_name, model_name, result)
 
+        timings = result.pop('timings', {})
+        if include_timings:
+            result['timings'] = dict(timings, log_write=round(write_seconds, 6))
+
+        serialize_start = time.perf_counter()
+        response = jsonify(result)
+        observe_timings(stock_name, model_name, {'serialize': time.perf_counter() - serialize_start})
+        request_latency.observe(time.perf_counter() - request_start, stock=stock_name, model=model_name)
+        return response
+
+    except AdmissionError:
+        raise
     except Exception as e:
         db.session.rollback()
         current_app.logger.error(f"Prediction route failed: {e}", exc_info=True)
-        return jsonify({"error": f"An internal error occurred."}), 500
\ No newline at end of file
+        return jsonify({"error": f"An internal error occurred."}), 500
+
+@main.route("/predict/batch", methods=['POST'])
+@login_required
+def predict_batch():
+    """
+    Batch predictions: {"requests": [{"stock": ..., "model": ..., "dates": [...]}, ...]}.
+    Unique (stock, model) pairs are trained once and in parallel; all results are
+    logged with a single bulk insert.
+    """
+    return batch_predict_response(current_user.id)
+
+def batch_predict_response(user_id):
+    """Runs a /predict/batch request body for user_id (shared with /api/v1/predict/batch)."""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Invalid request: Must be a JSON object"}), 400
+
+    items = data.get('requests')
+    if not isinstance(items, list) or not items or not all(isinstance(item, dict) for item in items):
+        return jsonify({"error": "Missing required field 'requests' (list of stock/model/dates objects)"}), 400
+
+    max_items = current_app.config['BATCH_MAX_ITEMS']
+    if len(items) > max_items or sum(len(item['dates']) for item in items
+                                     if isinstance(item.get('dates'), list)) > max_items * 10:
+        return jsonify({"error": f"Batch too large (max {max_items} items)."}), 400
+
+    admission.check_rate(user_id)
+    executor = admission.executor(user_id)
+    try:
+        results = batch_train_and_predict(items, executor=executor)
+    except AdmissionError:
+        executor.cancel_pending()
+        raise
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        current_app.logger.error(f"Batch prediction failed: {e}", exc_info=True)
+        return jsonify({"error": "An internal error occurred."}), 500
+
+    rows = [
+        {
+            'user_id': user_id,
+            'stock_ticker': result['stock_name'],
+            'model_used': result['prediction_model'],
+            'predicted_date': datetime.strptime(p['predicted_date'], '%Y-%m-%d').date(),
+            'predicted_price': p['predicted_price'],
+            'confidence': p['confidence'],
+            'timestamp': datetime.utcnow(),
+        }
+        for result in results if 'error' not in result
+        for p in result['predictions']
+    ]
+    if rows:
+        try:
+            log_writer.write(rows)
+        except Exception:
+            current_app.logger.exception("Error logging %d batch predictions", len(rows))
+
+    return jsonify({'results': results})
+
+@main.route("/forecast/range", methods=['POST'])
+@login_required
+def forecast_range_route():
+    """
+    Forecasts over a horizon on NSE trading days only:
+    {"stock": ..., "model": ..., "end_date": "YYYY-MM-DD"} or {..., "horizon_days": N}.
+    Long ranges are downsampled to at most FORECAST_MAX_POINTS points ("max_points" can lower it).
+    """
+    request_start = time.perf_counter()
+    if not request.is_json:
+        return jsonify({"error": "Invalid request: Must be JSON"}), 400
+
+    data = request.get_json()
+    stock_name = data.get('stock')
+    model_name = data.get('model')
+    if not stock_name or not model_name:
+        return jsonify({"error": "Missing required fields (stock, model)"}), 400
+
+    max_points = current_app.config['FORECAST_MAX_POINTS']
+    try:
+        if data.get('max_points') is not None:
+            max_points = max(2, min(int(data['max_points']), max_points))
+    except (TypeError, ValueError):
+        return jsonify({"error": "max_points must be an integer."}), 400
+    horizon_days = data.get('horizon_days')
+    if horizon_days is not None and not data.get('end_date'):
+        try:
+            horizon_days = int(horizon_days)
+        except (TypeError, ValueError):
+            return jsonify({"error": "horizon_days must be an integer."}), 400
+        if horizon_days < 1:
+            return jsonify({"error": "horizon_days must be at least 1."}), 400
+
+    admission.check_rate(current_user.id)
+    result = admission.call(current_user.id, forecast_range, (
+        stock_name,
+        model_name,
+        data.get('end_date'),
+        horizon_days,
+        max_points,
+        current_app.config['FORECAST_MAX_HORIZON_DAYS']
+    ))
+    if 'error' in result:
+        return jsonify(result), 400
+    schedule_pending_backtest(result)
+
+    timings = result.pop('timings', {})
+    observe_timings(stock_name, model_name, timings)
+    if request.args.get('timings', '0').lower() in ('1', 'true', 'yes'):
+        result['timings'] = timings
+    request_latency.observe(time.perf_counter() - request_start, stock=stock_name, model=model_name)
+    return jsonify(result)
+
+@main.route("/screener")
+@login_required
+def screener():
+    """
+    Ranks the whole universe by its precomputed forecasts, e.g.
+    /screener?model=XGBoost&horizon=21&sort=return&limit=20&sector=IT&confidence=High,Medium-High
+    Other filters: min_return, max_return, max_error_band (fractions); order=asc|desc.
+    Only reads the Forecast table, so nothing is trained or downloaded here.
+    """
+    start = time.perf_counter()
+    args = request.args
+    model_name = args.get('model', next(iter(MODELS)))
+    if model_name not in MODELS:
+        return jsonify({"error": "Invalid model name provided."}), 400
+    sector = args.get('sector') or None
+    if sector is not None and sector not in set(universe.sectors.values()):
+        return jsonify({"error": "Unknown sector."}), 400
+    max_limit = current_app.config['SCREENER_MAX_LIMIT']
+    try:
+        horizon = int(args.get('horizon', 21))
+        limit = max(1, min(int(args.get('limit', current_app.config['SCREENER_DEFAULT_LIMIT'])), max_limit))
+        bounds = {key: float(args[key]) if args.get(key) else None
+                  for key in ('min_return', 'max_return', 'max_error_band')}
+    except ValueError:
+        return jsonify({"error": "horizon and limit must be integers; min_return, max_return and max_error_band numbers."}), 400
+    order = args.get('order')
+    confidence = [label.strip() for label in args.get('confidence', '').split(',') if label.strip()]
+
+    try:
+        results = screen(model_name, horizon, sort=args.get('sort', 'return'),
+                         descending=None if order is None else order == 'desc', limit=limit,
+                         sector=sector, confidence=confidence, **bounds)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    payload = {
+        'model': model_name,
+        'horizon': horizon,
+        'sort': args.get('sort', 'return'),
+        'count': len(results),
+        'results': results,
+    }
+    if args.get('timings', '0').lower() in ('1', 'true', 'yes'):
+        payload['timings'] = {'query': round(time.perf_counter() - start, 6)}
+    return jsonify(payload)
+
+@main.route("/series/<stock_name>")
+@login_required
+def series(stock_name):
+    """
+    Compact full price history for the charts. Uses a strong ETag tied to the
+    data version, so repeat requests for an unchanged series get a 304.
+    """
+    return series_response(stock_name)
+
+def series_response(stock_name):
+    """Builds the (possibly 304) series response (shared with /api/v1/series)."""
+    if stock_name not in STOCK_TICKERS:
+        return jsonify({"error": "Invalid stock name provided."}), 404
+
+    try:
+        etag, payload = get_series(stock_name)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = jsonify(payload)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = f"private, max-age={current_app.config['SERIES_MAX_AGE']}, must-revalidate"
+    return response
+
+# --- Metrics ---
+@main.route("/metrics")
+def metrics():
+    """Prometheus text exposition of this worker's pipeline metrics."""
+    token = current_app.config.get('METRICS_TOKEN')
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        abort(401)
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+# --- Background job routes ---
+def _get_own_job(job_id):
+    """Loads a job, 404ing if it does not exist or belongs to another user."""
+    job = job_queue.get(job_id)
+    if job is None or job.get('user_id') != current_user.id:
+        abort(404)
+    return job
+
+@main.route("/jobs/<job_id>")
+@login_required
+def job_status(job_id):
+    """Polling endpoint for a queued prediction."""
+    job = _get_own_job(job_id)
+    job.pop('user_id', None)
+    return jsonify(job)
+
+@main.route("/jobs/<job_id>/stream")
+@login_required
+def job_stream(job_id):
+    """Server-Sent Events stream that emits the job result once it is finished (needs SSE_ENABLED)."""
+    if not current_app.config['SSE_ENABLED']:
+        abort(404)
+    _get_own_job(job_id)
+    user_id = current_user.id
+    timeout = current_app.config['JOB_RESULT_TTL']
+
+    def generate():
+        deadline = time.time() + timeout
+        last_status = None
+        while time.time() < deadline:
+            job = job_queue.get(job_id)
+            if job is None or job.get('user_id') != user_id:
+                yield 'event: failed\ndata: {"error": "Job not found."}\n\n'
+                return
+            job.pop('user_id', None)
+            if job['status'] in (DONE, FAILED):
+                yield f"event: {job['status']}\ndata: {json.dumps(job)}\n\n"
+                return
+            if job['status'] != last_status:
+                last_status = job['status']
+                yield f"event: status\ndata: {json.dumps({'status': last_status})}\n\n"
+            else:
+                yield ': keep-alive\n\n'
+            time.sleep(0.5)
+
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+# --- Online model stream ---
+@main.route("/online/<stock_name>/stream")
+@login_required
+def online_stream(stock_name):
+    """
+    Server-Sent Events stream of 'Online RLS' forecasts for a stock, updated as
+    quotes arrive. ?date=YYYY-MM-DD also streams the predicted price for that date.
+    Only available with SSE_ENABLED, since the stream holds a web worker while it is open.
+    """
+    if not current_app.config['SSE_ENABLED']:
+        abort(404)
+    if stock_name not in STOCK_TICKERS:
+        return jsonify({"error": "Invalid stock name provided."}), 404
+    target_date = None
+    if request.args.get('date'):
+        try:
+            target_date = datetime.strptime(request.args['date'], '%Y-%m-%d').date()
+        except ValueError:
+            return jsonify({"error": "Invalid date format. Please use YYYY-MM-DD."}), 400
+
+    updates = online_hub.subscribe(stock_name, target_date)
+
+    def generate():
+        try:
+            while True:
+                try:
+                    event, payload = updates.get(timeout=15)
+                except queue.Empty:
+                    yield ': keep-alive\n\n'
+                    continue
+                yield f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+                if event in ('end', 'error'):
+                    return
+        finally:
+            online_hub.unsubscribe(stock_name, updates)
+
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
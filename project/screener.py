@@ -0,0 +1,80 @@
+"""
+Universe screener over the precomputed forecasts.
+
+Ranks every stock by its nightly Forecast row at a fixed number of trading days
+ahead. Filtering and ordering run in one indexed query on the Forecast table
+(model_used, trading_days_ahead, predicted_return), so a request never loads
+price data or trains a model.
+"""
+from sqlalchemy import case
+
+from .backtest import CONFIDENCE_LEVELS
+from .extensions import db
+from .models import Forecast
+from .universe import universe
+
+CONFIDENCE_LABELS = [label for _, label in CONFIDENCE_LEVELS] + ["Very Low"] # best first
+SORT_KEYS = ('return', 'confidence', 'error_band')
+
+
+def screen(model_name, horizon, sort='return', descending=None, limit=20, sector=None,
+           confidence=None, min_return=None, max_return=None, max_error_band=None):
+    """
+    Returns the top `limit` stocks for model_name, horizon trading days ahead.
+
+    sort: 'return' (predicted return, highest first), 'confidence' (best label
+    first, then return) or 'error_band' (error band relative to the price,
+    narrowest first); descending flips the default direction. Filters: sector,
+    confidence labels, predicted return bounds (fractions) and the largest
+    relative error band. Raises ValueError for invalid arguments.
+    """
+    if sort not in SORT_KEYS:
+        raise ValueError(f"sort must be one of {', '.join(SORT_KEYS)}.")
+    if horizon < 1:
+        raise ValueError("horizon must be at least 1 trading day.")
+    unknown = set(confidence or ()) - set(CONFIDENCE_LABELS)
+    if unknown:
+        raise ValueError(f"Unknown confidence label(s): {', '.join(sorted(unknown))}.")
+
+    relative_band = Forecast.error_band / Forecast.predicted_price
+    query = (db.select(Forecast.stock_ticker, Forecast.target_date, Forecast.last_date, Forecast.last_close,
+                       Forecast.predicted_price, Forecast.predicted_return, Forecast.confidence,
+                       Forecast.error_band)
+             .where(Forecast.model_used == model_name, Forecast.trading_days_ahead == horizon))
+    if sector is not None:
+        query = query.where(Forecast.stock_ticker.in_(universe.names(sector=sector)))
+    if confidence:
+        query = query.where(Forecast.confidence.in_(confidence))
+    if min_return is not None:
+        query = query.where(Forecast.predicted_return >= min_return)
+    if max_return is not None:
+        query = query.where(Forecast.predicted_return <= max_return)
+    if max_error_band is not None:
+        query = query.where(relative_band <= max_error_band)
+
+    if sort == 'return':
+        order = [Forecast.predicted_return.asc() if descending is False else Forecast.predicted_return.desc()]
+    elif sort == 'confidence':
+        rank = case({label: i for i, label in enumerate(CONFIDENCE_LABELS)},
+                    value=Forecast.confidence, else_=len(CONFIDENCE_LABELS))
+        order = [rank.desc() if descending else rank.asc(), Forecast.predicted_return.desc()]
+    else:
+        # Rows without a band (no backtest) go last either way
+        order = [relative_band.is_(None), relative_band.desc() if descending else relative_band.asc()]
+    rows = db.session.execute(query.order_by(*order, Forecast.stock_ticker).limit(limit)).all()
+
+    return [
+        {
+            'stock_name': row.stock_ticker,
+            'ticker': universe.tickers.get(row.stock_ticker),
+            'sector': universe.sectors.get(row.stock_ticker),
+            'target_date': row.target_date.strftime('%Y-%m-%d'),
+            'last_date': row.last_date.strftime('%Y-%m-%d'),
+            'last_close': round(row.last_close, 2),
+            'predicted_price': row.predicted_price,
+            'predicted_return': round(row.predicted_return, 6),
+            'confidence': row.confidence,
+            'error_band': row.error_band,
+        }
+        for row in rows
+    ]
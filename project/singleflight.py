@@ -0,0 +1,113 @@
+"""
+Single-flight request coalescing.
+
+Concurrent callers asking for the same key share one execution: the first
+caller (the leader) does the work and everyone else waiting on that key gets
+the same result. Across processes (gunicorn workers, pool workers) the leader
+also takes an exclusive file lock, and callers that had to wait for it re-check
+the shared cache before doing the work themselves.
+"""
+import hashlib
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: in-process coalescing only
+    fcntl = None
+
+LOCK_STRIPES = 256
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesces identical concurrent work within and (optionally) across processes."""
+
+    def __init__(self, lock_dir=None):
+        self.lock_dir = lock_dir
+        self._calls = {}
+        self._lock = threading.Lock()
+        # Metrics
+        self.executions = 0          # times the work actually ran
+        self.coalesced = 0           # callers that shared an in-process leader's result
+        self.cross_process_hits = 0  # leaders that found another process's result after waiting
+
+    def init_app(self, app):
+        self.configure(app.config)
+
+    def configure(self, config):
+        self.lock_dir = config.get('SINGLE_FLIGHT_LOCK_DIR', self.lock_dir)
+
+    def do(self, key, fn, recheck=None):
+        """
+        Returns fn() for key, running it at most once among concurrent callers.
+        recheck() is called after waiting for another process's lock; a non-None
+        return value is used instead of running fn.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._run(key, fn, recheck)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+        return call.result
+
+    def stats(self):
+        with self._lock:
+            return {
+                'executions': self.executions,
+                'coalesced': self.coalesced,
+                'cross_process_hits': self.cross_process_hits,
+                'in_flight': len(self._calls),
+            }
+
+    def _run(self, key, fn, recheck):
+        if not self.lock_dir or fcntl is None:
+            self.executions += 1
+            return fn()
+
+        os.makedirs(self.lock_dir, exist_ok=True)
+        # A fixed set of lock stripes keeps the number of lock files bounded
+        stripe = int(hashlib.sha1(repr(key).encode('utf-8')).hexdigest(), 16) % LOCK_STRIPES
+        with open(os.path.join(self.lock_dir, f'stripe-{stripe:03d}.lock'), 'w') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # Another process is doing the same work: wait for it, then reuse its result
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                if recheck is not None:
+                    result = recheck()
+                    if result is not None:
+                        self.cross_process_hits += 1
+                        return result
+            try:
+                self.executions += 1
+                return fn()
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+single_flight = SingleFlight()
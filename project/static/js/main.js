@@ -32,6 +32,8 @@ document.addEventListener("DOMContentLoaded", function() {
     const resultConfidence = document.getElementById("result-confidence");
     const resultPredictedPrice = document.getElementById("result-predicted-price");
 
+    // Live update stream for the online model (one at a time)
+    let onlineSource = null;
 
     // --- Form Submit Handler ---
     form.addEventListener("submit", function(event) {
@@ -50,6 +52,7 @@ document.addEventListener("DOMContentLoaded", function() {
         const predictionDate = formatDate(predictionDates[0]); // Format YYYY-MM-DD
 
         // 3. Prepare for Fetch
+        stopOnlineUpdates();
         showLoading(true);
         hideAlert();
         // Hide previous results immediately
@@ -62,8 +65,9 @@ document.addEventListener("DOMContentLoaded", function() {
             prediction_date: predictionDate
         };
 
-        // 4. Send Fetch Request to Flask Backend
-        fetch("/predict", {
+        // 4. Queue the prediction on the backend, then wait for the job result
+        //    (precomputed forecasts come back directly, without a job)
+        fetch("/predict?async=1", {
             method: "POST",
             headers: { "Content-Type": "application/json" },
             body: JSON.stringify(requestData)
@@ -74,7 +78,8 @@ document.addEventListener("DOMContentLoaded", function() {
             }
             return response.json();
         })
-        .then(data => {
+        .then(job => Promise.all([job.job_id ? waitForJob(job) : job, loadSeries(stock)]))
+        .then(([data, series]) => {
             // 5. Handle Success
             showLoading(false);
             if (data.error) {
@@ -82,12 +87,17 @@ document.addEventListener("DOMContentLoaded", function() {
             } else {
                 // Success! Update UI and plot data
                 updateResults(data);
-                plotFullHistoricalTrend(data.full_historical_data, data.stock_name);
-                plotLast30DaysTrend(data.historical_30_data, data.predicted_date, data.predicted_price, data.stock_name);
+                plotFullHistoricalTrend(series, data.stock_name);
+                plotLast30DaysTrend(data.historical_30_data, data.predicted_date, data.predicted_price, data.stock_name,
+                                    data.prediction_interval);
                 plotPredictedTrend(data.predicted_trend_data, data.stock_name);
 
                 resultsSection.classList.remove("d-none");
                 chartSection.classList.remove("d-none");
+
+                if (data.prediction_model === "Online RLS") {
+                    startOnlineUpdates(data);
+                }
             }
         })
         .catch(error => {
@@ -98,6 +108,128 @@ document.addEventListener("DOMContentLoaded", function() {
         });
     });
 
+    // --- Price Series Helpers ---
+
+    // Decoded series per stock, revalidated against the server with the ETag
+    const seriesCache = new Map();
+
+    function loadSeries(stock) {
+        const cached = seriesCache.get(stock);
+        const headers = cached ? { "If-None-Match": cached.etag } : {};
+        return fetch(`/series/${encodeURIComponent(stock)}`, { headers: headers })
+            .then(response => {
+                if (response.status === 304 && cached) {
+                    return cached.data;
+                }
+                if (!response.ok) {
+                    return response.json().then(err => { throw new Error(err.error || `Server error: ${response.status}`); });
+                }
+                return response.json().then(payload => {
+                    const data = decodeSeries(payload);
+                    seriesCache.set(stock, { etag: response.headers.get("ETag"), data: data });
+                    return data;
+                });
+            });
+    }
+
+    // Turns the base64 int32 epoch-day / float32 close arrays into Plotly x/y arrays
+    function decodeSeries(payload) {
+        const days = new Int32Array(base64ToBuffer(payload.days));
+        const closes = new Float32Array(base64ToBuffer(payload.close));
+        const x = new Array(days.length);
+        for (let i = 0; i < days.length; i++) {
+            x[i] = new Date(days[i] * 86400000).toISOString().slice(0, 10);
+        }
+        return { x: x, y: Array.from(closes) };
+    }
+
+    function base64ToBuffer(b64) {
+        const binary = atob(b64);
+        const bytes = new Uint8Array(binary.length);
+        for (let i = 0; i < binary.length; i++) {
+            bytes[i] = binary.charCodeAt(i);
+        }
+        return bytes.buffer;
+    }
+
+    // --- Background Job Helpers ---
+
+    // Resolves with the job result by polling, or over Server-Sent Events when the server offers a stream
+    function waitForJob(job) {
+        return new Promise((resolve, reject) => {
+            if (!job.stream_url || !window.EventSource) {
+                pollJob(job.status_url, resolve, reject);
+                return;
+            }
+            const source = new EventSource(job.stream_url);
+            source.addEventListener("done", event => {
+                source.close();
+                resolve(JSON.parse(event.data).result);
+            });
+            source.addEventListener("failed", event => {
+                source.close();
+                reject(new Error(JSON.parse(event.data).error || "Prediction failed."));
+            });
+            source.onerror = () => {
+                // Stream dropped (proxy timeout etc.) - continue by polling
+                source.close();
+                pollJob(job.status_url, resolve, reject);
+            };
+        });
+    }
+
+    function pollJob(statusUrl, resolve, reject) {
+        fetch(statusUrl)
+            .then(response => {
+                if (!response.ok) { throw new Error(`Server error: ${response.status}`); }
+                return response.json();
+            })
+            .then(job => {
+                if (job.status === "done") {
+                    resolve(job.result);
+                } else if (job.status === "failed") {
+                    reject(new Error(job.error || "Prediction failed."));
+                } else {
+                    setTimeout(() => pollJob(statusUrl, resolve, reject), 1000);
+                }
+            })
+            .catch(reject);
+    }
+
+    // --- Online Model Helpers ---
+
+    // Re-plots the trend and predicted price whenever the server learns from a new quote
+    // (only when the server allows Server-Sent Events streams)
+    function startOnlineUpdates(data) {
+        if (form.dataset.sseEnabled !== "1" || !window.EventSource) {
+            return;
+        }
+        const url = `/online/${encodeURIComponent(data.stock_name)}/stream?date=${encodeURIComponent(data.predicted_date)}`;
+        onlineSource = new EventSource(url);
+        onlineSource.addEventListener("forecast", event => {
+            const update = JSON.parse(event.data);
+            if (update.predicted_price != null) {
+                data.predicted_price = update.predicted_price;
+                updateResults(data);
+            }
+            plotPredictedTrend(update.predicted_trend_data, update.stock_name);
+        });
+        onlineSource.addEventListener("error", event => {
+            if (event.data) {
+                console.error("Online updates failed:", JSON.parse(event.data).error);
+            }
+            stopOnlineUpdates();
+        });
+        onlineSource.addEventListener("end", stopOnlineUpdates);
+    }
+
+    function stopOnlineUpdates() {
+        if (onlineSource) {
+            onlineSource.close();
+            onlineSource = null;
+        }
+    }
+
     // --- Plotly Layout (Adjusted for White/Blue Theme) ---
     const plotLayout = {
         plot_bgcolor: 'white', // White background for the plot area itself
@@ -160,7 +292,7 @@ document.addEventListener("DOMContentLoaded", function() {
         Plotly.newPlot(fullHistoricalChartDiv, [trace], layout, config);
     }
 
-    function plotLast30DaysTrend(data, predictedDate, predictedPrice, stockName) {
+    function plotLast30DaysTrend(data, predictedDate, predictedPrice, stockName, interval) {
         // Find the index where the predictedDate would fit in the x-axis
         const historicalX = data.x;
         const historicalY = data.y;
@@ -190,6 +322,16 @@ document.addEventListener("DOMContentLoaded", function() {
             name: 'Predicted Price',
             hoverinfo: 'x+y+name' // show date, price and name on hover
         };
+        // 10th-90th percentile prediction interval as an asymmetric error bar
+        if (interval) {
+            tracePredictionPoint.error_y = {
+                type: 'data',
+                symmetric: false,
+                array: [interval.p90 - predictedPrice],
+                arrayminus: [predictedPrice - interval.p10],
+                color: 'red'
+            };
+        }
 
         const layout = {
             ...plotLayout,
@@ -211,13 +353,38 @@ document.addEventListener("DOMContentLoaded", function() {
             marker: { size: 6 }
         };
 
+        // Shaded 10th-90th percentile band: the upper edge first, the lower one fills up to it
+        const traces = [];
+        if (data.interval) {
+            traces.push({
+                x: data.x,
+                y: data.interval.p90,
+                type: 'scatter',
+                mode: 'lines',
+                line: { width: 0 },
+                hoverinfo: 'skip',
+                showlegend: false
+            }, {
+                x: data.x,
+                y: data.interval.p10,
+                type: 'scatter',
+                mode: 'lines',
+                line: { width: 0 },
+                fill: 'tonexty',
+                fillcolor: 'rgba(220, 53, 69, 0.15)',
+                name: '80% Interval',
+                hoverinfo: 'skip'
+            });
+        }
+        traces.push(trace);
+
         const layout = {
             ...plotLayout,
             title: `Predicted Price Trend for ${stockName} (Next 15 Days)`
         };
 
         const config = { responsive: true };
-        Plotly.newPlot(predictedTrendChartDiv, [trace], layout, config);
+        Plotly.newPlot(predictedTrendChartDiv, traces, layout, config);
     }
 
 
@@ -226,8 +393,12 @@ document.addEventListener("DOMContentLoaded", function() {
     function updateResults(data) {
         resultStockName.textContent = data.stock_name;
         resultPredictedDate.textContent = data.predicted_date;
-        resultModel.textContent = data.prediction_model;
-        resultConfidence.textContent = data.confidence;
+        // 'Auto' shows which model the cross-validation picked
+        resultModel.textContent = data.selected_model
+            ? `${data.prediction_model} (${data.selected_model.model})`
+            : data.prediction_model;
+        // The backtest behind the confidence label may still be running for a new data version
+        resultConfidence.textContent = data.confidence || (data.confidence_pending ? "Pending" : "-");
         resultPredictedPrice.textContent = `₹ ${data.predicted_price.toLocaleString('en-IN', { minimumFractionDigits: 2, maximumFractionDigits: 2 })}`;
     }
 
@@ -0,0 +1,92 @@
+"""
+NSE trading calendar.
+
+Trading days are weekdays that are not exchange holidays. The holiday list is a
+small CSV (project/data/nse_holidays.csv by default) that has to be extended
+when NSE publishes the next year's circular; covered_until() tells callers how
+far ahead the list is known. Dates are generated with NumPy's business-day
+functions, so a year of trading days is one vectorized call.
+"""
+import csv
+import threading
+
+import numpy as np
+
+from config import Config
+
+WEEKMASK = '1111100' # Monday to Friday
+
+
+def load_holidays(path):
+    """Reads the 'date' column of a holiday CSV as datetime64[D]."""
+    with open(path, newline='') as fh:
+        return np.array(sorted(row['date'].strip() for row in csv.DictReader(fh) if row.get('date')),
+                        dtype='datetime64[D]')
+
+
+def downsample_indices(n, max_points):
+    """Evenly spaced indices into n points (first and last always kept), at most max_points of them."""
+    if max_points is None or n <= max_points:
+        return np.arange(n)
+    return np.unique(np.linspace(0, n - 1, max(int(max_points), 2)).round().astype(np.int64))
+
+
+class TradingCalendar:
+    """Vectorized trading-day arithmetic over a weekday mask plus a holiday list."""
+
+    def __init__(self, holidays_file=None):
+        self.holidays_file = holidays_file
+        self._calendar = None
+        self._covered_until = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.configure(app.config)
+
+    def configure(self, config):
+        holidays_file = config.get('TRADING_HOLIDAYS_FILE') or self.holidays_file
+        if holidays_file != self.holidays_file:
+            self.holidays_file = holidays_file
+            self._calendar = self._covered_until = None
+
+    @property
+    def calendar(self):
+        if self._calendar is None:
+            with self._lock:
+                if self._calendar is None:
+                    holidays = load_holidays(self.holidays_file or Config.TRADING_HOLIDAYS_FILE)
+                    if len(holidays):
+                        # Published a year at a time, so the list covers through the end of its last year
+                        self._covered_until = (holidays[-1].astype('datetime64[Y]') + 1).astype('datetime64[D]') - 1
+                    self._calendar = np.busdaycalendar(weekmask=WEEKMASK, holidays=holidays)
+        return self._calendar
+
+    def covered_until(self):
+        """The last date (datetime.date) the holiday list is known for, or None for an empty list."""
+        self.calendar  # loads the holiday list
+        return None if self._covered_until is None else self._covered_until.item()
+
+    def is_trading_day(self, dates):
+        return np.is_busday(np.asarray(dates, dtype='datetime64[D]'), busdaycal=self.calendar)
+
+    def between(self, start, end):
+        """All trading days in [start, end] as datetime64[D]."""
+        start, end = np.datetime64(start, 'D'), np.datetime64(end, 'D')
+        if end < start:
+            return np.array([], dtype='datetime64[D]')
+        days = np.arange(start, end + 1, dtype='datetime64[D]')
+        return days[np.is_busday(days, busdaycal=self.calendar)]
+
+    def next(self, after, count):
+        """The first count trading days strictly after the given date."""
+        # Rolling backward first makes offset 1 land on the next trading day even from a holiday
+        return np.busday_offset(np.datetime64(after, 'D'), np.arange(1, count + 1),
+                                roll='backward', busdaycal=self.calendar)
+
+    def starting_at(self, start, count):
+        """count trading days beginning with start (or the next trading day if start is not one)."""
+        first = np.busday_offset(np.datetime64(start, 'D'), 0, roll='forward', busdaycal=self.calendar)
+        return np.busday_offset(first, np.arange(count), busdaycal=self.calendar)
+
+
+trading_calendar = TradingCalendar()
@@ -0,0 +1,87 @@
+"""
+Ticker universe.
+
+The stocks the app covers are listed in a CSV file (project/data/nse_universe.csv
+by default, columns name,ticker,sector) instead of being hardcoded, so the list
+can be swapped for the full NSE equity list without a code change. 'name' is
+the display name used throughout the app (forms, logs, cache keys) and 'ticker'
+the data source symbol.
+
+Bulk jobs over the whole universe can be split into shards ('2/4' is the third
+of four): every ticker lands in a fixed shard, so several hosts or cron entries
+can share the nightly work.
+"""
+import csv
+import threading
+import zlib
+
+from config import Config
+
+
+def load_universe(path):
+    """Reads (name -> ticker, name -> sector) from a universe CSV, in file order."""
+    tickers, sectors = {}, {}
+    with open(path, newline='') as fh:
+        for row in csv.DictReader(fh):
+            name, ticker = (row.get('name') or '').strip(), (row.get('ticker') or '').strip()
+            if name and ticker:
+                tickers[name] = ticker
+                sectors[name] = (row.get('sector') or '').strip() or None
+    return tickers, sectors
+
+
+def parse_shard(value):
+    """Parses 'index/count' (0-based) into a tuple; None or '' means the whole universe."""
+    if not value:
+        return None
+    try:
+        index, count = (int(part) for part in str(value).split('/'))
+    except ValueError:
+        raise ValueError(f"Invalid shard '{value}', expected INDEX/COUNT such as 0/4.") from None
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"Invalid shard '{value}', INDEX must be between 0 and COUNT-1.")
+    return index, count
+
+
+def in_shard(name, shard):
+    """True if the stock belongs to shard (stable across processes and runs)."""
+    if shard is None:
+        return True
+    index, count = shard
+    return zlib.crc32(name.encode('utf-8')) % count == index
+
+
+class Universe:
+    """The configured stocks. tickers is updated in place, so modules can keep a reference to it."""
+
+    def __init__(self, path=None):
+        self.path = None
+        self.tickers = {}  # display name -> data source ticker
+        self.sectors = {}  # display name -> sector (None if unknown)
+        self._lock = threading.Lock()
+        self.load(path or Config.UNIVERSE_FILE)
+
+    def init_app(self, app):
+        self.configure(app.config)
+
+    def configure(self, config):
+        path = config.get('UNIVERSE_FILE')
+        if path and path != self.path:
+            self.load(path)
+
+    def load(self, path):
+        tickers, sectors = load_universe(path)
+        with self._lock:
+            self.tickers.clear()
+            self.tickers.update(tickers)
+            self.sectors.clear()
+            self.sectors.update(sectors)
+            self.path = path
+
+    def names(self, shard=None, sector=None):
+        """Display names in file order, optionally limited to one shard and/or sector."""
+        return [name for name in self.tickers
+                if in_shard(name, shard) and (sector is None or self.sectors.get(name) == sector)]
+
+
+universe = Universe()
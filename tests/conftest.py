@@ -0,0 +1,23 @@
+import os
+import sys
+
+import pytest
+from flask import Flask
+
+# Run from any directory: make the repository root (config.py, project/) importable
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def db_app(tmp_path):
+    """A bare Flask app with the models created in a temporary SQLite database."""
+    from project.extensions import db
+    from project import models  # registers the tables  # noqa: F401
+
+    app = Flask(__name__)
+    app.config.update(SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'app.db'}", SECRET_KEY='test')
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
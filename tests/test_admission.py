@@ -0,0 +1,193 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from project.admission import AdmissionController, DeadlineExceeded, Overloaded, TooManyRequests
+from project.jobs import job_queue
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    """Runs admitted work on a thread pool instead of the shared process pool."""
+    executor = ThreadPoolExecutor(max_workers=8)
+    monkeypatch.setattr(job_queue, 'executor', lambda: executor)
+    monkeypatch.setattr(job_queue, 'background_executor', lambda: executor)
+    yield executor
+    executor.shutdown(wait=True)
+
+
+def make_controller(**overrides):
+    config = {'ADMISSION_SLOTS': 1, 'ADMISSION_QUEUE_SIZE': 64, 'ADMISSION_USER_CONCURRENCY': 1,
+              'ADMISSION_USER_QUEUE': 16, 'ADMISSION_USER_RATE': 0, 'ADMISSION_USER_BURST': 10,
+              'ADMISSION_DEADLINE': 30}
+    config.update(overrides)
+    controller = AdmissionController()
+    controller.configure(config)
+    return controller
+
+
+class Recorder:
+    """Work items that record their start order and block until released."""
+
+    def __init__(self):
+        self.order = []
+        self.gate = threading.Event()
+        self._lock = threading.Lock()
+
+    def __call__(self, name):
+        with self._lock:
+            self.order.append(name)
+        self.gate.wait(10)
+        return name
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not reached")
+        time.sleep(0.01)
+
+
+def test_token_bucket_limits_bursts_and_refills():
+    controller = make_controller(ADMISSION_USER_RATE=60, ADMISSION_USER_BURST=2)
+
+    controller.check_rate(1)
+    controller.check_rate(1)
+    with pytest.raises(TooManyRequests) as excinfo:
+        controller.check_rate(1)
+    assert excinfo.value.status == 429
+    assert excinfo.value.retry_after >= 1
+    controller.check_rate(2)  # buckets are per user
+
+    tokens, updated_at = controller._buckets[1]
+    controller._buckets[1] = (tokens, updated_at - 1.5)  # 1.5s at 60/min refills one token
+    controller.check_rate(1)
+    assert controller.rejected['rate'] == 1
+
+
+def test_free_slots_go_round_robin_across_users(pool):
+    controller = make_controller()
+    work = Recorder()
+
+    futures = [controller.submit('a', work, ('a1',))]
+    wait_for(lambda: work.order == ['a1'])
+    futures += [controller.submit('a', work, (name,)) for name in ('a2', 'a3')]
+    futures.append(controller.submit('b', work, ('b1',)))
+    work.gate.set()
+
+    assert [f.result(5) for f in futures] == ['a1', 'a2', 'a3', 'b1']
+    assert work.order == ['a1', 'a2', 'b1', 'a3']
+
+
+def test_work_still_queued_at_its_deadline_never_runs(pool):
+    controller = make_controller()
+    work = Recorder()
+
+    running = controller.submit('a', work, ('first',))
+    wait_for(lambda: work.order == ['first'])
+    expired = controller.submit('b', work, ('late',), deadline=time.monotonic() + 0.2)
+
+    with pytest.raises(DeadlineExceeded):
+        expired.result(5)
+    work.gate.set()
+    assert running.result(5) == 'first'
+    assert work.order == ['first']
+    assert controller.rejected['deadline'] == 1
+
+
+def test_call_gives_up_at_the_deadline(pool):
+    controller = make_controller()
+    work = Recorder()
+
+    with pytest.raises(DeadlineExceeded):
+        controller.call('a', work, ('slow',), deadline=time.monotonic() + 0.2)
+    work.gate.set()
+
+
+def test_queue_limits(pool):
+    controller = make_controller(ADMISSION_USER_QUEUE=2, ADMISSION_QUEUE_SIZE=3)
+    work = Recorder()
+
+    controller.submit('a', work, ('running',))
+    wait_for(lambda: work.order == ['running'])
+    controller.submit('a', work, ('a1',))
+    controller.submit('a', work, ('a2',))
+    with pytest.raises(TooManyRequests):
+        controller.submit('a', work, ('a3',))
+    controller.submit('b', work, ('b1',))
+    with pytest.raises(Overloaded) as excinfo:
+        controller.submit('c', work, ('c1',))
+    assert excinfo.value.status == 503
+    work.gate.set()
+
+
+def test_batch_is_admitted_as_one_request(pool):
+    controller = make_controller(ADMISSION_USER_QUEUE=2)
+    work = Recorder()
+
+    batch = controller.executor('a')
+    futures = [batch.submit(work, f'fit{i}') for i in range(20)]
+    controller.submit('a', work, ('single',))  # the batch took one of the two request slots
+    with pytest.raises(TooManyRequests):
+        controller.submit('a', work, ('one too many',))
+    work.gate.set()
+
+    assert sorted(f.result(5) for f in futures) == sorted(f'fit{i}' for i in range(20))
+
+
+def test_batch_borrows_idle_slots_but_leaves_one_free(pool):
+    controller = make_controller(ADMISSION_SLOTS=4)
+    work = Recorder()
+
+    batch = controller.executor('a')
+    futures = [batch.submit(work, f'fit{i}') for i in range(6)]
+    wait_for(lambda: len(work.order) == 3)
+    assert controller.stats()['running'] == 3
+
+    other = controller.submit('b', work, ('b1',))
+    wait_for(lambda: 'b1' in work.order)  # started without waiting for the batch
+    work.gate.set()
+    assert other.result(5) == 'b1'
+    assert len([f.result(5) for f in futures]) == 6
+
+
+def test_cancel_pending_drops_unstarted_batch_work(pool):
+    controller = make_controller()
+    work = Recorder()
+
+    batch = controller.executor('a')
+    futures = [batch.submit(work, f'fit{i}') for i in range(3)]
+    wait_for(lambda: work.order == ['fit0'])
+    batch.cancel_pending()
+    work.gate.set()
+
+    assert futures[0].result(5) == 'fit0'
+    assert all(f.cancelled() for f in futures[1:])
+    assert controller.stats()['queued'] == 0
+
+
+def test_background_work_only_uses_idle_capacity(pool):
+    controller = make_controller()
+    work = Recorder()
+
+    user = controller.submit('a', work, ('a1',))
+    wait_for(lambda: work.order == ['a1'])
+    background = [controller.submit_background(work, (f'bg{i}',)) for i in range(2)]
+    time.sleep(0.05)
+    assert work.order == ['a1']  # the only slot is busy
+
+    work.gate.set()
+    assert user.result(5) == 'a1'
+    assert [f.result(5) for f in background] == ['bg0', 'bg1']
+
+    work.gate.clear()
+    slow = controller.submit_background(work, ('bg2',))
+    wait_for(lambda: 'bg2' in work.order)
+    other = controller.submit('b', work, ('b1',))
+    wait_for(lambda: 'b1' in work.order)  # background work never holds a slot
+    assert controller.stats()['background_running'] == 1
+    work.gate.set()
+    assert other.result(5) == 'b1' and slow.result(5) == 'bg2'
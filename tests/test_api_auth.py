@@ -0,0 +1,81 @@
+import time
+from datetime import datetime
+
+import pytest
+
+from project.api_auth import TokenResolver, create_token, hash_token, token_required
+from project.extensions import db
+from project.models import ApiToken, User
+
+SECRET = 'token-secret'
+
+
+@pytest.fixture
+def user(db_app):
+    user = User(username='alice', email='alice@example.com', password_hash='x', is_admin=True)
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+@pytest.fixture
+def resolver():
+    resolver = TokenResolver()
+    resolver.configure({'API_TOKEN_SECRET': SECRET, 'API_TOKEN_CACHE_TTL': 60, 'API_TOKEN_CACHE_SIZE': 2})
+    return resolver
+
+
+def test_created_token_resolves_and_only_its_hmac_is_stored(user, resolver):
+    token, row = create_token(user, 'cli', SECRET)
+    db.session.commit()
+
+    assert row.token_hash == hash_token(token, SECRET) and token not in row.token_hash
+    api_user = resolver.resolve(token)
+    assert tuple(api_user) == (user.id, 'alice', True, row.id)
+    assert db.session.get(ApiToken, row.id).last_used_at is not None
+
+    other = TokenResolver()
+    other.configure({'API_TOKEN_SECRET': 'another-secret'})
+    assert other.resolve(token) is None  # the HMAC key matters
+    assert resolver.resolve('not-a-token') is None and resolver.resolve(None) is None
+
+
+def test_revocation_takes_effect_when_the_cache_entry_expires(user, resolver):
+    resolver.ttl = 0.2
+    token, row = create_token(user, 'cli', SECRET)
+    db.session.commit()
+    assert resolver.resolve(token) is not None
+
+    row.revoked_at = datetime.utcnow()  # what 'flask revoke-token' does
+    db.session.commit()
+    assert resolver.resolve(token) is not None  # still cached in this process
+    time.sleep(0.25)
+    assert resolver.resolve(token) is None
+
+
+def test_cache_is_bounded_and_remembers_unknown_tokens(user, resolver, monkeypatch):
+    tokens = [create_token(user, f't{i}', SECRET)[0] for i in range(3)]
+    db.session.commit()
+    for token in tokens:
+        resolver.resolve(token)
+    assert len(resolver._entries) == 2  # least recently used entry evicted
+
+    loads = []
+    monkeypatch.setattr(resolver, '_load', lambda digest: loads.append(digest))
+    resolver.resolve('spk_unknown')
+    resolver.resolve('spk_unknown')
+    assert len(loads) == 1
+
+
+def test_token_required_reads_the_bearer_header(db_app, user, resolver, monkeypatch):
+    from project import api_auth
+    monkeypatch.setattr(api_auth, 'token_resolver', resolver)
+    token, _ = create_token(user, 'cli', SECRET)
+    db.session.commit()
+    view = token_required(lambda: api_auth.g.api_user.username)
+
+    with db_app.test_request_context(headers={'Authorization': f'Bearer {token}'}):
+        assert view() == 'alice'
+    with db_app.test_request_context(headers={'Authorization': f'Basic {token}'}):
+        response, status, headers = view()
+        assert status == 401 and headers == {'WWW-Authenticate': 'Bearer'}
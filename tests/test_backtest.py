@@ -0,0 +1,31 @@
+from datetime import timedelta
+
+import pandas as pd
+import pytest
+
+from project.backtest import backtest_cache
+from project.singleflight import single_flight
+from project import ml_logic
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(backtest_cache, 'root', str(tmp_path / 'backtests'))
+    monkeypatch.setattr(backtest_cache, '_entries', {})
+    monkeypatch.setattr(single_flight, 'lock_dir', str(tmp_path / 'locks'))
+    return backtest_cache
+
+
+def test_too_short_history_is_cached_as_very_low_confidence(cache):
+    dates = pd.bdate_range('2024-01-01', periods=40)
+    df = pd.DataFrame({'Date': dates, 'Close': [100.0 + i for i in range(40)]})
+
+    assert ml_logic.cached_backtest('TEST.NS', 'Linear Regression', df) is None
+    ml_logic.get_backtest('TEST.NS', 'Linear Regression', df)
+    backtest = ml_logic.cached_backtest('TEST.NS', 'Linear Regression', df)
+
+    assert backtest is not None  # no longer pending
+    last = dates[-1].date()
+    labels, bands = ml_logic.estimate_confidence(backtest, last, [last + timedelta(days=7)], [140.0])
+    assert labels == ["Very Low"] and bands == [None]
+    assert ml_logic.backtest_intervals(backtest, last, [last + timedelta(days=7)], [140.0]) is None
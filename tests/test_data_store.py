@@ -0,0 +1,127 @@
+import json
+import os
+from datetime import date, datetime, timedelta, time as dtime
+from zoneinfo import ZoneInfo
+
+import pandas as pd
+import pytest
+
+from project.data_store import FixtureSource, PriceStore
+
+TICKER = 'TEST.NS'
+
+
+class CountingSource(FixtureSource):
+    """FixtureSource that records the (start, end) of every fetch."""
+
+    def __init__(self, directory):
+        super().__init__(directory)
+        self.calls = []
+
+    def fetch(self, ticker, start, end):
+        self.calls.append((start, end))
+        return super().fetch(ticker, start, end)
+
+
+def write_bars(directory, closes, first='2024-01-01'):
+    dates = pd.bdate_range(first, periods=len(closes))
+    pd.DataFrame({'Date': dates.strftime('%Y-%m-%d'), 'Open': closes, 'High': closes, 'Low': closes,
+                  'Close': closes, 'Volume': 1000}).to_csv(os.path.join(directory, f'{TICKER}.csv'), index=False)
+    return [d.date() for d in dates]
+
+
+@pytest.fixture
+def store(tmp_path):
+    feed = tmp_path / 'feed'
+    feed.mkdir()
+    source = CountingSource(str(feed))
+    store = PriceStore(root=str(tmp_path / 'store'), source=source, max_age=900)
+    store.configure({'MARKET_TIMEZONE': 'Asia/Kolkata', 'MARKET_CLOSE': '15:30'})
+    return store
+
+
+def set_checked_at(store, moment):
+    _, meta_path = store._paths(TICKER)
+    with open(meta_path) as fh:
+        meta = json.load(fh)
+    meta['checked_at'] = moment.timestamp()
+    with open(meta_path, 'w') as fh:
+        json.dump(meta, fh)
+
+
+def test_final_bars_are_served_from_disk(store):
+    dates = write_bars(store.source.directory, [100.0, 101.0, 102.0])
+
+    first = store.get_history(TICKER, dates[0], dates[-1])
+    second = store.get_history(TICKER, dates[0], dates[-1])
+
+    assert first['Close'].tolist() == [100.0, 101.0, 102.0]
+    assert second.equals(first)
+    assert len(store.source.calls) == 1
+
+
+def test_refresh_only_fetches_from_last_stored_bar(store):
+    dates = write_bars(store.source.directory, [100.0, 101.0, 102.0])
+    store.get_history(TICKER, dates[0], dates[-1])
+    set_checked_at(store, datetime.now() - timedelta(hours=1))
+
+    dates = write_bars(store.source.directory, [100.0, 101.0, 102.0, 103.0, 104.0])
+    df = store.get_history(TICKER, dates[0], dates[-1])
+
+    assert df['Close'].tolist() == [100.0, 101.0, 102.0, 103.0, 104.0]
+    assert store.source.calls[-1][0] == dates[2]
+    assert store.metadata(TICKER)['last_date'] == dates[-1].isoformat()
+
+
+def test_bar_fetched_before_the_close_is_refreshed(store):
+    dates = write_bars(store.source.directory, [100.0, 101.0])
+    store.get_history(TICKER, dates[0], dates[-1])
+    # The last bar was stored intraday, and the source has since published the final close
+    set_checked_at(store, datetime.combine(dates[-1], dtime(11, 0), ZoneInfo('Asia/Kolkata')))
+    write_bars(store.source.directory, [100.0, 123.0])
+
+    df = store.get_history(TICKER, dates[0], dates[-1])
+
+    assert df['Close'].tolist() == [100.0, 123.0]
+    assert len(store.source.calls) == 2
+
+
+def test_partial_bar_is_fresh_within_max_age(store):
+    last = date(2024, 1, 2)
+    intraday = datetime.combine(last, dtime(11, 0), ZoneInfo('Asia/Kolkata')).timestamp()
+    meta = {'covered_from': '2024-01-01', 'last_date': last.isoformat(), 'checked_at': intraday}
+
+    store.max_age = 10 ** 12
+    assert not store._is_stale(meta, date(2024, 1, 1), last)
+    store.max_age = 900
+    assert store._is_stale(meta, date(2024, 1, 1), last)
+    meta['checked_at'] = datetime.combine(last, dtime(16, 0), ZoneInfo('Asia/Kolkata')).timestamp()
+    assert not store._is_stale(meta, date(2024, 1, 1), last)
+
+
+def test_writes_leave_no_temporary_files(store):
+    dates = write_bars(store.source.directory, [100.0, 101.0, 102.0])
+    store.get_history(TICKER, dates[0], dates[-1])
+
+    files = sorted(os.listdir(store.root))
+    assert files == [f'{TICKER}.json', f'{TICKER}.npz']
+    with open(os.path.join(store.root, f'{TICKER}.json')) as fh:
+        assert json.load(fh)['rows'] == 3
+
+
+class FailingSource(FixtureSource):
+    def fetch(self, ticker, start, end):
+        raise ConnectionError("source is down")
+
+
+def test_stored_bars_are_served_when_the_source_fails(store):
+    dates = write_bars(store.source.directory, [100.0, 101.0, 102.0])
+    store.get_history(TICKER, dates[0], dates[-1])
+    set_checked_at(store, datetime.now() - timedelta(hours=1))
+
+    store.set_source(FailingSource(store.source.directory))
+    df = store.get_history(TICKER, dates[0], dates[-1] + timedelta(days=3))
+
+    assert df['Close'].tolist() == [100.0, 101.0, 102.0]
+    with pytest.raises(ConnectionError):
+        store.get_history('OTHER.NS', dates[0], dates[-1])
@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from project import features as features_module
+from project.features import WARMUP, FeatureStore, compute_features
+
+TICKER = 'TEST.NS'
+
+
+def bars(rows=300, seed=0):
+    rng = np.random.default_rng(seed)
+    closes = 100 * np.exp(np.cumsum(rng.normal(scale=0.01, size=rows)))
+    return pd.DataFrame({'Date': pd.bdate_range('2024-01-01', periods=rows), 'Open': closes,
+                         'High': closes * 1.01, 'Low': closes * 0.99, 'Close': closes,
+                         'Volume': rng.integers(1000, 5000, size=rows).astype(float)})
+
+
+def assert_matches_full_recompute(result, df):
+    expected = compute_features(df).reset_index(drop=True)
+    assert list(result.columns) == list(expected.columns)
+    assert np.allclose(result.to_numpy(), expected.to_numpy(), equal_nan=True)
+
+
+@pytest.fixture
+def computed(monkeypatch):
+    """Records the number of rows of every compute_features call."""
+    lengths = []
+
+    def recording(df):
+        lengths.append(len(df))
+        return compute_features(df)
+
+    monkeypatch.setattr(features_module, 'compute_features', recording)
+    return lengths
+
+
+def test_new_bars_extend_the_stored_matrix(tmp_path, computed):
+    store = FeatureStore(root=str(tmp_path))
+    df = bars()
+
+    store.get(TICKER, df.iloc[:250])
+    result = store.get(TICKER, df)
+
+    assert_matches_full_recompute(result, df)
+    assert computed == [250, WARMUP + 51]  # the last stored bar is recomputed with the new ones
+
+
+def test_revised_last_bar_is_recomputed(tmp_path):
+    store = FeatureStore(root=str(tmp_path))
+    df = bars()
+    partial = df.copy()
+    partial.loc[partial.index[-1], 'Close'] *= 0.97  # intraday bar, later finalized
+
+    store.get(TICKER, partial)
+    assert_matches_full_recompute(store.get(TICKER, df), df)
+
+
+def test_restarted_store_extends_what_is_on_disk(tmp_path, computed):
+    df = bars()
+    FeatureStore(root=str(tmp_path)).get(TICKER, df.iloc[:280])
+    result = FeatureStore(root=str(tmp_path)).get(TICKER, df)
+
+    assert_matches_full_recompute(result, df)
+    assert computed[-1] == WARMUP + 21
+
+
+def test_older_history_triggers_a_rebuild(tmp_path, computed):
+    store = FeatureStore(root=str(tmp_path))
+    df = bars()
+    store.get(TICKER, df.iloc[100:])
+    result = store.get(TICKER, df)
+
+    assert_matches_full_recompute(result, df)
+    assert computed[-1] == len(df)
@@ -0,0 +1,15 @@
+import statistics
+
+from benchmarks.import_time import LAZY_MODULES, probe
+
+# Median create_app() startup allowed in a fresh interpreter (seconds)
+BUDGET = 1.5
+
+
+def test_create_app_is_fast_and_imports_no_ml_backends(tmp_path):
+    probe(str(tmp_path))  # warm the bytecode and OS file caches
+    results = [probe(str(tmp_path)) for _ in range(3)]
+
+    assert statistics.median(r['seconds'] for r in results) < BUDGET
+    for module in LAZY_MODULES:
+        assert all(module not in r['loaded'] for r in results), f"{module} was imported by create_app()"
@@ -0,0 +1,93 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from flask import Flask
+
+from project.jobs import DONE, FAILED, QUEUED, RUNNING, JobQueue
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = JobQueue()
+    queue.app = Flask(__name__)
+    queue.root = str(tmp_path)
+    executor = ThreadPoolExecutor(max_workers=2)
+    queue.executor = lambda: executor
+    yield queue
+    executor.shutdown(wait=True)
+
+
+def wait_for_status(queue, job_id, status, timeout=5):
+    deadline = time.monotonic() + timeout
+    while (queue.get(job_id) or {}).get('status') != status:
+        if time.monotonic() > deadline:
+            raise AssertionError(f"job never reached {status}: {queue.get(job_id)}")
+        time.sleep(0.01)
+    return queue.get(job_id)
+
+
+def test_job_goes_from_queued_to_running_to_done(queue):
+    release = threading.Event()
+    finished = []
+
+    def work(x):
+        release.wait(5)
+        return {'value': x * 2}
+
+    blocker = queue.executor().submit(release.wait, 5)  # both workers busy, so the job waits
+    queue.executor().submit(release.wait, 5)
+    job_id = queue.submit(work, (21,), user_id=7, on_success=finished.append)
+    assert queue.get(job_id)['status'] == QUEUED
+
+    release.set()
+    blocker.result(5)
+    state = wait_for_status(queue, job_id, DONE)
+    assert state['result'] == {'value': 42} and state['user_id'] == 7
+    assert state['submitted_at'] <= state['started_at'] <= state['finished_at']
+    assert finished == [{'value': 42}]
+
+
+def test_running_state_is_visible_while_the_job_works(queue):
+    release = threading.Event()
+    job_id = queue.submit(lambda: release.wait(5) and {}, (), user_id=1)
+    state = wait_for_status(queue, job_id, RUNNING)
+    assert 'started_at' in state
+    release.set()
+    wait_for_status(queue, job_id, DONE)
+
+
+def test_error_results_and_exceptions_fail_the_job(queue):
+    called = []
+    errored = queue.submit(lambda: {'error': "bad input"}, (), user_id=1, on_success=called.append)
+    raised = queue.submit(lambda: 1 / 0, (), user_id=1, on_success=called.append)
+
+    assert wait_for_status(queue, errored, FAILED)['error'] == "bad input"
+    assert wait_for_status(queue, raised, FAILED)['error'].startswith("An unexpected error occurred")
+    assert called == []
+
+
+def test_failed_submission_leaves_no_job_behind(queue, tmp_path):
+    class Rejecting:
+        def submit(self, *args):
+            raise RuntimeError("pool is full")
+
+    with pytest.raises(RuntimeError):
+        queue.submit(lambda: {}, (), user_id=1, executor=Rejecting())
+    assert os.listdir(str(tmp_path)) == []
+
+
+def test_expired_job_states_are_purged(queue):
+    queue.result_ttl = 60
+    old = queue.submit(lambda: {}, (), user_id=1)
+    wait_for_status(queue, old, DONE)
+    stale = time.time() - 120
+    os.utime(queue._path(old), (stale, stale))
+
+    queue._last_purge = 0.0  # purges run at most once a minute
+    new = queue.submit(lambda: {}, (), user_id=1)
+    assert queue.get(old) is None
+    assert wait_for_status(queue, new, DONE)
+    assert queue.get('../etc/passwd') is None
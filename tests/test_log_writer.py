@@ -0,0 +1,80 @@
+import json
+import os
+import time
+from datetime import date
+
+import pytest
+
+from project.extensions import db
+from project.log_writer import PredictionLogWriter
+from project.models import PredictionLog, User
+
+
+@pytest.fixture
+def writer(db_app, tmp_path):
+    db.session.add(User(username='user', email='user@example.com', password_hash='x'))
+    db.session.commit()
+    writer = PredictionLogWriter()
+    writer.app = db_app
+    writer.spool_dir = str(tmp_path / 'spool')
+    writer.flush_size = 10_000      # flushes only happen when the test calls flush()
+    writer.flush_interval = 1_000.0
+    writer.max_retries = 3
+    writer.max_backoff = 30.0
+    return writer
+
+
+def row(user_id=1, price=100.0):
+    return {'user_id': user_id, 'stock_ticker': 'TCS', 'model_used': 'Linear Regression',
+            'predicted_date': date(2030, 1, 1), 'predicted_price': price, 'confidence': 'High'}
+
+
+def spooled(writer):
+    with open(os.path.join(writer.spool_dir, f'{os.getpid()}.jsonl')) as fh:
+        return [json.loads(line) for line in fh]
+
+
+def failing(writer, times):
+    """Makes the next `times` inserts raise."""
+    insert, calls = writer._insert, {'n': 0}
+
+    def flaky(rows):
+        calls['n'] += 1
+        if calls['n'] <= times:
+            raise RuntimeError("database is locked")
+        return insert(rows)
+
+    writer._insert = flaky
+
+
+def test_failed_flush_is_retried_with_backoff(writer):
+    writer.write([row(), row(price=101.0)])
+    assert len(spooled(writer)) == 2
+    failing(writer, 2)
+
+    assert writer.flush() == 0
+    first_delay = writer._retry_at - time.monotonic()
+    assert writer.flush() == 0
+    assert writer._retry_at - time.monotonic() > first_delay  # exponential...
+    assert writer._retry_at - time.monotonic() <= writer.max_backoff  # ...but capped
+    assert writer.pending() == 2 and writer.flush_errors == 2
+
+    assert writer.flush() == 2
+    assert PredictionLog.query.count() == 2
+    assert writer._failures == 0 and writer._retry_at == 0.0
+    assert spooled(writer) == []
+
+
+def test_rows_that_keep_failing_are_dead_lettered(writer):
+    writer.write([row(), row(user_id=None), row(price=102.0)])  # user_id is NOT NULL
+
+    for _ in range(writer.max_retries - 1):
+        assert writer.flush() == 0
+    assert writer.flush() == 2  # gives up on the batch and inserts row by row
+
+    assert PredictionLog.query.count() == 2
+    assert writer.dropped == 1 and writer.pending() == 0
+    assert spooled(writer) == []
+    with open(os.path.join(writer.spool_dir, 'dead_letter', f'{os.getpid()}.jsonl')) as fh:
+        dead = [json.loads(line) for line in fh]
+    assert [r['user_id'] for r in dead] == [None]
@@ -0,0 +1,95 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+
+from project.model_cache import CacheKey, ModelCache
+from project.model_registry import ModelRegistry, PackedForest, model_registry
+from project.ml_logic import fit_model
+
+
+@pytest.fixture
+def forest():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(300, 4))
+    X[rng.random(X.shape) < 0.05] = np.nan  # exercises the missing-value branches
+    y = np.nan_to_num(X[:, 0]) * 3 + np.nan_to_num(X[:, 1]) ** 2 + rng.normal(scale=0.1, size=300)
+    model = RandomForestRegressor(n_estimators=10, max_depth=8, random_state=0).fit(X, y)
+    return model, rng.normal(size=(50, 4))
+
+
+def history(rows=200, first='2024-01-01'):
+    closes = 100 * np.exp(np.cumsum(np.random.default_rng(1).normal(scale=0.01, size=rows)))
+    return pd.DataFrame({'Date': pd.bdate_range(first, periods=rows), 'Open': closes, 'High': closes * 1.01,
+                         'Low': closes * 0.99, 'Close': closes, 'Volume': 1000.0})
+
+
+def test_packed_forest_matches_sklearn(forest, tmp_path):
+    model, X = forest
+    packed = PackedForest.from_estimator(model)
+
+    assert np.allclose(packed.predict(X), model.predict(X))
+    assert np.allclose(packed.predict_trees(X), [tree.predict(X) for tree in model.estimators_])
+
+    packed.save(str(tmp_path))
+    mapped = PackedForest.load(str(tmp_path), packed.max_depth)
+    assert isinstance(mapped.value, np.memmap)
+    assert np.allclose(mapped.predict(X), model.predict(X))
+
+
+def test_publish_swaps_current_and_drops_old_versions(tmp_path):
+    registry = ModelRegistry(root=str(tmp_path))
+    df = history()
+    dates = pd.bdate_range(df['Date'].iloc[-1], periods=6)[1:].date.tolist()
+    old_key = CacheKey('TEST.NS', 'Random Forest', 'v1', 'cfg')
+    new_key = old_key._replace(data_version='v2')
+    fitted = fit_model('Random Forest', df)
+    expected = fitted.predict_dates(dates)
+
+    registry.publish(old_key, fitted)
+    loaded, _ = registry.load(old_key)
+    assert isinstance(loaded.estimator, PackedForest)
+    assert np.allclose(loaded.predict_dates(dates), expected)
+
+    registry.publish(new_key, fitted)
+    assert registry.load(old_key) == (None, 0)  # CURRENT now points at v2
+    assert registry.load(new_key)[0] is not None
+    base = os.path.join(str(tmp_path), 'TEST.NS', 'Random_Forest')
+    assert sorted(os.listdir(base)) == ['CURRENT', 'v2-cfg']
+
+
+def test_model_cache_reloads_published_models_from_disk(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_registry, 'root', str(tmp_path))
+    df = history()
+    key = CacheKey('TEST.NS', 'Linear Regression', 'v1', 'cfg')
+    fitted = fit_model('Linear Regression', df)
+
+    ModelCache().put(key, fitted)
+    restarted = ModelCache()  # a fresh worker only has the disk tier
+    reloaded = restarted.get(key)
+    assert restarted.disk_hits == 1
+    dates = pd.bdate_range(df['Date'].iloc[-1], periods=4)[1:].date.tolist()
+    assert np.allclose(reloaded.predict_dates(dates), fitted.predict_dates(dates))
+
+    assert restarted.get(key) is reloaded and restarted.hits == 1
+    restarted.put(key._replace(data_version='v2'), fitted)
+    assert key not in restarted._entries  # the stale version is dropped from memory...
+    assert ModelCache().get(key) is None  # ...and is no longer current on disk
+
+
+def test_model_cache_evicts_least_recently_used_but_keeps_it_on_disk(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_registry, 'root', str(tmp_path))
+    df = history()
+    fitted = fit_model('Linear Regression', df)
+    first = CacheKey('TCS.NS', 'Linear Regression', 'v1', 'cfg')
+    second = first._replace(stock='ITC.NS')
+
+    cache = ModelCache(max_bytes=1)  # smaller than any model: only the newest entry stays in memory
+    cache.put(first, fitted)
+    cache.put(second, fitted)
+    assert list(cache._entries) == [second]
+
+    assert cache.get(first) is not None and cache.disk_hits == 1
+    assert list(cache._entries) == [first]
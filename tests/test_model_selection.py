@@ -0,0 +1,81 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from project import ml_logic, model_selection
+from project.model_selection import ModelSelector
+
+ERRORS = {'good': 0.01, 'close': 0.011, 'bad': 0.10, 'slow': 0.005}
+
+
+def make_selector(monkeypatch, candidates, workers=1, **config):
+    """A selector over fake candidates whose fold error (and run time) is fixed per name."""
+    selector = ModelSelector()
+    selector.configure(dict({'SELECTION_BUDGET_SECONDS': 10, 'SELECTION_FOLDS': 6, 'SELECTION_MIN_FOLDS': 2,
+                             'SELECTION_ABANDON_MARGIN': 0.5}, **config))
+    selector._executor = ThreadPoolExecutor(max_workers=workers)
+    monkeypatch.setattr(selector, 'candidates', lambda: [(name, {}) for name in candidates])
+    monkeypatch.setattr(ml_logic, 'get_features', lambda stock, name, df: None)
+    folds = {name: [] for name in candidates}
+
+    def score_fold(name, params, df, features, origin):
+        if name == 'broken':
+            raise ValueError("cannot fit")
+        if name == 'slow':
+            time.sleep(0.2)
+        folds[name].append(origin)
+        return ERRORS[name]
+
+    monkeypatch.setattr(model_selection, 'score_fold', score_fold)
+    return selector, folds
+
+
+def history(rows=300):
+    return pd.DataFrame({'Date': pd.bdate_range('2024-01-01', periods=rows), 'Close': 100.0})
+
+
+def by_name(result):
+    return {c['model']: c for c in result['candidates']}
+
+
+def test_clearly_worse_candidates_are_abandoned_early(monkeypatch):
+    selector, folds = make_selector(monkeypatch, ['good', 'bad', 'close'])
+    result = selector.search('TEST.NS', history())
+
+    assert result['model'] == 'good' and result['folds'] == 6
+    assert by_name(result)['bad']['status'] == 'abandoned'
+    assert len(folds['bad']) == 2  # stopped at SELECTION_MIN_FOLDS
+    assert by_name(result)['close']['status'] == 'done'  # within the margin, so it ran every fold
+    assert not result['budget_exhausted']
+    assert folds['good'] == sorted(folds['good'], reverse=True)  # most recent origin first
+
+
+def test_budget_decides_on_the_folds_every_contender_finished(monkeypatch):
+    selector, folds = make_selector(monkeypatch, ['good', 'slow'], workers=2,
+                                    SELECTION_BUDGET_SECONDS=0.5, SELECTION_MIN_FOLDS=10)
+    start = time.perf_counter()
+    result = selector.search('TEST.NS', history())
+
+    assert time.perf_counter() - start < 1.0
+    assert result['budget_exhausted']
+    slow = by_name(result)['slow']
+    assert slow['status'] == 'timed out' and 1 <= slow['folds'] < 6
+    assert by_name(result)['good']['status'] == 'done'
+    assert result['model'] == 'slow' and result['folds'] == slow['folds']
+
+
+def test_failed_candidates_are_skipped(monkeypatch):
+    selector, _ = make_selector(monkeypatch, ['broken', 'close'])
+    result = selector.search('TEST.NS', history())
+
+    assert result['model'] == 'close'
+    assert by_name(result)['broken']['status'] == 'failed'
+
+
+def test_short_history_falls_back_to_the_first_model(monkeypatch):
+    selector, folds = make_selector(monkeypatch, ['good'])
+    result = selector.search('TEST.NS', history(rows=100))
+
+    assert result['reason'] == 'not enough history' and result['folds'] == 0
+    assert folds == {'good': []}
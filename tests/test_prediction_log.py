@@ -0,0 +1,98 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from project.extensions import db
+from project.models import PredictionDailyStats, User, UserPredictionStats
+from project.prediction_log import (admin_summary, decode_cursor, logs_page, rebuild_rollups,
+                                    record_predictions, users_page)
+
+
+@pytest.fixture
+def users(db_app):
+    users = [User(username=f'user{i}', email=f'user{i}@example.com', password_hash='x') for i in range(3)]
+    db.session.add_all(users)
+    db.session.commit()
+    return users
+
+
+def row(user, stock='TCS', model='Linear Regression', timestamp=None):
+    values = {'user_id': user.id, 'stock_ticker': stock, 'model_used': model,
+              'predicted_date': date(2030, 1, 1), 'predicted_price': 100.0, 'confidence': 'High'}
+    if timestamp is not None:
+        values['timestamp'] = timestamp
+    return values
+
+
+def rollups():
+    db.session.expire_all()
+    return (sorted((s.day, s.stock_ticker, s.model_used, s.count) for s in PredictionDailyStats.query),
+            sorted((s.user_id, s.count, s.last_prediction_at) for s in UserPredictionStats.query))
+
+
+def test_rollups_are_upserted_with_every_write(users):
+    day = datetime(2026, 10, 1, 9, 30)
+    record_predictions([row(users[0], timestamp=day), row(users[0], timestamp=day + timedelta(hours=1)),
+                        row(users[1], model='XGBoost', timestamp=day)])
+    db.session.commit()
+    record_predictions([row(users[0], timestamp=day + timedelta(hours=2)),
+                        row(users[0], timestamp=day + timedelta(days=1))])
+    db.session.commit()
+
+    daily = {(s.day, s.stock_ticker, s.model_used): s.count for s in PredictionDailyStats.query}
+    assert daily == {(date(2026, 10, 1), 'TCS', 'Linear Regression'): 3,
+                     (date(2026, 10, 1), 'TCS', 'XGBoost'): 1,
+                     (date(2026, 10, 2), 'TCS', 'Linear Regression'): 1}
+    first = db.session.get(UserPredictionStats, users[0].id)
+    assert first.count == 4 and first.last_prediction_at == day + timedelta(days=1)
+
+    # An older write never moves last_prediction_at backwards
+    record_predictions([row(users[0], timestamp=day - timedelta(days=5))])
+    db.session.commit()
+    db.session.expire_all()
+    first = db.session.get(UserPredictionStats, users[0].id)
+    assert first.count == 5 and first.last_prediction_at == day + timedelta(days=1)
+
+    # A backfill from the log reproduces the incrementally maintained rollups
+    before = rollups()
+    assert rebuild_rollups() == (4, 2)
+    db.session.commit()
+    assert rollups() == before
+
+def test_admin_summary_reads_the_rollups(users):
+    now = datetime.utcnow()
+    record_predictions([row(users[0], timestamp=now), row(users[1], timestamp=now),
+                        row(users[1], stock='ITC', timestamp=now - timedelta(days=30))])
+    db.session.commit()
+
+    summary = admin_summary(days=7)
+    assert summary['total'] == 3 and summary['recent'] == 2
+    assert [tuple(r) for r in summary['by_stock_model']] == [('TCS', 'Linear Regression', 2)]
+    assert summary['top_users'][0].user_id == users[1].id
+
+
+def test_log_pages_walk_newest_first_without_gaps_or_repeats(users):
+    same_second = datetime(2026, 10, 1, 12, 0)
+    record_predictions([row(users[i % 3], timestamp=same_second if i < 4 else same_second - timedelta(minutes=i))
+                        for i in range(11)])
+    db.session.commit()
+
+    seen, cursor = [], None
+    while True:
+        logs, cursor = logs_page(cursor, per_page=3)
+        seen += [(log.timestamp, log.id) for log in logs]
+        if cursor is None:
+            break
+    assert len(seen) == 11 and len(set(seen)) == 11
+    assert seen == sorted(seen, reverse=True)  # ties on timestamp are broken by id
+
+    assert decode_cursor('garbage') is None
+    assert len(logs_page('garbage', per_page=20)[0]) == 11  # an invalid cursor starts over
+
+
+def test_user_pages_follow_the_id_cursor(users):
+    first, cursor = users_page(per_page=2)
+    assert [u.id for u in first] == [users[2].id, users[1].id]
+    rest, last_cursor = users_page(cursor, per_page=2)
+    assert [u.id for u in rest] == [users[0].id] and last_cursor is None
+    assert len(users_page('not-a-number', per_page=5)[0]) == 3
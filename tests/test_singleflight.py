@@ -0,0 +1,77 @@
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from project.singleflight import LOCK_STRIPES, SingleFlight
+
+
+def wait_for_waiters(flight, count):
+    """Blocks until count callers are waiting on an in-flight call."""
+    while flight.stats()['coalesced'] < count:
+        time.sleep(0.01)
+
+
+def test_concurrent_callers_share_one_execution():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def work():
+        calls.append(1)
+        release.wait(5)
+        return object()
+
+    with ThreadPoolExecutor(max_workers=5) as executor:
+        futures = [executor.submit(flight.do, 'key', work) for _ in range(5)]
+        wait_for_waiters(flight, 4)
+        release.set()
+        results = [f.result(5) for f in futures]
+
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+    assert flight.stats() == {'executions': 1, 'coalesced': 4, 'cross_process_hits': 0, 'in_flight': 0}
+
+
+def test_waiters_get_the_leaders_error_and_the_next_call_runs_again():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def fail():
+        release.wait(5)
+        raise ValueError("boom")
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        futures = [executor.submit(flight.do, 'key', fail) for _ in range(3)]
+        wait_for_waiters(flight, 2)
+        release.set()
+        for future in futures:
+            with pytest.raises(ValueError):
+                future.result(5)
+
+    assert flight.do('key', lambda: 'fresh') == 'fresh'
+
+
+def test_waiting_on_another_process_reuses_its_result(tmp_path):
+    fcntl = pytest.importorskip('fcntl')
+    flight = SingleFlight(lock_dir=str(tmp_path))
+    key = ('backtest', 'TEST.NS')
+    stripe = int(hashlib.sha1(repr(key).encode('utf-8')).hexdigest(), 16) % LOCK_STRIPES
+    cache = {}
+
+    # A separate open file stands in for another process holding the stripe lock
+    with open(os.path.join(str(tmp_path), f'stripe-{stripe:03d}.lock'), 'w') as other:
+        fcntl.flock(other, fcntl.LOCK_EX)
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(flight.do, key, lambda: 'recomputed', lambda: cache.get(key))
+            time.sleep(0.1)
+            assert not future.done()
+            cache[key] = 'stored by the other process'
+            fcntl.flock(other, fcntl.LOCK_UN)
+            assert future.result(5) == 'stored by the other process'
+
+    assert flight.stats()['executions'] == 0
+    assert flight.stats()['cross_process_hits'] == 1
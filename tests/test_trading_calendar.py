@@ -0,0 +1,54 @@
+from datetime import date
+
+import numpy as np
+import pytest
+
+from project.trading_calendar import TradingCalendar, downsample_indices
+
+
+def days(*values):
+    return np.array(values, dtype='datetime64[D]')
+
+
+@pytest.fixture
+def calendar(tmp_path):
+    path = tmp_path / 'holidays.csv'
+    path.write_text("date,description\n2026-04-03,Good Friday\n2026-04-14,Ambedkar Jayanti\n")
+    return TradingCalendar(str(path))
+
+
+def test_next_skips_a_holiday_and_the_weekend(calendar):
+    # Thursday 2026-04-02, then Good Friday and the weekend
+    assert (calendar.next('2026-04-02', 3) == days('2026-04-06', '2026-04-07', '2026-04-08')).all()
+    assert (calendar.next('2026-04-03', 2) == days('2026-04-06', '2026-04-07')).all()  # from the holiday
+    assert (calendar.next('2026-04-04', 1) == days('2026-04-06')).all()  # from Saturday
+
+
+def test_starting_at_includes_a_trading_start_and_rolls_forward_otherwise(calendar):
+    assert (calendar.starting_at('2026-04-02', 2) == days('2026-04-02', '2026-04-06')).all()
+    assert (calendar.starting_at('2026-04-03', 2) == days('2026-04-06', '2026-04-07')).all()
+    assert (calendar.starting_at('2026-04-05', 1) == days('2026-04-06')).all()  # Sunday
+    assert (calendar.starting_at('2026-04-13', 2) == days('2026-04-13', '2026-04-15')).all()
+
+
+def test_between_and_is_trading_day(calendar):
+    assert (calendar.between('2026-04-01', '2026-04-07')
+            == days('2026-04-01', '2026-04-02', '2026-04-06', '2026-04-07')).all()
+    assert len(calendar.between('2026-04-07', '2026-04-01')) == 0
+    assert calendar.is_trading_day(days('2026-04-02', '2026-04-03', '2026-04-04')).tolist() == [True, False, False]
+
+
+def test_covered_until_is_the_end_of_the_last_listed_year(calendar):
+    assert calendar.covered_until() == date(2026, 12, 31)
+
+
+def test_shipped_holiday_list_loads():
+    calendar = TradingCalendar()
+    assert not calendar.is_trading_day(days('2026-12-25'))[0]
+    assert calendar.is_trading_day(days('2026-12-24'))[0]
+
+
+def test_downsample_keeps_both_ends():
+    assert downsample_indices(5, None).tolist() == [0, 1, 2, 3, 4]
+    indices = downsample_indices(1000, 10)
+    assert len(indices) <= 10 and indices[0] == 0 and indices[-1] == 999